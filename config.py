@@ -1,6 +1,6 @@
 import os
 
-# 策略配置
+# 策略配置（任一策略可加 'adjusted': True，使用由adjclose换算的复权OHLC计算指标和回测）
 STRATEGY_CONFIGS = {
     'macd': {
         'fast_period': 12,
@@ -15,6 +15,29 @@ STRATEGY_CONFIGS = {
     'ma': {
         'short_window': 20,
         'long_window': 50
+    },
+    'bollinger': {
+        'window': 20,
+        'num_std': 2.0
+    },
+    'obv': {
+        'ma_window': 20
+    },
+    'pairs': {
+        'window': 60,
+        'entry_z': 2.0,
+        'exit_z': 0.0
+    }
+}
+
+# 规则表达式策略（注册到StrategyFactory后按名称使用）
+# 可用名称：价格列、ema_N/sma_N/rsi_N/atr_N、bb_mid_N/bb_upper_N/bb_lower_N、obv、macd/signal_line/histogram；
+# 函数：cross_above、cross_below、prev、abs、max、min、ema、sma；&、|、~与and、or、not等价
+RULE_STRATEGIES = {
+    'macd_rsi': {
+        'entry': 'cross_above(macd, signal_line) & rsi_14 < 70',
+        'exit': 'cross_below(macd, signal_line) | rsi_14 > 80',
+        'description': 'MACD金叉且RSI未超买时买入，死叉或RSI极度超买时卖出'
     }
 }
 
@@ -23,11 +46,51 @@ TRADING_CONFIG = {
     'initial_capital': 100000,
     'commission_rate': 0.001,  # 0.1% 手续费
     'slippage': 0.001,  # 0.1% 滑点
-    'position_size': 1.0  # 仓位大小（1.0表示全仓）
+    'position_size': 1.0,  # 仓位大小（1.0表示全仓）
+    # 风控出场（None表示不启用）
+    'stop_loss': None,  # 固定止损比例，如0.05表示亏损5%止损
+    'take_profit': None,  # 止盈比例，如0.10表示盈利10%止盈
+    'trailing_stop': None,  # 百分比移动止损，如0.08表示从最高点回撤8%出场
+    'trailing_atr_multiple': None,  # ATR移动止损倍数，如3表示最高价下方3倍ATR
+    'atr_period': 14,  # ATR周期
+    'max_holding_bars': None,  # 最长持仓K线数
+    # 信号成交价：'close'（信号K线收盘价）、'next_open'（下一根K线开盘价）、'next_vwap'（下一根K线OHLC均价）
+    'fill_model': 'close'
+}
+
+# 多策略资金分配（method: 'fixed'、'inverse_vol' 或 'risk_parity'；weights为固定权重，缺省等权）
+ALLOCATION_CONFIG = {
+    'method': 'risk_parity',
+    'weights': None,
+    'lookback': 63,  # 协方差估计窗口（K线数）
+    'rebalance_every': 21,  # 调仓间隔（K线数）
+    'rebalance_cost': 0.001  # 调仓成本率（按换手金额计）
+}
+
+# 路径依赖循环（EWM、持仓状态机、移动止损）的计算后端：'auto'（有Numba时用Numba）、'numba' 或 'numpy'
+KERNEL_BACKEND = 'auto'
+
+# 行情下载配置（url_template可用占位符{symbol}、{start}（YYYY-MM-DD，全量下载时为空）、{period1}（Unix秒））
+FETCH_CONFIG = {
+    'url_template': None,  # 如 'http://127.0.0.1:8000/history/{symbol}.csv?start={start}'
+    'concurrency': 64,  # 同时进行的最大请求数
+    'retries': 3,  # 失败后的最大重试次数
+    'backoff': 0.5,  # 首次重试等待秒数，之后翻倍
+    'timeout': 30  # 单次请求超时秒数
+}
+
+# 加载时的数据质量检查（repair为None时只报告不修改数据；'ffill'用前值替换问题K线，'drop'删除问题K线）
+VALIDATION_CONFIG = {
+    'enabled': True,
+    'repair': None,
+    'spike_threshold': 0.25,  # 单日跳变并反转的对数收益率阈值
+    'max_gap_sessions': 3  # 相邻K线之间允许缺少的工作日数
 }
 
 # 文件路径
 DATA_PATH = 'stock_data.csv'
+BENCHMARK_PATH = None  # 基准指数行情CSV（与DATA_PATH格式相同），用于相对基准的归因
+STORE_PATH = 'data_store'  # 按列存储的多股票行情（DataStore）
 RESULTS_PATH = 'results'
 
 # 创建结果目录
@@ -130,17 +130,13 @@ def check_daily_signals(df, check_date=None):
     else:
         check_date = pd.to_datetime(check_date).date()
     
-    # 找到最接近的交易日
-    df['date_only'] = df['date'].dt.date
-    if check_date in df['date_only'].values:
-        day_data = df[df['date_only'] == check_date].iloc[0]
-    else:
-        # 如果不是交易日，找到前一个交易日
-        earlier_dates = df[df['date_only'] < check_date]
-        if len(earlier_dates) == 0:
-            return "没有找到历史数据"
-        day_data = earlier_dates.iloc[-1]
-        check_date = day_data['date_only']
+    # 二分查找当日或之前最近的交易日（df已按日期排序，不新增列）
+    next_day = np.datetime64(pd.Timestamp(check_date) + pd.Timedelta(days=1), 'ns')
+    pos = np.searchsorted(df['date'].values, next_day, side='left') - 1
+    if pos < 0:
+        return "没有找到历史数据"
+    day_data = df.iloc[pos]
+    check_date = day_data['date'].date()
     
     # 获取MACD指标
     macd_value = day_data['macd']
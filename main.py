@@ -11,7 +11,11 @@ warnings.filterwarnings('ignore')
 from strategy import StrategyFactory
 from strategy.base_strategy import BaseTradingStrategy
 from utils.data_loader import DataLoader
+from utils.data_validator import DataValidator
+from utils.allocator import CapitalAllocator
+from utils.attribution import BenchmarkAttribution
 from utils.performance_analyzer import PerformanceAnalyzer
+from utils.pipeline import Pipeline, StageFailure
 import config
 import os
 import sys
@@ -39,8 +43,8 @@ def generate_signals(strategy_name, df, strategy_params=None):
     
     strategy = StrategyFactory.create_strategy(strategy_name, **strategy_params)
     
-    # 生成信号
-    signals = strategy.generate_signals(df)
+    # 生成信号（策略设置为复权价格时使用复权视图）
+    signals = strategy.generate_signals(strategy.price_input(df))
     
     return signals, strategy
 
@@ -70,10 +74,11 @@ def execute_trading_strategy(strategy_name, df, strategy_params=None,
     
     # 合并交易参数
     trading_config = {**config.TRADING_CONFIG, **trading_params}
+    trading_config.pop('initial_capital', None)
     
     # 创建并执行策略
     strategy = StrategyFactory.create_strategy(strategy_name, **strategy_params)
-    result_df = strategy.execute_strategy(df, initial_capital=initial_capital)
+    result_df = strategy.execute_strategy(df, initial_capital=initial_capital, **trading_config)
     
     # 分析性能
     performance = PerformanceAnalyzer.analyze_performance(result_df, initial_capital)
@@ -121,7 +126,7 @@ def compare_strategies(df, strategies=['macd', 'rsi', 'ma'],
             
             # 保存结果
             result_df.to_csv(f"results/{strategy_name}_results.csv", index=False)
-            
+        
         except Exception as e:
             print(f"执行策略 {strategy_name} 时出错: {e}")
     
@@ -142,13 +147,13 @@ def visualize_comparison(results):
         ax1.plot(df['date'], df['portfolio_value'], 
                 label=f"{strategy_name.upper()}", linewidth=2)
         # 标记买入点
-        buy_points = df[df['action'] == 'BUY']
+        buy_points = df[df['action'].isin(['BUY', 'BUY_SELL'])]
         if not buy_points.empty:
             ax1.scatter(buy_points['date'], buy_points['portfolio_value'], 
                    color='green', marker='^', s=100, label='买入', zorder=5)
-    
+        
         # 标记卖出点
-        sell_points = df[df['action'] == 'SELL']
+        sell_points = df[df['action'].isin(['SELL', 'BUY_SELL'])]
         if not sell_points.empty:
             ax1.scatter(sell_points['date'], sell_points['portfolio_value'], 
                    color='red', marker='v', s=100, label='卖出', zorder=5)
@@ -167,13 +172,13 @@ def visualize_comparison(results):
         df = result['dataframe']
         ax2.plot(df['date'], df['portfolio_value'], '-', label=f"{strategy_name} - 策略", linewidth=2)
         # 标记买入点
-        buy_points = df[df['action'] == 'BUY']
+        buy_points = df[df['action'].isin(['BUY', 'BUY_SELL'])]
         if not buy_points.empty:
             ax2.scatter(buy_points['date'], buy_points['portfolio_value'], 
                    color='green', marker='^', s=100, label='买入', zorder=5)
-    
+        
         # 标记卖出点
-        sell_points = df[df['action'] == 'SELL']
+        sell_points = df[df['action'].isin(['SELL', 'BUY_SELL'])]
         if not sell_points.empty:
             ax2.scatter(sell_points['date'], sell_points['portfolio_value'], 
                    color='red', marker='v', s=100, label='卖出', zorder=5)
@@ -217,17 +222,18 @@ def visualize_comparison(results):
     plt.savefig('results/strategy_comparison.png', dpi=300, bbox_inches='tight')
     plt.show()
 
-def daily_check(df, strategy_name='macd'):
-    """每日检查交易信号"""
+def daily_check(df, strategy_name='macd', latest_signal=None):
+    """每日检查交易信号（传入latest_signal时直接使用，不再重新回测）"""
     print(f"\n{'='*60}")
     print(f"每日交易信号检查 - {datetime.now().date()}")
     print(f"策略: {strategy_name.upper()}")
     print(f"{'='*60}")
     
     # 执行策略
-    result_df, strategy, performance, latest_signal = execute_trading_strategy(
-        strategy_name, df
-    )
+    if latest_signal is None:
+        result_df, strategy, performance, latest_signal = execute_trading_strategy(
+            strategy_name, df
+        )
     
     if latest_signal:
         print(f"\n📅 日期: {latest_signal['date']}")
@@ -254,18 +260,177 @@ def daily_check(df, strategy_name='macd'):
     
     return latest_signal
 
-def main():
-    """主函数"""
+def write_summary_report(performances, path='results/summary_report.txt'):
+    """保存总结报告"""
+    with open(path, 'w') as f:
+        f.write("交易策略总结报告\n")
+        f.write("=" * 50 + "\n\n")
+        
+        for strategy_name, performance in performances.items():
+            f.write(f"策略: {strategy_name.upper()}\n")
+            f.write("-" * 30 + "\n")
+            
+            for key, value in performance.items():
+                f.write(f"{key}: {value}\n")
+            
+            f.write("\n")
+    return path
+
+def build_pipeline(strategies=('macd', 'rsi', 'ma'), data_path=None, daily_strategy='macd',
+                   max_workers=4):
+    """
+    构建主流程的计算图，每个阶段只在被请求时计算一次
+    
+    阶段:
+        data: 加载并预处理数据
+        strategy:<策略> → signals:<策略>（指标在生成信号时计算）→ backtest:<策略>
+        metrics:<策略>、latest_signal:<策略>、results:<策略>（保存结果CSV）
+        report: 打印各策略报告并保存总结报告
+        loaded → data / validation: 数据检查结果
+        allocation: 按config.ALLOCATION_CONFIG分配资金后的多策略组合
+        attribution: 各策略相对config.BENCHMARK_PATH基准的alpha、beta等（配置了基准时）
+        plot: 策略对比图
+        daily_check: 每日信号检查
+    
+    Args:
+        strategies: 参与比较的策略
+        data_path: 数据路径（缺省使用config.DATA_PATH）
+        daily_strategy: 每日检查使用的策略
+        max_workers: 互不依赖的阶段并发执行的线程数
+    
+    Returns:
+        pipeline: Pipeline实例，用pipeline.run('metrics:macd')等获取输出
+    """
+    initial_capital = config.TRADING_CONFIG['initial_capital']
+    trading_config = {k: v for k, v in config.TRADING_CONFIG.items() if k != 'initial_capital'}
+    names = list(dict.fromkeys(list(strategies) + [daily_strategy]))
+    
+    # 配置中的规则表达式策略可以像内置策略一样按名称使用
+    for rule_name, rule in config.RULE_STRATEGIES.items():
+        StrategyFactory.register_rule(rule_name, **rule)
+    
+    def load():
+        validation = dict(config.VALIDATION_CONFIG)
+        validator = None
+        if validation.pop('enabled'):
+            repair = validation.pop('repair')
+            validator = DataValidator(**validation)
+        else:
+            repair = None
+        return DataLoader.prepare_data(DataLoader.load_csv(data_path or config.DATA_PATH),
+                                       validator=validator, repair=repair, return_report=True)
+    
+    pipeline = Pipeline(max_workers=max_workers)
+    pipeline.add('loaded', load)
+    pipeline.add('data', lambda loaded: loaded[0], deps=('loaded',))
+    pipeline.add('validation', lambda loaded: loaded[1], deps=('loaded',))
+    
+    for name in names:
+        def create(name=name):
+            return StrategyFactory.create_strategy(name, **config.STRATEGY_CONFIGS.get(name, {}))
+        
+        def backtest(df, strategy, signals):
+            # 各策略并发回测，交易明细在report阶段按顺序输出
+            return strategy.execute_strategy(df, initial_capital=initial_capital, signals=signals,
+                                             verbose=False, **trading_config)
+        
+        def save(result_df, name=name):
+            path = f"results/{name}_results.csv"
+            result_df.to_csv(path, index=False)
+            return path
+        
+        # 单个策略出错时只影响该策略的阶段（结果为StageFailure），不中断其他策略
+        pipeline.add(f'strategy:{name}', create, isolate=True)
+        pipeline.add(f'signals:{name}', lambda df, strategy: strategy.generate_signals(strategy.price_input(df)),
+                     deps=('data', f'strategy:{name}'), isolate=True)
+        pipeline.add(f'backtest:{name}', backtest,
+                     deps=('data', f'strategy:{name}', f'signals:{name}'), isolate=True)
+        pipeline.add(f'metrics:{name}', lambda result_df: PerformanceAnalyzer.analyze_performance(result_df, initial_capital),
+                     deps=(f'backtest:{name}',), isolate=True)
+        pipeline.add(f'latest_signal:{name}', lambda strategy, result_df: strategy.get_daily_signal(result_df),
+                     deps=(f'strategy:{name}', f'backtest:{name}'), isolate=True)
+        pipeline.add(f'results:{name}', save, deps=(f'backtest:{name}',), isolate=True)
+    
+    strategies = list(strategies)
+    
+    report_stages = ('strategy', 'backtest', 'metrics', 'latest_signal', 'results')
+    
+    def report(*outputs):
+        performances = {}
+        for i, name in enumerate(strategies):
+            strategy, result_df, performance, latest_signal, _ = outputs[i * len(report_stages):(i + 1) * len(report_stages)]
+            print(f"\n执行 {name.upper()} 策略...")
+            if isinstance(performance, StageFailure):
+                print(f"执行策略 {name} 时出错: {performance.error}")
+                continue
+            for line in strategy.trade_log(result_df):
+                print(line)
+            print(PerformanceAnalyzer.generate_report(strategy.name, performance, latest_signal))
+            performances[name] = performance
+        return write_summary_report(performances)
+    
+    pipeline.add('report', report, deps=[f'{stage}:{name}' for name in strategies for stage in report_stages])
+    
+    def successful(frames):
+        """出错的策略不参与组合、归因和绘图"""
+        return StageFailure.split(strategies, frames)[0]
+    
+    def allocation(*frames):
+        frames = successful(frames)
+        if not frames:
+            return None
+        return CapitalAllocator(**config.ALLOCATION_CONFIG).combine_results(frames, initial_capital)
+    
+    def attribution(benchmark, *frames):
+        frames = successful(frames)
+        return BenchmarkAttribution.from_results(frames, benchmark) if frames else None
+    
+    def check(df, latest_signal):
+        if isinstance(latest_signal, StageFailure):
+            print(f"执行策略 {daily_strategy} 时出错: {latest_signal.error}")
+            return None
+        return daily_check(df, daily_strategy, latest_signal)
+    
+    pipeline.add('allocation', allocation, deps=[f'backtest:{name}' for name in strategies])
+    if config.BENCHMARK_PATH:
+        pipeline.add('benchmark', lambda: DataLoader.load_csv(config.BENCHMARK_PATH).set_index('date')['close'])
+        pipeline.add('attribution', attribution, deps=['benchmark'] + [f'backtest:{name}' for name in strategies])
+    # matplotlib不是线程安全的，绘图阶段在主线程执行
+    pipeline.add('plot', lambda *frames: visualize_comparison(
+        {name: {'dataframe': frame} for name, frame in successful(frames).items()}
+    ), deps=[f'backtest:{name}' for name in strategies], concurrent=False)
+    pipeline.add('daily_check', check, deps=('data', f'latest_signal:{daily_strategy}'), concurrent=False)
+    return pipeline
+
+def main(targets=None):
+    """
+    主函数
+    
+    Args:
+        targets: 需要的输出阶段（如['metrics:macd']），只计算这些阶段及其依赖；
+            缺省时生成完整的报告、图表和每日检查
+    """
     print("=" * 60)
     print("模块化交易策略系统")
     print("=" * 60)
     
+    pipeline = build_pipeline()
+    
+    if targets:
+        outputs = pipeline.run(*targets)
+        print(f"\n已计算阶段: {', '.join(pipeline.run_counts)}")
+        return outputs
+    
     # 1. 加载数据
     print("\n1. 加载数据...")
-    df = DataLoader.load_csv(config.DATA_PATH)
-    df = DataLoader.prepare_data(df)
+    df = pipeline.run('data')
     print(f"   数据范围: {df['date'].min().date()} 到 {df['date'].max().date()}")
     print(f"   数据行数: {len(df)}")
+    validation = pipeline.run('validation')
+    if validation is not None and len(validation):
+        print("   数据质量问题:")
+        for _, row in validation.iterrows():
+            print(f"   - {row['check']}: {row['count']}行（首次 {row['first_date'].date()}）")
     
     # 2. 显示可用策略
     print("\n2. 可用策略:")
@@ -274,42 +439,30 @@ def main():
         print(f"   - {key}: {info['name']}")
         print(f"     描述: {info['description']}")
     
-    # 3. 执行单个策略
-    print("\n3. 执行MACD策略...")
-    macd_results = execute_trading_strategy('macd', df)
-    
-    # 4. 比较多个策略
-    print("\n4. 比较多个策略...")
-    strategies_to_compare = ['macd', 'rsi', 'ma']
-    comparison_results = compare_strategies(df, strategies_to_compare)
-    
-    # 5. 可视化比较结果
-    print("\n5. 生成可视化图表...")
-    visualize_comparison(comparison_results)
-    
-    # 6. 每日检查
-    print("\n6. 每日信号检查...")
-    latest_signal = daily_check(df, 'macd')
-    
-    # 7. 保存总结报告
-    print("\n7. 生成总结报告...")
-    with open('results/summary_report.txt', 'w') as f:
-        f.write("交易策略总结报告\n")
-        f.write("=" * 50 + "\n\n")
-        
-        for strategy_name, result in comparison_results.items():
-            f.write(f"策略: {strategy_name.upper()}\n")
-            f.write("-" * 30 + "\n")
-            
-            performance = result['performance']
-            for key, value in performance.items():
-                f.write(f"{key}: {value}\n")
-            
-            f.write("\n")
+    # 3. 比较多个策略（各策略的回测并发执行，每个策略只回测一次）
+    print("\n3. 比较多个策略...")
+    pipeline.run('report')
+    allocation = pipeline.run('allocation')
+    if allocation is not None:
+        equity = allocation['equity']
+        drawdown = (equity / equity.cummax() - 1).min() * 100
+        print(f"\n多策略组合（{config.ALLOCATION_CONFIG['method']}）:")
+        print(f"   最终价值: {equity.iloc[-1]:,.2f}，总收益: {(equity.iloc[-1] / equity.iloc[0] - 1) * 100:.2f}%，"
+              f"最大回撤: {drawdown:.2f}%")
+        weights = allocation['weights'].iloc[-1]
+        print("   当前权重: " + "，".join(f"{name.upper()} {weight:.1%}" for name, weight in weights.items()))
+    
+    # 4. 可视化比较结果
+    print("\n4. 生成可视化图表...")
+    pipeline.run('plot')
+    
+    # 5. 每日检查（复用MACD的回测结果）
+    print("\n5. 每日信号检查...")
+    pipeline.run('daily_check')
     
     print(f"\n✅ 所有结果已保存到 'results/' 目录")
     print("✅ 总结报告: results/summary_report.txt")
     print("✅ 策略对比图: results/strategy_comparison.png")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(sys.argv[1:] or None)
@@ -2,28 +2,71 @@
 from .macd_strategy import MACDStrategy
 from .rsi_strategy import RSIStrategy
 from .ma_strategy import MAStrategy
+from .bollinger_strategy import BollingerStrategy
+from .obv_strategy import OBVStrategy
+from .pairs_strategy import PairsStrategy
+from .rule_strategy import RuleStrategy
 
 class StrategyFactory:
     """策略工厂类"""
     
+    # 以规则表达式注册的策略：{名称: {'entry', 'exit', 'description'}}
+    _rule_strategies = {}
+    
+    @staticmethod
+    def register_rule(name, entry, exit, description=''):
+        """
+        注册规则表达式策略，之后可以用create_strategy(name)创建
+        
+        表达式在注册时编译一次以检查语法和指标名称。
+        """
+        RuleStrategy(entry, exit, name=name)
+        StrategyFactory._rule_strategies[name.lower()] = {
+            'entry': entry,
+            'exit': exit,
+            'description': description
+        }
+    
     @staticmethod
-    def create_strategy(strategy_name, **params):
-        """创建策略实例"""
-        strategy_name = strategy_name.lower()
+    def create_strategy(strategy_name, adjusted=False, **params):
+        """
+        创建策略实例
         
-        if strategy_name in ['macd', 'macd_strategy']:
+        Args:
+            strategy_name: 策略名称
+            adjusted: 是否使用复权价格
+            **params: 策略参数
+        """
+        strategy = StrategyFactory._create(strategy_name.lower(), **params)
+        strategy.adjusted = adjusted
+        return strategy
+    
+    @staticmethod
+    def _create(strategy_name, **params):
+        if strategy_name in StrategyFactory._rule_strategies:
+            rule = StrategyFactory._rule_strategies[strategy_name]
+            return RuleStrategy(rule['entry'], rule['exit'], name=strategy_name, **params)
+        elif strategy_name in ['macd', 'macd_strategy']:
             return MACDStrategy(**params)
         elif strategy_name in ['rsi', 'rsi_strategy']:
             return RSIStrategy(**params)
         elif strategy_name in ['ma', 'moving_average', 'ma_strategy']:
             return MAStrategy(**params)
+        elif strategy_name in ['bollinger', 'bollinger_strategy', 'bb']:
+            return BollingerStrategy(**params)
+        elif strategy_name in ['obv', 'obv_strategy']:
+            return OBVStrategy(**params)
+        elif strategy_name in ['pairs', 'pairs_strategy', 'spread']:
+            return PairsStrategy(**params)
+        elif strategy_name in ['rule', 'rule_strategy']:
+            return RuleStrategy(**params)
         else:
             raise ValueError(f"未知策略: {strategy_name}")
     
     @staticmethod
     def get_available_strategies():
         """获取可用策略列表"""
-        return {
+        strategies = {
             'macd': {
                 'name': 'MACD Strategy',
                 'description': '移动平均收敛发散指标策略',
@@ -49,5 +92,47 @@ class StrategyFactory:
                     'short_window': 20,
                     'long_window': 50
                 }
+            },
+            'bollinger': {
+                'name': 'Bollinger Band Strategy',
+                'description': '布林带均值回归策略（波动率）',
+                'params': {
+                    'window': 20,
+                    'num_std': 2.0
+                }
+            },
+            'obv': {
+                'name': 'OBV Strategy',
+                'description': '能量潮成交量趋势策略',
+                'params': {
+                    'ma_window': 20
+                }
+            },
+            'pairs': {
+                'name': 'Pairs Spread Strategy',
+                'description': '配对价差均值回归策略（需要对冲腿价格partner_close）',
+                'params': {
+                    'window': 60,
+                    'entry_z': 2.0,
+                    'exit_z': 0.0
+                }
+            },
+            'rule': {
+                'name': 'Rule Strategy',
+                'description': '规则表达式策略（如 cross_above(macd, signal_line) & rsi_14 < 70）',
+                'params': {
+                    'entry': None,
+                    'exit': None
+                }
+            }
+        }
+        for name, rule in StrategyFactory._rule_strategies.items():
+            strategies[name] = {
+                'name': name,
+                'description': rule['description'] or f"买入: {rule['entry']}；卖出: {rule['exit']}",
+                'params': {
+                    'entry': rule['entry'],
+                    'exit': rule['exit']
+                }
             }
-        }
\ No newline at end of file
+        return strategies
\ No newline at end of file
@@ -0,0 +1,479 @@
+# trading_strategies/strategy/backtest_engine.py
+import numpy as np
+
+from utils import kernels
+from utils.indicators import Indicators
+from .signal_events import SignalEvents
+
+# 交易动作编码
+ACTION_HOLD = 0
+ACTION_BUY = 1
+ACTION_SELL = -1
+# 同一根K线开仓并平仓（开盘价成交后当根K线触发风控）
+ACTION_ROUND_TRIP = 2
+
+# 平仓原因
+EXIT_SIGNAL = 'signal'
+EXIT_STOP_LOSS = 'stop_loss'
+EXIT_TAKE_PROFIT = 'take_profit'
+EXIT_TRAILING_STOP = 'trailing_stop'
+EXIT_MAX_HOLDING = 'max_holding'
+
+# 信号成交模型：信号K线收盘价、下一根K线开盘价、下一根K线的近似VWAP（OHLC均价）
+FILL_CLOSE = 'close'
+FILL_NEXT_OPEN = 'next_open'
+FILL_NEXT_VWAP = 'next_vwap'
+
+
+class BacktestEngine:
+    """基于数组的回测引擎
+    
+    引擎只在有信号的K线之间跳转：每笔交易的止损、止盈、移动止损和最长持仓
+    检查都在该笔交易的持仓区间上用累计最大值一次性完成，不逐根K线循环。
+    """
+    
+    @staticmethod
+    def average_true_range(high, low, close, period=14, origin=0):
+        """计算ATR（真实波幅的简单移动平均），origin为第一根K线在整段数据中的位置"""
+        return Indicators.atr(high, low, close, period, origin=origin)[:, 0]
+    
+    @staticmethod
+    def fill_prices(close, open_, high, low, fill_model=FILL_CLOSE):
+        """
+        信号成交价数组和成交延迟
+        
+        成交模型只决定两件事：信号后第几根K线成交（延迟），以及该K线的哪个价格成交。
+        回测时把信号位置整体平移延迟根K线、按成交价数组取价，不在逐根K线上分支。
+        
+        Returns:
+            (成交价数组, 延迟K线数)
+        """
+        if fill_model == FILL_CLOSE:
+            return close, 0
+        if fill_model == FILL_NEXT_OPEN:
+            prices = open_
+        elif fill_model == FILL_NEXT_VWAP:
+            prices = (open_ + high + low + close) / 4
+        else:
+            raise ValueError(f"未知成交模型: {fill_model}")
+        # 缺少开盘价等数据的K线按收盘价成交
+        return np.where(np.isnan(prices), close, prices), 1
+    
+    @staticmethod
+    def _scan_start(entry_bar, fill_model):
+        """
+        开仓后风控检查的起始K线
+        
+        按开盘价成交时，开仓K线开盘之后的最高/最低价已属于持仓期，从开仓K线开始检查；
+        按收盘价成交时从下一根K线开始。按VWAP（OHLC均价）成交时无法确定成交时点与
+        该K线最高/最低价的先后，同样从下一根K线开始，不用成交K线的盘中价格触发风控。
+        """
+        return entry_bar if fill_model == FILL_NEXT_OPEN else entry_bar + 1
+    
+    @staticmethod
+    def _open_trade(entry_bar, entry_price, shares, atr, rules, at_open=False):
+        """
+        创建持仓记录（含移动止损的参考价）
+        
+        at_open为True（开盘成交）时开仓K线的ATR尚未确定，ATR移动止损从下一根K线开始生效
+        """
+        atr_multiple = rules.get('trailing_atr_multiple')
+        if atr_multiple and not at_open:
+            ref_atr = entry_price - atr_multiple * atr[entry_bar]
+        else:
+            ref_atr = -np.inf
+        return {
+            'entry_bar': entry_bar,
+            'entry_price': entry_price,
+            'shares': shares,
+            'exit_bar': None,
+            'exit_price': np.nan,
+            'exit_reason': None,
+            # 移动止损参考价：截至已处理K线的最高价 / 最高价减ATR倍数
+            'ref_high': entry_price,
+            'ref_atr': ref_atr,
+            # 已持有的K线数（不含开仓K线）
+            'held': 0,
+            # 是否在开仓K线开盘时成交（开仓K线的盘中价格属于持仓期）
+            'at_open': at_open,
+        }
+    
+    @staticmethod
+    def _risk_exit(trade, lo, hi, open_, high, low, close, atr, rules, at_entry=False):
+        """在持仓区间[lo, hi)内查找第一个风控出场点（at_entry表示lo为开仓K线）
+        
+        Returns:
+            (出场K线, 原始成交价, 原因)；区间内未触发时返回None
+        """
+        if lo >= hi:
+            return None
+        
+        seg_open = open_[lo:hi]
+        seg_high = high[lo:hi]
+        seg_low = low[lo:hi]
+        n = hi - lo
+        entry_price = trade['entry_price']
+        
+        # 候选出场：(区间内位置, 成交价, 原因, 优先级)，同一根K线上不利出场优先
+        candidates = []
+        
+        def first_hit(mask):
+            pos = int(np.argmax(mask))
+            return pos if mask[pos] else None
+        
+        stop_loss = rules.get('stop_loss')
+        if stop_loss:
+            level = entry_price * (1 - stop_loss)
+            pos = first_hit(seg_low <= level)
+            if pos is not None:
+                candidates.append((pos, min(seg_open[pos], level), EXIT_STOP_LOSS, 0))
+        
+        trailing_stop = rules.get('trailing_stop')
+        atr_multiple = rules.get('trailing_atr_multiple')
+        if trailing_stop or atr_multiple:
+            # 止损位只使用截至上一根K线的最高价，避免同一根K线内先后顺序不明；
+            # 内核在第一次触发处停止，不必扫描整个持仓区间
+            hits = []
+            if trailing_stop:
+                hits.append(kernels.first_trailing_hit(
+                    seg_low, seg_high, trade['ref_high'], 1 - trailing_stop, 0, n
+                ))
+            if atr_multiple:
+                hits.append(kernels.first_trailing_hit(
+                    seg_low, seg_high - atr_multiple * atr[lo:hi], trade['ref_atr'], 1.0, 0, n
+                ))
+            hits = [hit for hit in hits if hit[0] >= 0]
+            if hits:
+                # 两种止损同时设置时止损位取较高者，即较早触发者
+                pos = min(hit[0] for hit in hits)
+                level = max(hit[1] for hit in hits if hit[0] == pos)
+                candidates.append((pos, min(seg_open[pos], level), EXIT_TRAILING_STOP, 0))
+        
+        take_profit = rules.get('take_profit')
+        if take_profit:
+            level = entry_price * (1 + take_profit)
+            pos = first_hit(seg_high >= level)
+            if pos is not None:
+                candidates.append((pos, max(seg_open[pos], level), EXIT_TAKE_PROFIT, 1))
+        
+        max_holding_bars = rules.get('max_holding_bars')
+        if max_holding_bars:
+            pos = max_holding_bars - 1 - trade['held'] + at_entry
+            if 0 <= pos < n:
+                candidates.append((pos, close[lo + pos], EXIT_MAX_HOLDING, 2))
+        
+        if not candidates:
+            return None
+        
+        pos, price, reason, _ = min(candidates, key=lambda c: (c[0], c[3]))
+        return lo + pos, price, reason
+    
+    @staticmethod
+    def _find_exit(trade, entry_bar, lo, sell_idx, fill_px, delay, open_, high, low, close, atr, rules):
+        """
+        持仓的出场点：开仓后的第一个卖出信号，以及此前触发的风控出场
+        （风控从lo开始检查，lo等于entry_bar时包含开仓K线，见_scan_start）
+        
+        Returns:
+            (出场K线, 原始成交价, 原因)；持仓至数据结束时返回None
+        """
+        j = int(np.searchsorted(sell_idx, entry_bar, side='right'))
+        signal_exit = int(sell_idx[j]) if j < len(sell_idx) else None
+        # 收盘成交时出场K线盘中仍可能触发止损；开盘成交时信号先于出场K线的盘中价格
+        hi = signal_exit + (delay == 0) if signal_exit is not None else len(close)
+        
+        exit_info = None
+        if any(rules.values()):
+            exit_info = BacktestEngine._risk_exit(
+                trade, lo, hi, open_, high, low, close, atr, rules, at_entry=lo == entry_bar
+            )
+        if exit_info is None and signal_exit is not None:
+            exit_info = (signal_exit, fill_px[signal_exit], EXIT_SIGNAL)
+        return exit_info
+    
+    @staticmethod
+    def _carry_trade(trade, lo, hi, high, atr, rules, at_entry=False):
+        """持仓延续到下一个数据块时，更新移动止损参考价和持有K线数（开仓K线不计入持有K线数）"""
+        if lo >= hi:
+            return
+        trade['ref_high'] = max(trade['ref_high'], np.nanmax(high[lo:hi]))
+        atr_multiple = rules.get('trailing_atr_multiple')
+        if atr_multiple:
+            trade['ref_atr'] = np.fmax(
+                trade['ref_atr'], np.fmax.reduce(high[lo:hi] - atr_multiple * atr[lo:hi])
+            )
+        trade['held'] += hi - lo - at_entry
+    
+    @staticmethod
+    def _equity_summary(close, fill_bars, cash_levels, share_levels):
+        """由成交点计算期末价值和最大回撤（%）
+        
+        空仓区间的权益是常数，只取一个点；持仓区间用切片一次算出，不逐根K线循环。
+        """
+        bounds = np.concatenate(([0], fill_bars, [len(close)]))
+        pieces = []
+        for k in range(len(bounds) - 1):
+            lo, hi = bounds[k], bounds[k + 1]
+            if lo >= hi:
+                continue
+            if share_levels[k]:
+                pieces.append(cash_levels[k] + share_levels[k] * close[lo:hi])
+            else:
+                pieces.append(np.array([cash_levels[k]]))
+        if not pieces:
+            return cash_levels[-1], 0.0
+        
+        equity = np.concatenate(pieces)
+        running_peak = np.maximum.accumulate(equity)
+        max_drawdown = ((equity - running_peak) / running_peak).min() * 100
+        return equity[-1], max_drawdown
+    
+    @staticmethod
+    def trade_graph(close, signals, open_=None, high=None, low=None, slippage=0.0, stop_loss=None,
+                    take_profit=None, trailing_stop=None, trailing_atr_multiple=None, atr_period=14,
+                    max_holding_bars=None, fill_model=FILL_CLOSE, atr=None):
+        """
+        从每个买入成交点开仓时的交易（与资金无关的部分）
+        
+        出场K线和成交价只取决于开仓K线，与开仓时的资金和股数无关；平仓后下一笔交易是
+        出场K线之后的第一个买入成交点。因此任意起点的回测都是这张图上的一条路径，
+        不必重新回测（参数与run相同，手续费和仓位比例在沿路径计算资金时使用）。
+        
+        Returns:
+            graph: 字典，各数组按买入成交点排列：
+                entry_bar / entry_price（含滑点）/ exit_bar（持仓至结束为-1）/
+                exit_price（含滑点）/ exit_reason / next（平仓后下一笔交易的序号，没有时为买入点个数），
+                以及成交延迟delay（第i根K线起的回测只使用i + delay及之后的买入成交点）
+        """
+        close = np.asarray(close, dtype=float)
+        open_ = close if open_ is None else np.asarray(open_, dtype=float)
+        high = close if high is None else np.asarray(high, dtype=float)
+        low = close if low is None else np.asarray(low, dtype=float)
+        n = len(close)
+        
+        rules = {
+            'stop_loss': stop_loss,
+            'take_profit': take_profit,
+            'trailing_stop': trailing_stop,
+            'trailing_atr_multiple': trailing_atr_multiple,
+            'max_holding_bars': max_holding_bars,
+        }
+        if trailing_atr_multiple and atr is None:
+            atr = BacktestEngine.average_true_range(high, low, close, atr_period)
+        if not isinstance(signals, SignalEvents):
+            signals = SignalEvents.from_dense(signals)
+        fill_px, delay = BacktestEngine.fill_prices(close, open_, high, low, fill_model)
+        
+        buy_idx = signals.buys() + delay
+        sell_idx = signals.sells() + delay
+        buy_idx = buy_idx[buy_idx < n]
+        sell_idx = sell_idx[sell_idx < n]
+        
+        m = len(buy_idx)
+        entry_price = fill_px[buy_idx] * (1 + slippage)
+        exit_bar = np.full(m, -1, dtype=np.int64)
+        exit_price = np.full(m, np.nan)
+        exit_reason = np.full(m, None, dtype=object)
+        for k in range(m):
+            bar = int(buy_idx[k])
+            lo = BacktestEngine._scan_start(bar, fill_model)
+            trade = BacktestEngine._open_trade(bar, entry_price[k], 1, atr, rules, at_open=lo == bar)
+            exit_info = BacktestEngine._find_exit(
+                trade, bar, lo, sell_idx, fill_px, delay, open_, high, low, close, atr, rules
+            )
+            if exit_info is not None:
+                exit_bar[k], raw_price, exit_reason[k] = exit_info
+                exit_price[k] = raw_price * (1 - slippage)
+        
+        following = np.searchsorted(buy_idx, np.where(exit_bar >= 0, exit_bar + 1, n))
+        return {
+            'entry_bar': buy_idx.astype(np.int64),
+            'entry_price': entry_price,
+            'exit_bar': exit_bar,
+            'exit_price': exit_price,
+            'exit_reason': exit_reason,
+            'next': following.astype(np.int64),
+            'delay': delay,
+        }
+    
+    @staticmethod
+    def run(close, signals, open_=None, high=None, low=None, initial_capital=100000,
+            commission_rate=0.0, slippage=0.0, position_size=1.0, stop_loss=None,
+            take_profit=None, trailing_stop=None, trailing_atr_multiple=None,
+            atr_period=14, max_holding_bars=None, fill_model=FILL_CLOSE, atr=None, state=None,
+            per_bar=True):
+        """
+        执行回测
+        
+        Args:
+            close: 收盘价数组
+            signals: 信号数组（1买入，-1卖出，0无信号）或稀疏信号SignalEvents
+            open_/high/low: 开盘/最高/最低价数组，用于盘中止损止盈判断（缺省时使用收盘价）
+            initial_capital: 初始资金
+            commission_rate: 手续费率（买卖双向收取）
+            slippage: 滑点比例（买入价上浮、卖出价下浮）
+            position_size: 每次开仓使用的资金比例
+            stop_loss: 固定止损比例
+            take_profit: 止盈比例
+            trailing_stop: 百分比移动止损
+            trailing_atr_multiple: ATR移动止损倍数
+            atr_period: ATR周期
+            max_holding_bars: 最长持仓K线数
+            fill_model: 信号成交模型，'close'（信号K线收盘价）、'next_open'（下一根K线开盘价）
+                或'next_vwap'（下一根K线OHLC均价）；止损止盈按触发价成交，不受影响。
+                'next_open'时开仓K线开盘后的盘中价格即可触发止损止盈；'next_vwap'无法确定
+                成交时点与盘中高低点的先后，与'close'相同从开仓后的下一根K线开始检查
+            atr: 预先计算的ATR数组（分块回测时传入，缺省时按atr_period计算）
+            state: 上一个数据块结束时的账户状态（分块回测时传入）
+            per_bar: 是否展开逐K线序列；为False时只在成交之间跳转，
+                返回期末价值和最大回撤，耗时与内存取决于交易笔数
+        
+        Returns:
+            result: 包含逐K线持仓、现金、组合价值、交易明细、期末状态和计算后端的字典；
+                逐K线的action中同一根K线开仓并平仓的交易记为ACTION_ROUND_TRIP
+        """
+        close = np.asarray(close, dtype=float)
+        open_ = close if open_ is None else np.asarray(open_, dtype=float)
+        high = close if high is None else np.asarray(high, dtype=float)
+        low = close if low is None else np.asarray(low, dtype=float)
+        n = len(close)
+        
+        rules = {
+            'stop_loss': stop_loss,
+            'take_profit': take_profit,
+            'trailing_stop': trailing_stop,
+            'trailing_atr_multiple': trailing_atr_multiple,
+            'max_holding_bars': max_holding_bars,
+        }
+        if trailing_atr_multiple and atr is None:
+            atr = BacktestEngine.average_true_range(high, low, close, atr_period)
+        
+        if not isinstance(signals, SignalEvents):
+            signals = SignalEvents.from_dense(signals)
+        fill_px, delay = BacktestEngine.fill_prices(close, open_, high, low, fill_model)
+        
+        if state is None:
+            cash = float(initial_capital)
+            trade = None
+            pending = 0
+        else:
+            cash = state['cash']
+            trade = state['open_trade']
+            pending = state.get('pending', 0)
+        
+        # 信号位置平移为成交位置；上一块最后一根K线的信号在本块第一根K线成交
+        buy_idx = signals.buys() + delay
+        sell_idx = signals.sells() + delay
+        if pending:
+            if pending > 0:
+                buy_idx = np.concatenate(([0], buy_idx))
+            else:
+                sell_idx = np.concatenate(([0], sell_idx))
+        # 成交位置超出本块的信号留到下一块
+        pending = 1 if len(buy_idx) and buy_idx[-1] >= n else -1 if len(sell_idx) and sell_idx[-1] >= n else 0
+        buy_idx = buy_idx[buy_idx < n]
+        sell_idx = sell_idx[sell_idx < n]
+        
+        # 每次成交后的K线位置、现金和持股，用于一次性展开逐K线序列
+        fill_bars = []
+        cash_levels = [cash]
+        share_levels = [trade['shares'] if trade is not None else 0]
+        trades = []
+        
+        start = 0
+        while True:
+            if trade is None:
+                # 查找下一次可成交的买入信号
+                k = int(np.searchsorted(buy_idx, start))
+                entry_bar = None
+                while k < len(buy_idx):
+                    bar = int(buy_idx[k])
+                    fill_price = fill_px[bar] * (1 + slippage)
+                    shares = int(cash * position_size / (fill_price * (1 + commission_rate)))
+                    if shares > 0:
+                        entry_bar = bar
+                        break
+                    k += 1
+                if entry_bar is None:
+                    break
+                
+                cash -= shares * fill_price * (1 + commission_rate)
+                fill_bars.append(entry_bar)
+                cash_levels.append(cash)
+                share_levels.append(shares)
+                lo = BacktestEngine._scan_start(entry_bar, fill_model)
+                trade = BacktestEngine._open_trade(entry_bar, fill_price, shares, atr, rules,
+                                                   at_open=lo == entry_bar)
+            else:
+                # 上一个数据块延续下来的持仓
+                entry_bar = -1
+                lo = 0
+            trades.append(trade)
+            
+            exit_info = BacktestEngine._find_exit(
+                trade, entry_bar, lo, sell_idx, fill_px, delay, open_, high, low, close, atr, rules
+            )
+            if exit_info is None:
+                # 持仓至数据结束
+                BacktestEngine._carry_trade(trade, lo, n, high, atr, rules, at_entry=lo == entry_bar)
+                break
+            
+            exit_bar, raw_price, reason = exit_info
+            exit_price = raw_price * (1 - slippage)
+            cash += trade['shares'] * exit_price * (1 - commission_rate)
+            fill_bars.append(exit_bar)
+            cash_levels.append(cash)
+            share_levels.append(0)
+            trade.update(exit_bar=exit_bar, exit_price=exit_price, exit_reason=reason)
+            trade = None
+            start = exit_bar + 1
+        
+        fill_bars = np.asarray(fill_bars, dtype=np.int64)
+        if not per_bar:
+            final_value, max_drawdown = BacktestEngine._equity_summary(
+                close, fill_bars, cash_levels, share_levels
+            )
+            return {
+                'final_value': final_value,
+                'max_drawdown': max_drawdown,
+                'fill_bars': fill_bars,
+                'trades': trades,
+                'state': {'cash': cash, 'open_trade': trade, 'pending': pending},
+                'kernel_backend': kernels.BACKEND,
+            }
+        
+        # 展开逐K线序列
+        level_idx = np.searchsorted(fill_bars, np.arange(n), side='right')
+        cash_arr = np.asarray(cash_levels, dtype=float)[level_idx]
+        shares_arr = np.asarray(share_levels, dtype=np.int64)[level_idx]
+        position = (shares_arr > 0).astype(np.int64)
+        portfolio_value = cash_arr + shares_arr * close
+        
+        action = np.zeros(n, dtype=np.int8)
+        entry_price = np.full(n, np.nan)
+        exit_price = np.full(n, np.nan)
+        exit_reason = np.full(n, None, dtype=object)
+        continued = state['open_trade'] if state is not None else None
+        for t in trades:
+            if t is not continued:
+                action[t['entry_bar']] = ACTION_BUY
+                entry_price[t['entry_bar']] = t['entry_price']
+            if t['exit_bar'] is not None:
+                same_bar = t is not continued and t['exit_bar'] == t['entry_bar']
+                action[t['exit_bar']] = ACTION_ROUND_TRIP if same_bar else ACTION_SELL
+                exit_price[t['exit_bar']] = t['exit_price']
+                exit_reason[t['exit_bar']] = t['exit_reason']
+        
+        return {
+            'position': position,
+            'shares_held': shares_arr,
+            'cash': cash_arr,
+            'portfolio_value': portfolio_value,
+            'action': action,
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'exit_reason': exit_reason,
+            'trades': trades,
+            'state': {'cash': cash, 'open_trade': trade, 'pending': pending},
+            'kernel_backend': kernels.BACKEND,
+        }
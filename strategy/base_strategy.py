@@ -2,6 +2,16 @@
 from abc import ABC, abstractmethod
 import pandas as pd
 import numpy as np
+from utils.data_loader import DataLoader
+from utils.signal_index import DateIndex
+from .backtest_engine import BacktestEngine, ACTION_BUY, ACTION_SELL, ACTION_ROUND_TRIP, EXIT_SIGNAL
+from .signal_events import SignalEvents
+
+# 回测引擎接受的交易参数
+ENGINE_PARAMS = (
+    'commission_rate', 'slippage', 'position_size', 'stop_loss', 'take_profit',
+    'trailing_stop', 'trailing_atr_multiple', 'atr_period', 'max_holding_bars', 'fill_model'
+)
 
 class BaseTradingStrategy(ABC):
     """基础交易策略抽象类"""
@@ -11,6 +21,16 @@ class BaseTradingStrategy(ABC):
         self.params = params
         self.signals = None
         self.positions = None
+        self.trades = None
+        self._date_index = None
+        # 是否使用复权价格（由adjclose换算的OHLC）计算指标和回测
+        self.adjusted = False
+    
+    def price_input(self, df):
+        """
+        策略实际使用的数据：原始价格时直接返回df，复权价格时返回缓存的复权视图（不复制整个数据）
+        """
+        return DataLoader.adjusted(df, self.adjusted)
     
     @abstractmethod
     def calculate_indicators(self, df):
@@ -22,88 +42,182 @@ class BaseTradingStrategy(ABC):
         """生成交易信号"""
         pass
     
-    def execute_strategy(self, df, initial_capital=100000):
-        """执行交易策略"""
-        df = df.copy()
+    def generate_signal_events(self, df):
+        """生成稀疏信号事件（默认由generate_signals转换，子类可直接输出事件）"""
+        return SignalEvents.from_dense(self.generate_signals(df).values)
+    
+    def backtest_events(self, df, initial_capital=100000, **trading_params):
+        """
+        只按信号事件回测，不生成逐K线结果，适合大规模参数扫描
+        
+        Args:
+            df: 按日期升序的股票数据DataFrame
+            initial_capital: 初始资金
+            **trading_params: 交易参数（同execute_strategy）
+        
+        Returns:
+            result: 期末价值、最大回撤、成交K线和交易明细
+        """
+        df = self.price_input(df)
+        events = self.generate_signal_events(df)
+        engine_params = {k: v for k, v in trading_params.items() if k in ENGINE_PARAMS}
+        return BacktestEngine.run(
+            df['close'].values,
+            events,
+            open_=df['open'].values if 'open' in df.columns else None,
+            high=df['high'].values if 'high' in df.columns else None,
+            low=df['low'].values if 'low' in df.columns else None,
+            initial_capital=initial_capital,
+            per_bar=False,
+            **engine_params
+        )
+    
+    def execute_strategy(self, df, initial_capital=100000, signals=None, verbose=True, **trading_params):
+        """
+        执行交易策略
+        
+        Args:
+            df: 股票数据DataFrame
+            initial_capital: 初始资金
+            signals: 已经生成的信号（与按日期排序后的df逐行对应），缺省时调用generate_signals
+            verbose: 是否打印交易明细（并发回测时关闭，之后用trade_log按顺序输出）
+            **trading_params: 交易参数（手续费、滑点、仓位及止损止盈等，见config.TRADING_CONFIG）
+        """
+        df = self.price_input(df).copy()
         
         # 确保数据已排序
         if 'date' in df.columns:
             df = df.sort_values('date').reset_index(drop=True)
         
         # 生成信号
-        self.signals = self.generate_signals(df)
+        if signals is None:
+            self.signals = self.generate_signals(df)
+        else:
+            self.signals = pd.Series(np.asarray(signals), index=df.index)
         df['signal'] = self.signals
         
-        # 初始化策略列
-        df['action'] = 'HOLD'
-        df['position'] = 0
-        df['shares_held'] = 0
-        df['entry_price'] = np.nan
-        df['cash'] = initial_capital
-        df['portfolio_value'] = initial_capital
-        
-        position = 0
-        entry_price = 0
-        shares_held = 0
-        cash = initial_capital
-        
-        for i in range(len(df)):
-            current_price = df.loc[i, 'close']
-            current_date = df.loc[i, 'date']
-            signal = df.loc[i, 'signal']
-            
-            # 买入信号且当前没有持仓
-            if signal == 1 and position == 0:
-                # 计算可买入的股票数量
-                shares_to_buy = int(cash / current_price)
-                if shares_to_buy > 0:
-                    position = 1
-                    shares_held = shares_to_buy
-                    entry_price = current_price
-                    cash -= shares_to_buy * current_price
-                    df.loc[i, 'action'] = 'BUY'
-                    df.loc[i, 'entry_price'] = entry_price
-                    print(f"{current_date.date()}: 买入 {shares_to_buy}股 @ {current_price:.2f}")
-            
-            # 卖出信号且当前持有仓位
-            elif signal == -1 and position == 1:
-                if shares_held > 0:
-                    cash += shares_held * current_price
-                    profit = (current_price - entry_price) * shares_held
-                    profit_pct = (current_price / entry_price - 1) * 100
-                    df.loc[i, 'action'] = 'SELL'
-                    position = 0
-                    print(f"{current_date.date()}: 卖出 {shares_held}股 @ {current_price:.2f}, "
-                      f"盈利: ${profit:.2f} ({profit_pct:.2f}%)")
-                    shares_held = 0
-                    
-            
-            # 更新持仓信息
-            df.loc[i, 'position'] = position
-            df.loc[i, 'shares_held'] = shares_held
-            df.loc[i, 'cash'] = cash
-            df.loc[i, 'portfolio_value'] = cash + (shares_held * current_price if position == 1 else 0)
+        # 只保留引擎认识的交易参数
+        engine_params = {k: v for k, v in trading_params.items() if k in ENGINE_PARAMS}
+        result = BacktestEngine.run(
+            df['close'].values,
+            df['signal'].values,
+            open_=df['open'].values if 'open' in df.columns else None,
+            high=df['high'].values if 'high' in df.columns else None,
+            low=df['low'].values if 'low' in df.columns else None,
+            initial_capital=initial_capital,
+            **engine_params
+        )
+        
+        self._write_result_columns(df, result)
         
+        self.trades = result['trades']
+        # 交易列表随结果一起传给绩效分析，不必再按action列配对买卖
+        df.attrs['trades'] = result['trades']
         self.positions = df[['position', 'action', 'shares_held', 'entry_price']].copy()
+        if verbose:
+            for line in self.trade_log(df):
+                print(line)
         return df
     
-    def get_daily_signal(self, df, check_date=None):
-        """获取指定日期的信号"""
-        if check_date is not None:
-            df = df[df['date'] == check_date]
+    def trade_log(self, df, trades=None):
+        """
+        交易明细文本
+        
+        Args:
+            df: execute_strategy返回的结果DataFrame
+            trades: 交易列表（缺省为最近一次execute_strategy的交易）
+        
+        Returns:
+            lines: 每次买入、卖出一行
+        """
+        lines = []
+        for trade in self.trades if trades is None else trades:
+            entry_date = df.loc[trade['entry_bar'], 'date']
+            lines.append(f"{entry_date.date()}: 买入 {trade['shares']}股 @ {trade['entry_price']:.2f}")
+            if trade['exit_bar'] is not None:
+                exit_date = df.loc[trade['exit_bar'], 'date']
+                profit = (trade['exit_price'] - trade['entry_price']) * trade['shares']
+                profit_pct = (trade['exit_price'] / trade['entry_price'] - 1) * 100
+                reason = '' if trade['exit_reason'] == EXIT_SIGNAL else f" [{trade['exit_reason']}]"
+                lines.append(f"{exit_date.date()}: 卖出 {trade['shares']}股 @ {trade['exit_price']:.2f}, "
+                             f"盈利: ${profit:.2f} ({profit_pct:.2f}%){reason}")
+        return lines
+    
+    @staticmethod
+    def _write_result_columns(df, result):
+        """把回测引擎的逐K线结果写入DataFrame"""
+        df['action'] = np.select(
+            [result['action'] == ACTION_BUY, result['action'] == ACTION_SELL,
+             result['action'] == ACTION_ROUND_TRIP],
+            ['BUY', 'SELL', 'BUY_SELL'], default='HOLD'
+        )
+        df['position'] = result['position']
+        df['shares_held'] = result['shares_held']
+        df['entry_price'] = result['entry_price']
+        df['exit_price'] = result['exit_price']
+        df['exit_reason'] = result['exit_reason']
+        df['cash'] = result['cash']
+        df['portfolio_value'] = result['portfolio_value']
+    
+    @abstractmethod
+    def warmup_bars(self):
+        """分块计算信号时需要保留的历史K线数（分块回测、实时回放都依赖它，子类必须实现）"""
+        pass
+    
+    def generate_signals_chunk(self, chunk, state):
+        """
+        在一个数据块上生成信号，state在相邻数据块之间传递
+        
+        默认实现保留上一块末尾warmup_bars()根K线，与本块拼接后调用generate_signals，
+        适用于只依赖固定长度滚动窗口的指标。拼接后数据第一行在整段数据中的位置记录在
+        frame.attrs['origin']，滚动窗口指标按它对齐窗口的划分（见indicators.bar_origin），
+        结果与整体计算逐位一致。
         
+        Args:
+            chunk: 按日期升序的数据块
+            state: 信号状态字典（首块传入空字典，原地更新）
+        
+        Returns:
+            signals: 本块的信号数组
+        """
+        tail = state.get('tail')
+        if tail is not None:
+            frame = pd.concat([tail, chunk], ignore_index=True)
+        else:
+            frame = chunk.reset_index(drop=True)
+        frame.attrs['origin'] = state.get('rows', 0) + len(chunk) - len(frame)
+        
+        signals = self.generate_signals(frame)
+        state['tail'] = frame.iloc[-self.warmup_bars():].reset_index(drop=True)
+        state['rows'] = state.get('rows', 0) + len(chunk)
+        return signals.values[len(frame) - len(chunk):]
+    
+    def get_daily_signal(self, df, check_date=None):
+        """获取指定日期的信号（非交易日时取之前最近一个交易日）"""
         if len(df) == 0:
             return None
         
-        latest = df.iloc[-1]
+        if check_date is not None:
+            # 同一结果表的日期索引只建立一次，之后每次查询为二分查找
+            if self._date_index is None or self._date_index.frame is not df:
+                self._date_index = DateIndex(df)
+            latest = self._date_index.asof(check_date)
+            if latest is None:
+                return None
+        else:
+            latest = df.iloc[-1]
         
+        return self.build_signal_info(latest)
+    
+    def build_signal_info(self, row):
+        """由单行数据构造信号信息"""
         signal_info = {
             'strategy': self.name,
-            'date': latest.get('date'),
-            'close': latest.get('close'),
-            'signal': latest.get('signal', 0),
-            'action': latest.get('action', 'HOLD'),
-            'indicators': self._get_indicators_info(latest)
+            'date': row.get('date'),
+            'close': row.get('close'),
+            'signal': row.get('signal', 0),
+            'action': row.get('action', 'HOLD'),
+            'indicators': self._get_indicators_info(row)
         }
         
         return signal_info
@@ -0,0 +1,61 @@
+# trading_strategies/strategies/bollinger_strategy.py
+import pandas as pd
+import numpy as np
+from .base_strategy import BaseTradingStrategy
+from utils.indicators import Indicators, bar_origin
+
+class BollingerStrategy(BaseTradingStrategy):
+    """布林带均值回归策略（波动率）"""
+    
+    def __init__(self, window=20, num_std=2.0):
+        params = {
+            'window': window,
+            'num_std': num_std
+        }
+        super().__init__('Bollinger Band Strategy', **params)
+    
+    def calculate_indicators(self, df):
+        """计算布林带"""
+        df = df.copy()
+        
+        bands = Indicators.bollinger(df['close'].values, self.params['window'], self.params['num_std'],
+                                     origin=bar_origin(df))
+        df['bb_mid'] = bands[:, 0]
+        df['bb_upper'] = bands[:, 1]
+        df['bb_lower'] = bands[:, 2]
+        
+        # 带宽和价格在带内的相对位置
+        df['bb_width'] = (df['bb_upper'] - df['bb_lower']) / df['bb_mid'] * 100
+        df['percent_b'] = (df['close'] - df['bb_lower']) / (df['bb_upper'] - df['bb_lower'])
+        
+        return df
+    
+    def generate_signals(self, df):
+        """生成布林带交易信号"""
+        df = self.calculate_indicators(df)
+        close = df['close'].values
+        lower = df['bb_lower'].values
+        upper = df['bb_upper'].values
+        
+        buy = np.zeros(len(df), dtype=bool)
+        sell = np.zeros(len(df), dtype=bool)
+        # 收盘价从下轨下方回到下轨上方（买入）
+        buy[1:] = (close[:-1] < lower[:-1]) & (close[1:] > lower[1:])
+        # 收盘价从上轨上方回到上轨下方（卖出）
+        sell[1:] = (close[:-1] > upper[:-1]) & (close[1:] < upper[1:])
+        
+        return pd.Series(np.where(buy, 1, np.where(sell, -1, 0)), index=df.index)
+    
+    def warmup_bars(self):
+        """分块计算所需的历史K线数：布林带窗口加上一根用于判断穿越"""
+        return self.params['window'] + 1
+    
+    def _get_indicators_info(self, row):
+        """获取布林带指标信息"""
+        return {
+            'bb_mid': row.get('bb_mid', 0),
+            'bb_upper': row.get('bb_upper', 0),
+            'bb_lower': row.get('bb_lower', 0),
+            'bb_width_pct': row.get('bb_width', 0),
+            'percent_b': row.get('percent_b', 0)
+        }
@@ -2,6 +2,7 @@
 import pandas as pd
 import numpy as np
 from .base_strategy import BaseTradingStrategy
+from utils.indicators import Indicators, bar_origin
 
 class MAStrategy(BaseTradingStrategy):
     """移动平均线交叉策略"""
@@ -20,9 +21,10 @@ class MAStrategy(BaseTradingStrategy):
         short_window = self.params['short_window']
         long_window = self.params['long_window']
         
-        # 计算移动平均线
-        df['ma_short'] = df['close'].rolling(window=short_window).mean()
-        df['ma_long'] = df['close'].rolling(window=long_window).mean()
+        # 计算移动平均线（两个周期一次计算）
+        ma = Indicators.sma(df['close'].values, [short_window, long_window], origin=bar_origin(df))
+        df['ma_short'] = ma[:, 0]
+        df['ma_long'] = ma[:, 1]
         
         # 计算价格与均线的距离
         df['price_to_short_ma'] = (df['close'] - df['ma_short']) / df['ma_short'] * 100
@@ -56,6 +58,10 @@ class MAStrategy(BaseTradingStrategy):
         
         return signals
     
+    def warmup_bars(self):
+        """分块计算所需的历史K线数：长期均线窗口加上一根用于判断交叉"""
+        return self.params['long_window'] + 1
+    
     def _get_indicators_info(self, row):
         """获取移动平均线指标信息"""
         return {
@@ -2,6 +2,17 @@
 import pandas as pd
 import numpy as np
 from .base_strategy import BaseTradingStrategy
+from .signal_events import SignalEvents
+from utils import kernels
+from utils.indicators import Indicators
+
+
+def _ewm_continue(values, span, seed=None):
+    """adjust=False的EWM，以seed（上一块的最后一个EWM值）作为初值继续递推"""
+    if seed is None:
+        return kernels.ewm(values, span)
+    return kernels.ewm(np.concatenate(([seed], values)), span)[1:]
+
 
 class MACDStrategy(BaseTradingStrategy):
     """MACD交易策略"""
@@ -23,14 +34,16 @@ class MACDStrategy(BaseTradingStrategy):
         slow_period = self.params['slow_period']
         signal_period = self.params['signal_period']
         
-        df['ema_fast'] = df['close'].ewm(span=fast_period, adjust=False).mean()
-        df['ema_slow'] = df['close'].ewm(span=slow_period, adjust=False).mean()
+        # 快慢两条EMA在一次内核调用中计算（与pandas的ewm结果逐位一致）
+        ema = Indicators.ema(df['close'].values, [fast_period, slow_period])
+        df['ema_fast'] = ema[:, 0]
+        df['ema_slow'] = ema[:, 1]
         
         # 计算MACD线
         df['macd'] = df['ema_fast'] - df['ema_slow']
         
         # 计算信号线
-        df['signal_line'] = df['macd'].ewm(span=signal_period, adjust=False).mean()
+        df['signal_line'] = Indicators.ema(df['macd'].values, signal_period)[:, 0]
         
         # 计算MACD柱状图
         df['histogram'] = df['macd'] - df['signal_line']
@@ -61,6 +74,48 @@ class MACDStrategy(BaseTradingStrategy):
         
         return signals
     
+    def generate_signal_events(self, df):
+        """直接生成稀疏的金叉/死叉事件，与generate_signals的结果一致"""
+        df = self.calculate_indicators(df)
+        macd = df['macd'].values
+        signal_line = df['signal_line'].values
+        
+        golden_cross = np.zeros(len(df), dtype=bool)
+        death_cross = np.zeros(len(df), dtype=bool)
+        golden_cross[1:] = (macd[:-1] < signal_line[:-1]) & (macd[1:] > signal_line[1:])
+        death_cross[1:] = (macd[:-1] > signal_line[:-1]) & (macd[1:] < signal_line[1:])
+        return SignalEvents.from_masks(golden_cross, death_cross)
+    
+    def warmup_bars(self):
+        """EMA状态在数据块之间直接延续，只需保留上一根K线"""
+        return 1
+    
+    def generate_signals_chunk(self, chunk, state):
+        """分块生成MACD信号：EMA的最新值作为下一块的初值，结果与整体计算一致"""
+        close = chunk['close'].values
+        
+        ema_fast = _ewm_continue(close, self.params['fast_period'], state.get('ema_fast'))
+        ema_slow = _ewm_continue(close, self.params['slow_period'], state.get('ema_slow'))
+        macd = ema_fast - ema_slow
+        signal_line = _ewm_continue(macd, self.params['signal_period'], state.get('signal_line'))
+        
+        # 前一根K线的MACD与信号线（首块第一根K线没有前值）
+        prev_macd = np.concatenate(([state.get('macd', np.nan)], macd[:-1]))
+        prev_signal = np.concatenate(([state.get('signal_line', np.nan)], signal_line[:-1]))
+        
+        golden_cross = (prev_macd < prev_signal) & (macd > signal_line)
+        death_cross = (prev_macd > prev_signal) & (macd < signal_line)
+        signals = np.where(golden_cross, 1, np.where(death_cross, -1, 0))
+        
+        if len(chunk):
+            state.update(
+                ema_fast=ema_fast[-1],
+                ema_slow=ema_slow[-1],
+                macd=macd[-1],
+                signal_line=signal_line[-1],
+            )
+        return signals
+    
     def _get_indicators_info(self, row):
         """获取MACD指标信息"""
         return {
@@ -0,0 +1,53 @@
+# trading_strategies/strategies/obv_strategy.py
+import pandas as pd
+import numpy as np
+from .base_strategy import BaseTradingStrategy
+from utils.indicators import Indicators, bar_origin
+
+class OBVStrategy(BaseTradingStrategy):
+    """能量潮OBV趋势策略（成交量）"""
+    
+    def __init__(self, ma_window=20):
+        params = {
+            'ma_window': ma_window
+        }
+        super().__init__('OBV Strategy', **params)
+    
+    def calculate_indicators(self, df):
+        """计算OBV及其移动平均"""
+        df = df.copy()
+        
+        df['obv'] = Indicators.obv(df['close'].values, df['volume'].values)[:, 0]
+        df['obv_ma'] = Indicators.sma(df['obv'].values, self.params['ma_window'], origin=bar_origin(df))[:, 0]
+        
+        # OBV相对其均线的偏离（以均线绝对值为基准）
+        df['obv_spread'] = (df['obv'] - df['obv_ma']) / df['obv_ma'].abs() * 100
+        
+        return df
+    
+    def generate_signals(self, df):
+        """生成OBV交易信号"""
+        df = self.calculate_indicators(df)
+        obv = df['obv'].values
+        obv_ma = df['obv_ma'].values
+        
+        buy = np.zeros(len(df), dtype=bool)
+        sell = np.zeros(len(df), dtype=bool)
+        # OBV上穿均线：资金流入（买入）
+        buy[1:] = (obv[:-1] <= obv_ma[:-1]) & (obv[1:] > obv_ma[1:])
+        # OBV下穿均线：资金流出（卖出）
+        sell[1:] = (obv[:-1] >= obv_ma[:-1]) & (obv[1:] < obv_ma[1:])
+        
+        return pd.Series(np.where(buy, 1, np.where(sell, -1, 0)), index=df.index)
+    
+    def warmup_bars(self):
+        """OBV与其均线之差与累计起点无关，只需均线窗口加上一根用于判断穿越"""
+        return self.params['ma_window'] + 1
+    
+    def _get_indicators_info(self, row):
+        """获取OBV指标信息"""
+        return {
+            'obv': row.get('obv', 0),
+            'obv_ma': row.get('obv_ma', 0),
+            'obv_spread_pct': row.get('obv_spread', 0)
+        }
@@ -0,0 +1,83 @@
+# trading_strategies/strategies/pairs_strategy.py
+import pandas as pd
+import numpy as np
+from .base_strategy import BaseTradingStrategy
+from utils.indicators import Indicators, bar_origin
+
+class PairsStrategy(BaseTradingStrategy):
+    """配对价差均值回归策略：交易腿相对对冲腿被低估时买入，价差回归后卖出
+    
+    数据中除交易腿的价格外还需要对冲腿的收盘价partner_close（用align()对齐两只股票）。
+    价差为对数价格对滚动OLS拟合的残差，回测只持有交易腿（多头），不做空对冲腿。
+    """
+    
+    def __init__(self, window=60, entry_z=2.0, exit_z=0.0):
+        params = {
+            'window': window,
+            'entry_z': entry_z,
+            'exit_z': exit_z
+        }
+        super().__init__('Pairs Spread Strategy', **params)
+    
+    @staticmethod
+    def align(df, partner_df):
+        """按日期对齐交易腿和对冲腿，对冲腿的收盘价写入partner_close列"""
+        partner = partner_df[['date', 'close']].rename(columns={'close': 'partner_close'})
+        return df.merge(partner, on='date', how='inner').sort_values('date').reset_index(drop=True)
+    
+    def calculate_indicators(self, df):
+        """计算滚动对冲比例、价差和价差z分数"""
+        df = df.copy()
+        window = self.params['window']
+        origin = bar_origin(df)
+        
+        x = np.log(df['close'].values.astype(float))
+        y = np.log(df['partner_close'].values.astype(float))
+        mean_x, mean_y, mean_xy, mean_yy, mean_xx = (
+            Indicators.sma(v, window, origin=origin)[:, 0] for v in (x, y, x * y, y * y, x * x)
+        )
+        
+        cov_xy = mean_xy - mean_x * mean_y
+        var_y = mean_yy - mean_y * mean_y
+        var_x = mean_xx - mean_x * mean_x
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hedge_ratio = cov_xy / var_y
+            spread = x - mean_x - hedge_ratio * (y - mean_y)
+            # 残差方差：var(x) - cov(x, y)^2 / var(y)
+            residual_std = np.sqrt(np.maximum(var_x - cov_xy * hedge_ratio, 0.0))
+            spread_z = spread / residual_std
+        
+        df['hedge_ratio'] = hedge_ratio
+        df['spread'] = spread
+        df['spread_z'] = spread_z
+        
+        return df
+    
+    def generate_signals(self, df):
+        """生成配对交易信号"""
+        df = self.calculate_indicators(df)
+        z = df['spread_z'].values
+        entry = -self.params['entry_z']
+        exit_ = -self.params['exit_z']
+        
+        buy = np.zeros(len(df), dtype=bool)
+        sell = np.zeros(len(df), dtype=bool)
+        # 价差z分数向下穿越-entry_z：交易腿相对对冲腿被低估（买入）
+        buy[1:] = (z[:-1] >= entry) & (z[1:] < entry)
+        # 价差z分数向上穿越-exit_z：价差已回归（卖出）
+        sell[1:] = (z[:-1] < exit_) & (z[1:] >= exit_)
+        
+        return pd.Series(np.where(buy, 1, np.where(sell, -1, 0)), index=df.index)
+    
+    def warmup_bars(self):
+        """分块计算所需的历史K线数：回归窗口加上一根用于判断穿越"""
+        return self.params['window'] + 1
+    
+    def _get_indicators_info(self, row):
+        """获取配对价差指标信息"""
+        return {
+            'partner_close': row.get('partner_close', 0),
+            'hedge_ratio': row.get('hedge_ratio', 0),
+            'spread': row.get('spread', 0),
+            'spread_z': row.get('spread_z', 0)
+        }
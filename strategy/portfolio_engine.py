@@ -0,0 +1,190 @@
+# trading_strategies/strategy/portfolio_engine.py
+import numpy as np
+import pandas as pd
+
+# 资金分配规则
+ALLOC_EQUAL_WEIGHT = 'equal_weight'
+ALLOC_SIGNAL_STRENGTH = 'signal_strength'
+ALLOC_MAX_POSITIONS = 'max_positions'
+
+
+class PortfolioEngine:
+    """多股票组合回测引擎：共享资金，按(日期 × 股票)数组逐K线做向量化调仓"""
+    
+    @staticmethod
+    def signal_panel(strategy, close_panel, panels=None):
+        """
+        对面板的每一列生成信号，返回与close_panel同形状的信号数组
+        
+        Args:
+            strategy: 策略实例
+            close_panel: 收盘价面板（日期 × 股票）
+            panels: 其他字段的面板{字段: DataFrame}（如DataLoader.build_panel的返回值），
+                逐列与收盘价一起传给策略；只用收盘价的策略（MACD、RSI、均线、布林带）可以不传，
+                OBV等需要成交量或最高/最低价的策略必须传入对应字段
+        """
+        fields = {name: panel.reindex(index=close_panel.index, columns=close_panel.columns)
+                  for name, panel in (panels or {}).items() if name not in ('date', 'close')}
+        signals = np.zeros(close_panel.shape, dtype=np.int8)
+        for j, symbol in enumerate(close_panel.columns):
+            series = close_panel[symbol]
+            valid = series.notna().values
+            if valid.sum() < 2:
+                continue
+            frame = pd.DataFrame({'date': close_panel.index[valid], 'close': series.values[valid]})
+            for name, panel in fields.items():
+                frame[name] = panel[symbol].values[valid]
+            try:
+                signals[valid, j] = strategy.generate_signals(frame).values
+            except KeyError as e:
+                raise ValueError(f"策略{strategy.name}需要面板中没有的字段{e}，请通过panels传入") from e
+        return signals
+    
+    @staticmethod
+    def _allocate(budget, candidates, strength, allocation):
+        """把可用资金分配给候选股票，返回每只候选股票的资金"""
+        if allocation == ALLOC_SIGNAL_STRENGTH and strength is not None:
+            weights = np.nan_to_num(np.abs(strength[candidates]))
+            total = weights.sum()
+            if total > 0:
+                return budget * weights / total
+        return np.full(len(candidates), budget / len(candidates))
+    
+    @staticmethod
+    def run(close, signals, strength=None, allocation=ALLOC_EQUAL_WEIGHT, max_positions=None,
+            initial_capital=100000, commission_rate=0.0, slippage=0.0, position_size=1.0,
+            rebalance_every=None):
+        """
+        执行组合回测
+        
+        Args:
+            close: 收盘价面板（DataFrame或(T, N)数组），缺失值表示当日不可交易
+            signals: 信号数组（T, N），1买入，-1卖出
+            strength: 信号强度数组（T, N），用于signal_strength分配和max_positions择优
+            allocation: 资金分配规则 equal_weight / signal_strength / max_positions
+            max_positions: 最大持仓数（max_positions规则必填，其余规则可选）
+            initial_capital: 初始资金
+            commission_rate: 手续费率
+            slippage: 滑点比例
+            position_size: 每根K线新开仓（及调仓加仓）可使用的现金比例
+            rebalance_every: 每隔多少根K线把现有持仓调回目标权重（None表示不调仓）
+        
+        Returns:
+            result: 字典，包含逐K线的cash/equity/positions以及交易明细trades
+        """
+        dates = close.index if isinstance(close, pd.DataFrame) else None
+        symbols = close.columns if isinstance(close, pd.DataFrame) else None
+        raw = np.asarray(close, dtype=float)
+        signals = np.asarray(signals)
+        strength = None if strength is None else np.asarray(strength, dtype=float)
+        if allocation == ALLOC_MAX_POSITIONS and not max_positions:
+            raise ValueError("max_positions规则需要设置max_positions")
+        
+        n_bars, n_symbols = raw.shape
+        tradable = ~np.isnan(raw)
+        # 估值使用最近一个有效价格
+        marks = pd.DataFrame(raw).ffill().fillna(0.0).values
+        
+        buy_cost = (1 + slippage) * (1 + commission_rate)
+        sell_gain = (1 - slippage) * (1 - commission_rate)
+        
+        cash = float(initial_capital)
+        shares = np.zeros(n_symbols, dtype=np.int64)
+        cash_arr = np.empty(n_bars)
+        equity_arr = np.empty(n_bars)
+        positions_arr = np.empty(n_bars, dtype=np.int64)
+        trade_log = []
+        
+        for t in range(n_bars):
+            price = raw[t]
+            sig = signals[t]
+            held = shares > 0
+            
+            # 卖出
+            sell = np.flatnonzero(held & (sig == -1) & tradable[t])
+            if len(sell):
+                cash += float(np.sum(shares[sell] * price[sell])) * sell_gain
+                trade_log.append((np.full(len(sell), t), sell, -shares[sell], price[sell]))
+                shares[sell] = 0
+                held[sell] = False
+            
+            equity = cash + float(shares @ marks[t])
+            
+            # 定期调仓：持仓调回等权（或信号强度加权）
+            # 持仓按卖出可得的金额估值，另加position_size比例的现金；先卖出减仓部分，
+            # 再用卖出所得和现金加仓，目标按买入成本取整，现金不会变为负数
+            if rebalance_every and t > 0 and t % rebalance_every == 0 and held.any():
+                idx = np.flatnonzero(held & tradable[t])
+                if len(idx):
+                    budget = cash * position_size + float(shares[idx] @ price[idx]) * sell_gain
+                    if max_positions:
+                        budget = min(budget, equity * len(idx) / max_positions)
+                    target_value = PortfolioEngine._allocate(
+                        budget, idx, strength[t] if strength is not None else None, allocation
+                    )
+                    target = np.floor(target_value / (price[idx] * buy_cost)).astype(np.int64)
+                    delta = target - shares[idx]
+                    reduce = delta < 0
+                    cash -= float(np.sum(delta[reduce] * price[idx][reduce])) * sell_gain
+                    cash -= float(np.sum(delta[~reduce] * price[idx][~reduce])) * buy_cost
+                    changed = delta != 0
+                    if changed.any():
+                        trade_log.append((np.full(changed.sum(), t), idx[changed], delta[changed], price[idx][changed]))
+                    shares[idx] = target
+            
+            # 买入
+            candidates = np.flatnonzero(~held & (sig == 1) & tradable[t])
+            if len(candidates) and cash > 0:
+                budget = cash * position_size
+                if max_positions:
+                    free = max_positions - int(held.sum())
+                    if free <= 0:
+                        candidates = candidates[:0]
+                    elif len(candidates) > free:
+                        # 名额不足时优先信号最强的股票
+                        if strength is not None:
+                            order = np.argsort(-np.nan_to_num(np.abs(strength[t, candidates])), kind='stable')
+                            candidates = candidates[order[:free]]
+                        else:
+                            candidates = candidates[:free]
+                    if allocation == ALLOC_MAX_POSITIONS:
+                        # 每个名额分得权益的1/N
+                        budget = min(budget, equity / max_positions * len(candidates))
+                
+                if len(candidates):
+                    alloc = PortfolioEngine._allocate(
+                        budget, candidates, strength[t] if strength is not None else None, allocation
+                    )
+                    qty = np.floor(alloc / (price[candidates] * buy_cost)).astype(np.int64)
+                    filled = qty > 0
+                    if filled.any():
+                        idx = candidates[filled]
+                        cash -= float(np.sum(qty[filled] * price[idx])) * buy_cost
+                        shares[idx] = qty[filled]
+                        trade_log.append((np.full(len(idx), t), idx, qty[filled], price[idx]))
+            
+            cash_arr[t] = cash
+            equity_arr[t] = cash + float(shares @ marks[t])
+            positions_arr[t] = int(np.count_nonzero(shares))
+        
+        if trade_log:
+            bars, cols, qty, fill = (np.concatenate(parts) for parts in zip(*trade_log))
+        else:
+            bars = cols = qty = np.empty(0, dtype=np.int64)
+            fill = np.empty(0)
+        trades = pd.DataFrame({
+            'bar': bars,
+            'date': dates[bars] if dates is not None else bars,
+            'symbol': np.asarray(symbols)[cols] if symbols is not None else cols,
+            'shares': qty,
+            'price': fill,
+        })
+        
+        index = dates if dates is not None else pd.RangeIndex(n_bars)
+        return {
+            'cash': pd.Series(cash_arr, index=index),
+            'equity': pd.Series(equity_arr, index=index),
+            'positions': pd.Series(positions_arr, index=index),
+            'trades': trades,
+            'final_holdings': pd.Series(shares, index=symbols) if symbols is not None else shares,
+        }
@@ -2,6 +2,7 @@
 import pandas as pd
 import numpy as np
 from .base_strategy import BaseTradingStrategy
+from utils.indicators import Indicators, bar_origin
 
 class RSIStrategy(BaseTradingStrategy):
     """RSI交易策略"""
@@ -20,23 +21,11 @@ class RSIStrategy(BaseTradingStrategy):
         
         period = self.params['period']
         
-        # 计算价格变化
-        delta = df['close'].diff()
-        
-        # 分离上涨和下跌
-        gain = delta.where(delta > 0, 0)
-        loss = -delta.where(delta < 0, 0)
-        
-        # 计算平均增益和平均损失
-        avg_gain = gain.rolling(window=period).mean()
-        avg_loss = loss.rolling(window=period).mean()
-        
-        # 计算RS和RSI
-        rs = avg_gain / avg_loss
-        df['rsi'] = 100 - (100 / (1 + rs))
+        # 价格差分、涨跌分离和平均涨跌幅在指标库中一次完成
+        df['rsi'] = Indicators.rsi(df['close'].values, period, origin=bar_origin(df))[:, 0]
         
         # 添加平滑版本（可选）
-        df['rsi_smoothed'] = df['rsi'].rolling(window=3).mean()
+        df['rsi_smoothed'] = Indicators.sma(df['rsi'].values, 3, origin=bar_origin(df))[:, 0]
         
         return df
     
@@ -71,6 +60,10 @@ class RSIStrategy(BaseTradingStrategy):
         
         return signals
     
+    def warmup_bars(self):
+        """分块计算所需的历史K线数：RSI窗口、价格差分、平滑窗口及前一根K线"""
+        return self.params['period'] + 4
+    
     def _get_indicators_info(self, row):
         """获取RSI指标信息"""
         return {
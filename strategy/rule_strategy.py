@@ -0,0 +1,72 @@
+# trading_strategies/strategies/rule_strategy.py
+import pandas as pd
+import numpy as np
+from .base_strategy import BaseTradingStrategy
+from .signal_events import SignalEvents
+from utils.rules import RuleCompiler
+
+class RuleStrategy(BaseTradingStrategy):
+    """规则表达式策略：买入/卖出条件由表达式给出，编译后按数组一次计算
+    
+    例如 RuleStrategy('cross_above(macd, signal_line) & rsi_14 < 70', 'cross_below(macd, signal_line)')。
+    同一根K线买卖条件同时成立时买入优先（与其他策略的if/elif顺序一致）。
+    """
+    
+    def __init__(self, entry, exit, name='Rule Strategy', macros=None):
+        params = {
+            'entry': entry,
+            'exit': exit
+        }
+        super().__init__(name, **params)
+        self.plan = RuleCompiler.compile({'entry': entry, 'exit': exit}, macros)
+    
+    def calculate_indicators(self, df):
+        """计算规则用到的指标，并写入买入/卖出条件列"""
+        df = df.copy()
+        
+        conditions, indicators = self.plan.evaluate(df, return_indicators=True)
+        for name, values in indicators.items():
+            df[name] = values
+        df['entry_condition'] = conditions['entry']
+        df['exit_condition'] = conditions['exit']
+        
+        return df
+    
+    def generate_signals(self, df):
+        """生成规则信号"""
+        return self.generate_signal_events(df).to_series(df.index)
+    
+    def generate_signal_events(self, df):
+        """直接由买入/卖出条件生成稀疏信号事件"""
+        conditions = self.plan.evaluate(df)
+        return SignalEvents.from_masks(conditions['entry'], conditions['exit'])
+    
+    def warmup_bars(self):
+        """分块计算所需的历史K线数（含EMA时按周期的倍数预热，结果与整体计算近似一致）"""
+        return self.plan.warmup_bars()
+    
+    @staticmethod
+    def signal_matrix(df, variants, macros=None):
+        """
+        一次计算多个规则变体的信号，所有变体共享指标和相同的子表达式
+        
+        Args:
+            df: 按日期升序的股票数据
+            variants: {变体名称: (买入表达式, 卖出表达式)}
+        
+        Returns:
+            signals: (K线 × 变体)的信号DataFrame
+        """
+        rules = {}
+        for name, (entry, exit_) in variants.items():
+            rules[(name, 'entry')] = entry
+            rules[(name, 'exit')] = exit_
+        conditions = RuleCompiler.compile(rules, macros).evaluate(df)
+        return pd.DataFrame({
+            name: SignalEvents.from_masks(conditions[(name, 'entry')], conditions[(name, 'exit')]).to_dense()
+            for name in variants
+        }, index=df.index)
+    
+    def _get_indicators_info(self, row):
+        """获取规则用到的指标信息"""
+        return {name: row.get(name, np.nan) for name in self.plan.indicator_columns()}
@@ -0,0 +1,55 @@
+# trading_strategies/strategy/signal_events.py
+import numpy as np
+import pandas as pd
+
+
+class SignalEvents:
+    """稀疏信号：只记录有信号的K线位置和方向，占用内存与信号数成正比而不是与K线数成正比"""
+    
+    def __init__(self, bars, directions, length):
+        """
+        Args:
+            bars: 有信号的K线位置（升序）
+            directions: 对应的方向，1买入，-1卖出
+            length: 信号所属序列的K线总数
+        """
+        self.bars = np.asarray(bars, dtype=np.int64)
+        self.directions = np.asarray(directions, dtype=np.int8)
+        self.length = int(length)
+    
+    @staticmethod
+    def from_dense(signals):
+        """由逐K线信号（数组或Series）转换"""
+        signals = np.asarray(signals)
+        bars = np.flatnonzero(signals)
+        return SignalEvents(bars, signals[bars], len(signals))
+    
+    @staticmethod
+    def from_masks(buy_mask, sell_mask):
+        """由买入/卖出条件转换；同一根K线两者都成立时买入优先（与策略中if/elif的顺序一致）"""
+        buy_mask = np.asarray(buy_mask, dtype=bool)
+        sell_mask = np.asarray(sell_mask, dtype=bool) & ~buy_mask
+        bars = np.flatnonzero(buy_mask | sell_mask)
+        directions = np.where(buy_mask[bars], 1, -1)
+        return SignalEvents(bars, directions, len(buy_mask))
+    
+    def __len__(self):
+        return len(self.bars)
+    
+    def buys(self):
+        """买入信号的K线位置"""
+        return self.bars[self.directions == 1]
+    
+    def sells(self):
+        """卖出信号的K线位置"""
+        return self.bars[self.directions == -1]
+    
+    def to_dense(self):
+        """还原为逐K线信号数组"""
+        signals = np.zeros(self.length, dtype=np.int64)
+        signals[self.bars] = self.directions
+        return signals
+    
+    def to_series(self, index=None):
+        """还原为与generate_signals相同形式的Series"""
+        return pd.Series(self.to_dense(), index=index)
@@ -0,0 +1,6 @@
+# trading_strategies/tests/conftest.py
+import os
+import sys
+
+# 测试按仓库根目录导入（from utils... / from strategy...）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,35 @@
+# trading_strategies/tests/test_allocator.py
+"""
+资金分配测试：收益流多于协方差窗口K线数时的风险平价权重
+"""
+import numpy as np
+
+from utils.allocator import CapitalAllocator
+
+
+def test_risk_parity_more_streams_than_lookback():
+    k, lookback = 300, 63
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0, 0.01, (lookback, k)) * rng.uniform(0.5, 2.0, k)
+    cov = np.cov(returns.T)
+    assert np.linalg.matrix_rank(cov) < k
+    
+    allocator = CapitalAllocator(lookback=lookback)
+    weights = allocator.risk_parity_weights(cov)
+    assert np.all(weights > 0)
+    assert np.isclose(weights.sum(), 1.0)
+    
+    # 在收缩后的协方差下各收益流的风险贡献相等
+    shrinkage = k / (k + lookback)
+    shrunk = (1 - shrinkage) * cov + shrinkage * np.diag(np.diag(cov))
+    contribution = weights * (shrunk @ weights)
+    assert np.all(contribution > 0)
+    assert np.allclose(contribution, contribution.mean(), rtol=1e-6)
+
+
+def test_risk_parity_falls_back_when_not_converged():
+    rng = np.random.default_rng(1)
+    cov = np.cov(rng.normal(0, 0.01, (20, 100)).T)
+    allocator = CapitalAllocator(lookback=20, shrinkage=0.0, max_iter=2)
+    weights = allocator.risk_parity_weights(cov)
+    assert np.allclose(weights, CapitalAllocator.inverse_vol_weights(np.diag(cov)))
@@ -0,0 +1,68 @@
+# trading_strategies/tests/test_backtest_engine.py
+"""
+回测引擎的成交与风控测试：开盘价成交后在同一根K线触发止损的交易
+"""
+import numpy as np
+import pandas as pd
+
+from strategy import MAStrategy
+from strategy.backtest_engine import (
+    BacktestEngine, ACTION_BUY, ACTION_ROUND_TRIP, EXIT_STOP_LOSS, FILL_NEXT_OPEN
+)
+from utils.performance_analyzer import PerformanceAnalyzer
+from utils.trade_analytics import TradeAnalytics
+
+
+def _same_bar_stop_data():
+    """第1根K线发出买入信号，第2根K线开盘买入后盘中跌破止损位；第5根K线再次买入"""
+    close = np.array([10.0, 10.0, 9.8, 10.0, 10.2, 10.4, 10.6, 10.8])
+    open_ = np.array([10.0, 10.0, 10.0, 9.8, 10.0, 10.2, 10.4, 10.6])
+    high = np.maximum(open_, close) + 0.1
+    low = np.minimum(open_, close) - 0.1
+    low[2] = 9.0
+    signals = np.array([0, 1, 0, 0, 1, 0, 0, 0])
+    return close, open_, high, low, signals
+
+
+def test_same_bar_stop_marks_round_trip():
+    close, open_, high, low, signals = _same_bar_stop_data()
+    result = BacktestEngine.run(close, signals, open_=open_, high=high, low=low,
+                                stop_loss=0.05, fill_model=FILL_NEXT_OPEN)
+    
+    first = result['trades'][0]
+    assert first['entry_bar'] == first['exit_bar'] == 2
+    assert first['exit_reason'] == EXIT_STOP_LOSS
+    assert result['action'][2] == ACTION_ROUND_TRIP
+    assert result['action'][5] == ACTION_BUY
+    assert result['entry_price'][2] == 10.0
+    assert result['exit_price'][2] == 9.5
+    assert result['position'][2] == 0
+
+
+def test_same_bar_stop_in_analytics():
+    close, open_, high, low, signals = _same_bar_stop_data()
+    df = pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=len(close)),
+        'open': open_, 'high': high, 'low': low, 'close': close, 'volume': 1000.0,
+    })
+    strategy = MAStrategy()
+    result_df = strategy.execute_strategy(df, signals=signals, verbose=False,
+                                          stop_loss=0.05, fill_model=FILL_NEXT_OPEN)
+    assert list(result_df['action'][[2, 5]]) == ['BUY_SELL', 'BUY']
+    
+    # 交易列表和按action列配对（如从CSV读回、没有attrs）得到相同的交易
+    paired = result_df.copy()
+    paired.attrs = {}
+    for frame in (result_df, paired):
+        table = TradeAnalytics.from_result(frame)
+        assert len(table) == 2
+        assert list(table['closed']) == [True, False]
+        # 开盘成交的交易从开仓K线开始计算MAE/MFE：当根最低价9.0低于止损成交价
+        assert np.isclose(table['mae'][0], 9.0 / 10.0 - 1)
+        assert np.isclose(table['mfe'][0], high[2] / 10.0 - 1)
+        assert table['bars_to_mae'][0] == 0
+    
+    performance = PerformanceAnalyzer.analyze_performance(result_df, 100000)
+    assert performance['买入信号'] == 2
+    assert performance['卖出信号'] == 1
+    assert performance['胜率'] == '0.0%'
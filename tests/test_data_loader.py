@@ -0,0 +1,37 @@
+# trading_strategies/tests/test_data_loader.py
+"""
+复权价格视图测试：数据的价格列被替换后视图重新计算
+"""
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import DataLoader
+
+
+def _prices():
+    close = np.array([10.0, 11.0, 12.0, 13.0])
+    return pd.DataFrame({
+        'date': pd.bdate_range('2024-01-01', periods=4),
+        'open': close, 'high': close, 'low': close, 'close': close,
+        'adjclose': close / 2, 'volume': 1000.0,
+    })
+
+
+def test_price_view_is_shared():
+    df = _prices()
+    assert DataLoader.price_view(df) is DataLoader.price_view(df)
+    assert np.allclose(DataLoader.adjusted(df)['close'], df['close'] / 2)
+
+
+def test_price_view_rebuilt_after_column_replaced():
+    df = _prices()
+    view = DataLoader.price_view(df)
+    assert np.allclose(DataLoader.adjusted(df)['close'], [5.0, 5.5, 6.0, 6.5])
+    
+    df['adjclose'] = df['close'].values.copy()
+    assert DataLoader.price_view(df) is not view
+    assert np.allclose(DataLoader.adjusted(df)['close'], df['close'])
+    
+    # 新增的列也出现在复权数据中
+    df['signal'] = 1
+    assert 'signal' in DataLoader.adjusted(df).columns
@@ -0,0 +1,30 @@
+# trading_strategies/tests/test_data_validator.py
+"""
+数据检查测试：面板修复的前值填充不越过股票的最后有效日期
+"""
+import numpy as np
+import pandas as pd
+
+from utils.data_validator import DataValidator
+
+
+def test_repair_panel_keeps_delisted_dates_missing():
+    dates = pd.bdate_range('2024-01-01', periods=9)
+    close = pd.DataFrame({
+        'A': [10.0, 11.0, 12.0, 13.0, 13.5, np.nan, np.nan, np.nan, np.nan],
+        'B': [np.nan, np.nan, 20.0, 21.0, np.nan, 22.0, 23.0, 24.0, 25.0],
+    }, index=dates)
+    panels = {'close': close, 'volume': close * 0 + 1000}
+    panels['volume'].iloc[4, 0] = 0
+    
+    validator = DataValidator()
+    masks = validator.validate_panel(panels)
+    repaired = validator.repair_panel(panels, masks)
+    
+    # A最后一天的成交量为0，修复后沿用前一天，之后仍为退市后的缺失
+    assert list(repaired['close']['A'].iloc[:5]) == [10.0, 11.0, 12.0, 13.0, 13.0]
+    assert repaired['close']['A'].iloc[5:].isna().all()
+    assert repaired['volume']['A'].iloc[5:].isna().all()
+    # B上市前仍为缺失，上市后的缺失K线用前值填充
+    assert repaired['close']['B'].iloc[:2].isna().all()
+    assert repaired['close']['B'].iloc[4] == 21.0
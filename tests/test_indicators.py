@@ -0,0 +1,39 @@
+# trading_strategies/tests/test_indicators.py
+"""
+滚动窗口求和：与逐窗口直接求和一致，分块计算（传入origin）与整体计算逐位一致
+"""
+import numpy as np
+import pytest
+
+from utils.indicators import _window_sum
+
+
+def _values(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    values = 1000 + np.cumsum(rng.normal(0, 1, n))
+    values[[100, 2500, 2501]] = np.nan
+    return values
+
+
+@pytest.mark.parametrize('window', [1, 3, 14, 200])
+def test_window_sum_matches_direct_sum(window):
+    values = _values()
+    out = _window_sum(values, window, np.empty(len(values)))
+    expected = np.full(len(values), np.nan)
+    for i in range(window - 1, len(values)):
+        expected[i] = values[i - window + 1:i + 1].sum()
+    np.testing.assert_allclose(out, expected, rtol=1e-12, equal_nan=True)
+
+
+@pytest.mark.parametrize('window', [3, 14, 200])
+def test_window_sum_chunks_match_full(window):
+    values = _values()
+    full = _window_sum(values, window, np.empty(len(values)))
+    for start in (1, window - 1, window, 777, 4000):
+        part = _window_sum(values[start:], window, np.empty(len(values) - start), origin=start)
+        np.testing.assert_array_equal(part[window - 1:], full[start + window - 1:])
+
+
+def test_window_sum_shorter_than_window():
+    out = _window_sum(np.arange(3.0), 5, np.empty(3))
+    assert np.isnan(out).all()
@@ -0,0 +1,125 @@
+# trading_strategies/tests/test_kernels.py
+"""
+计算内核的后端一致性测试：NumPy和Numba两个后端对同一输入的结果必须一致
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import kernels
+
+pytest.importorskip('numba')
+
+
+def _run(backend, func, *args):
+    """在指定后端下调用内核，结束后恢复原后端"""
+    current = kernels.BACKEND
+    kernels.use_backend(backend)
+    try:
+        return func(*args)
+    finally:
+        kernels.use_backend(current)
+
+
+def _both(func, *args):
+    return _run('numpy', func, *args), _run('numba', func, *args)
+
+
+def _nan_matrix(n, k, seed=0, nan_rate=0.1):
+    rng = np.random.default_rng(seed)
+    values = 100 * np.cumprod(1 + rng.normal(0, 0.01, (n, k)), axis=0)
+    values[rng.random((n, k)) < nan_rate] = np.nan
+    # 部分列开头整段缺失（上市前），部分列全部缺失
+    values[:n // 3, ::7] = np.nan
+    if k > 5:
+        values[:, 5] = np.nan
+    return values
+
+
+def _pandas_ewm(values, spans):
+    return pd.DataFrame(values).ewm(span=spans, adjust=False).mean().values \
+        if np.ndim(spans) == 0 else np.column_stack([
+            pd.Series(values[:, j]).ewm(span=spans[j], adjust=False).mean().values
+            for j in range(values.shape[1])
+        ])
+
+
+def test_ewm_wide_short_matrix_with_nans():
+    # 行数不超过32倍列数，NumPy后端走逐行向量化递推
+    values = _nan_matrix(60, 400)
+    assert values.shape[0] <= 32 * values.shape[1]
+    spans = np.random.default_rng(1).integers(2, 50, values.shape[1])
+    numpy_out, numba_out = _both(kernels.ewm, values, spans)
+    np.testing.assert_allclose(numpy_out, numba_out, rtol=1e-12, atol=0, equal_nan=True)
+    np.testing.assert_allclose(numpy_out, _pandas_ewm(values, spans), rtol=1e-12, atol=0, equal_nan=True)
+
+
+def test_ewm_long_series_multiple_spans():
+    # 行数远大于列数，NumPy后端逐列使用pandas
+    values = _nan_matrix(5000, 1)[:, 0]
+    numpy_out, numba_out = _both(kernels.ewm, values, [12, 26, 9])
+    np.testing.assert_allclose(numpy_out, numba_out, rtol=1e-12, atol=0, equal_nan=True)
+    np.testing.assert_allclose(numpy_out[:, 1], _pandas_ewm(values[:, None], 26)[:, 0],
+                               rtol=1e-12, atol=0, equal_nan=True)
+
+
+@pytest.mark.parametrize('ref', [np.nan, -np.inf, 95.0])
+def test_first_trailing_hit_with_atr_warmup(ref):
+    rng = np.random.default_rng(2)
+    n = 400
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.015, n))
+    high = close * (1 + rng.uniform(0, 0.02, n))
+    low = close * (1 - rng.uniform(0, 0.02, n))
+    atr = pd.Series(high - low).rolling(14).mean().values  # 前13根为NaN
+    base = high - 3.0 * atr
+    for lo, hi in [(0, n), (5, 40), (13, n), (100, 101), (50, 50)]:
+        numpy_hit, numba_hit = _both(kernels.first_trailing_hit, low, base, ref, 1.0, lo, hi)
+        assert numpy_hit[0] == numba_hit[0]
+        np.testing.assert_equal(numpy_hit[1], numba_hit[1])
+
+
+def test_first_trailing_hit_percent_stop():
+    rng = np.random.default_rng(3)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.01, 1000))
+    low = close * 0.99
+    for scale in (0.9, 0.95, 0.99):
+        numpy_hit, numba_hit = _both(kernels.first_trailing_hit, low, close, close[10], scale, 11, 1000)
+        assert numpy_hit == numba_hit
+
+
+def test_bar_closes_with_carry():
+    rng = np.random.default_rng(4)
+    n = 20000
+    activity = rng.integers(0, 1000, n).astype(float)
+    activity[rng.random(n) < 0.05] = 0.0
+    thresholds = np.repeat(rng.uniform(2000, 8000, n // 100), 100)
+    
+    numpy_out, numba_out = _both(kernels.bar_closes, activity, thresholds, 500.0, 3000.0)
+    np.testing.assert_array_equal(numpy_out[0], numba_out[0])
+    assert numpy_out[1] == numba_out[1]
+    np.testing.assert_equal(numpy_out[2], numba_out[2])
+    
+    # 分块输入并结转未完成K线，结果与整段输入一致
+    for backend in kernels.available_backends():
+        carry, threshold = 500.0, 3000.0
+        parts = []
+        for lo in range(0, n, 777):
+            closes, carry, threshold = _run(backend, kernels.bar_closes,
+                                            activity[lo:lo + 777], thresholds[lo:lo + 777], carry, threshold)
+            parts.append(closes)
+        np.testing.assert_array_equal(np.concatenate(parts), numpy_out[0])
+        assert carry == pytest.approx(numpy_out[1], rel=1e-12)
+        np.testing.assert_equal(threshold, numpy_out[2])
+
+
+def test_ewm_writes_into_out():
+    # out为按列连续数组的列切片（Indicators.compute的用法），内核直接写入，不另外分配
+    values = _nan_matrix(300, 1)[:, 0]
+    expected = _run('numpy', kernels.ewm, values, [12, 26])
+    for backend in kernels.available_backends():
+        buffer = np.full((300, 4), -1.0, order='F')
+        out = buffer[:, 1:3]
+        result = _run(backend, kernels.ewm, values, [12, 26], out)
+        assert result is out
+        np.testing.assert_array_equal(out, expected)
+        assert (buffer[:, [0, 3]] == -1.0).all()
@@ -0,0 +1,24 @@
+# trading_strategies/tests/test_portfolio_engine.py
+"""
+组合回测引擎测试：有交易成本时定期调仓不会使现金为负
+"""
+import numpy as np
+import pytest
+
+from strategy.portfolio_engine import PortfolioEngine, ALLOC_EQUAL_WEIGHT, ALLOC_SIGNAL_STRENGTH
+
+
+@pytest.mark.parametrize('allocation', [ALLOC_EQUAL_WEIGHT, ALLOC_SIGNAL_STRENGTH])
+@pytest.mark.parametrize('cost', [0.001, 0.01])
+def test_rebalance_keeps_cash_non_negative(allocation, cost):
+    rng = np.random.default_rng(1)
+    n_bars, n_symbols = 500, 20
+    close = 50 * np.cumprod(1 + rng.normal(0.0005, 0.02, (n_bars, n_symbols)), axis=0)
+    draw = rng.random((n_bars, n_symbols))
+    signals = np.where(draw < 0.03, 1, np.where(draw > 0.97, -1, 0)).astype(np.int8)
+    strength = rng.random((n_bars, n_symbols))
+    
+    result = PortfolioEngine.run(close, signals, strength=strength, allocation=allocation,
+                                 commission_rate=cost, slippage=cost, rebalance_every=5)
+    assert result['cash'].min() >= 0
+    assert len(result['trades'])
@@ -0,0 +1,37 @@
+# trading_strategies/tests/test_rules.py
+"""
+规则表达式测试：与常数比较的穿越函数
+"""
+import numpy as np
+import pandas as pd
+
+from utils.indicators import Indicators
+from utils.rules import RuleCompiler
+
+
+def _prices(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.cumprod(1 + rng.normal(0, 0.02, n))
+    return pd.DataFrame({'close': close, 'high': close * 1.01, 'low': close * 0.99})
+
+
+def test_cross_with_constant():
+    df = _prices()
+    plan = RuleCompiler.compile({
+        'above': 'cross_above(rsi_14, 30)',
+        'below': 'cross_below(70, rsi_14)',
+        'const': 'cross_above(30, 40)',
+    })
+    results = plan.evaluate(df)
+    
+    rsi = Indicators.rsi(df['close'].values, [14])[:, 0]
+    prev = np.concatenate(([np.nan], rsi[:-1]))
+    with np.errstate(invalid='ignore'):
+        expected = (prev < 30) & (rsi > 30)
+    assert expected.any()
+    assert np.array_equal(results['above'], expected)
+    # 70从上方穿越rsi即rsi从下方穿越70
+    with np.errstate(invalid='ignore'):
+        assert np.array_equal(results['below'], (prev < 70) & (rsi > 70))
+    assert results['const'].shape == (len(df),)
+    assert not results['const'].any()
@@ -0,0 +1,272 @@
+# trading_strategies/utils/allocator.py
+import numpy as np
+import pandas as pd
+
+# 权重规则
+WEIGHT_FIXED = 'fixed'
+WEIGHT_INVERSE_VOL = 'inverse_vol'
+WEIGHT_RISK_PARITY = 'risk_parity'
+
+
+class RollingCovariance:
+    """滚动协方差：保存窗口内收益的和与叉积和，窗口移动时只加上新进入、减去移出的收益
+    
+    相邻两个调仓日之间的更新是两个分块矩阵乘法（新进入的K线块、移出的K线块），
+    总计算量与调仓频率无关，不在每个调仓日重新计算整个窗口。
+    只需要方差（inverse_vol）时只维护各列的平方和。
+    """
+    
+    def __init__(self, returns, window, diagonal=False):
+        """
+        Args:
+            returns: (K线 × 收益流)收益数组，缺失按0处理
+            window: 窗口长度
+            diagonal: 是否只维护方差
+        """
+        self.returns = np.nan_to_num(np.asarray(returns, dtype=float))
+        self.window = window
+        self.diagonal = diagonal
+        k = self.returns.shape[1]
+        self._sum = np.zeros(k)
+        self._cross = np.zeros(k) if diagonal else np.zeros((k, k))
+        self._end = 0  # 已纳入窗口的K线为[_start, _end)
+        self._start = 0
+    
+    def _accumulate(self, block, sign):
+        if not len(block):
+            return
+        self._sum += sign * block.sum(axis=0)
+        if self.diagonal:
+            self._cross += sign * np.einsum('ij,ij->j', block, block)
+        else:
+            self._cross += sign * (block.T @ block)
+    
+    def advance(self, end):
+        """
+        窗口移动到以第end-1根K线结束
+        
+        Returns:
+            count: 窗口内的K线数
+        """
+        self._accumulate(self.returns[self._end:end], 1)
+        self._end = end
+        start = max(end - self.window, 0)
+        self._accumulate(self.returns[self._start:start], -1)
+        self._start = max(start, self._start)
+        return self._end - self._start
+    
+    def covariance(self):
+        """当前窗口的样本协方差（diagonal时为方差向量）"""
+        count = self._end - self._start
+        mean = self._sum / count
+        if self.diagonal:
+            return (self._cross - count * mean * mean) / (count - 1)
+        return (self._cross - count * np.outer(mean, mean)) / (count - 1)
+
+
+class CapitalAllocator:
+    """多策略资金分配：按固定权重、波动率倒数或风险平价权重定期调仓，得到组合权益曲线
+    
+    每个收益流（策略或策略参数组合）是一个子账户，调仓日按目标权重重新分配总资金，
+    两次调仓之间各子账户按各自收益独立变化。调仓日的权重只用截至当日的收益估计。
+    """
+    
+    def __init__(self, method=WEIGHT_RISK_PARITY, weights=None, lookback=63, rebalance_every=21,
+                 rebalance_cost=0.0, max_iter=50, tol=1e-8, shrinkage=None):
+        """
+        Args:
+            method: 权重规则（'fixed'、'inverse_vol'或'risk_parity'）
+            weights: 固定权重{收益流: 权重}（缺省等权）；另两种规则在窗口未满时也使用此权重
+            lookback: 协方差估计窗口（K线数）
+            rebalance_every: 调仓间隔（K线数）
+            rebalance_cost: 调仓成本率（按换手金额计）
+            max_iter: 风险平价求解的最大牛顿迭代次数
+            tol: 风险平价求解的收敛阈值（风险贡献与目标值的相对误差）
+            shrinkage: 风险平价使用的协方差向对角线收缩的比例δ（Σ → (1-δ)Σ + δ·diag(Σ)）；
+                缺省为k / (k + lookback)（k为收益流数），收益流多于窗口K线数时样本协方差奇异，
+                收缩后仍可求解
+        """
+        if method not in (WEIGHT_FIXED, WEIGHT_INVERSE_VOL, WEIGHT_RISK_PARITY):
+            raise ValueError(f"未知权重规则: {method}")
+        self.method = method
+        self.weights = weights
+        self.lookback = lookback
+        self.rebalance_every = rebalance_every
+        self.rebalance_cost = rebalance_cost
+        self.max_iter = max_iter
+        self.tol = tol
+        self.shrinkage = shrinkage
+    
+    @staticmethod
+    def returns_from_results(results):
+        """
+        由各策略的回测结果得到收益流
+        
+        Args:
+            results: {名称: execute_strategy的结果DataFrame（含date和portfolio_value列）}
+        
+        Returns:
+            returns: (日期 × 名称)的日收益DataFrame；某策略没有数据的日期收益为0
+        """
+        equity = pd.concat({name: df.set_index('date')['portfolio_value'] for name, df in results.items()},
+                           axis=1).sort_index()
+        return equity.pct_change(fill_method=None).fillna(0.0)
+    
+    def _fixed_weights(self, columns):
+        if self.weights is None:
+            return np.full(len(columns), 1.0 / len(columns))
+        weights = np.array([self.weights.get(name, 0.0) for name in columns], dtype=float)
+        return weights / weights.sum()
+    
+    @staticmethod
+    def inverse_vol_weights(variance):
+        """波动率倒数权重；方差为0的收益流（窗口内没有持仓）权重为0"""
+        vol = np.sqrt(np.maximum(variance, 0.0))
+        inv = np.where(vol > 0, 1.0 / np.where(vol > 0, vol, 1.0), 0.0)
+        total = inv.sum()
+        return inv / total if total > 0 else None
+    
+    def risk_parity_weights(self, cov, start=None):
+        """
+        风险平价权重：各收益流对组合方差的贡献w_i(Σw)_i相等
+        
+        求解凸问题 min ½xᵀΣx - Σlog(x_i)/k 的牛顿法（最优解满足x_i(Σx)_i = 1/k），
+        相邻调仓日的协方差变化不大，以上次的权重为初值通常两三次迭代即收敛。
+        方差为0的收益流不参与分配。协方差先向对角线收缩（见shrinkage），
+        达到最大迭代次数仍未收敛时改用波动率倒数权重。
+        
+        Args:
+            cov: 协方差矩阵
+            start: 初始权重
+        
+        Returns:
+            weights: 权重（和为1），无法分配时为None
+        """
+        active = np.diag(cov) > 0
+        if not active.any():
+            return None
+        sigma = cov[np.ix_(active, active)]
+        k = sigma.shape[0]
+        budget = 1.0 / k
+        shrinkage = k / (k + self.lookback) if self.shrinkage is None else self.shrinkage
+        if shrinkage:
+            sigma = (1 - shrinkage) * sigma + shrinkage * np.diag(np.diag(sigma))
+        
+        if start is not None and np.all(start[active] > 0):
+            x = start[active].copy()
+        else:
+            x = 1.0 / np.sqrt(np.diag(sigma))
+        # 缩放到使xᵀΣx = 1（最优解满足此式）
+        x /= np.sqrt(x @ sigma @ x)
+        
+        for _ in range(self.max_iter):
+            sigma_x = sigma @ x
+            gradient = sigma_x - budget / x
+            hessian = sigma + np.diag(budget / (x * x))
+            step = np.linalg.solve(hessian, gradient)
+            # 保持x为正
+            scale = 1.0
+            while np.any(x - scale * step <= 0):
+                scale *= 0.5
+            x = x - scale * step
+            if np.max(np.abs(gradient * x)) < self.tol * budget:
+                break
+        else:
+            return self.inverse_vol_weights(np.diag(cov))
+        
+        weights = np.zeros(len(active))
+        weights[active] = x / x.sum()
+        return weights
+    
+    def target_weights(self, returns):
+        """
+        计算每个调仓日的目标权重
+        
+        Args:
+            returns: (日期 × 收益流)的收益DataFrame
+        
+        Returns:
+            weights: (调仓日 × 收益流)的权重DataFrame；第i行在该日收盘后生效
+        """
+        values = returns.values
+        n, k = values.shape
+        fixed = self._fixed_weights(returns.columns)
+        rebalance_bars = np.arange(0, n, self.rebalance_every)
+        
+        estimator = None
+        if self.method != WEIGHT_FIXED:
+            estimator = RollingCovariance(values, self.lookback, diagonal=self.method == WEIGHT_INVERSE_VOL)
+        
+        rows = np.empty((len(rebalance_bars), k))
+        previous = None
+        for i, bar in enumerate(rebalance_bars):
+            weights = None
+            if estimator is not None:
+                estimator.advance(bar + 1)
+            # 第0根K线没有收益，窗口内满lookback根收益后才估计
+            if estimator is not None and bar >= self.lookback:
+                if self.method == WEIGHT_INVERSE_VOL:
+                    weights = self.inverse_vol_weights(estimator.covariance())
+                else:
+                    weights = self.risk_parity_weights(estimator.covariance(), previous)
+            if weights is None:
+                weights = fixed
+            rows[i] = weights
+            previous = weights
+        return pd.DataFrame(rows, index=returns.index[rebalance_bars], columns=returns.columns)
+    
+    def combine(self, returns, initial_capital=100000):
+        """
+        按目标权重定期调仓，计算组合权益
+        
+        Args:
+            returns: (日期 × 收益流)的收益DataFrame（如returns_from_results的返回值）
+            initial_capital: 初始资金
+        
+        Returns:
+            result: {
+                'equity': 组合权益Series,
+                'weights': 调仓日目标权重DataFrame,
+                'sleeves': (日期 × 收益流)各子账户的资金DataFrame,
+                'turnover': 各调仓日的换手率Series,
+            }
+        """
+        values = np.nan_to_num(returns.values.astype(float))
+        n, k = values.shape
+        targets = self.target_weights(returns)
+        rebalance_bars = np.arange(0, n, self.rebalance_every)
+        
+        # sleeves[t]为第t根K线收盘（调仓后）各子账户的资金
+        sleeves = np.empty((n, k))
+        turnover = np.zeros(len(rebalance_bars))
+        capital = float(initial_capital)
+        before = None
+        for i, bar in enumerate(rebalance_bars):
+            target = targets.values[i]
+            if before is None:
+                turnover[i] = np.abs(target).sum()
+            else:
+                # 按调仓前的实际权重计算换手，成本从总资金中扣除
+                capital = before.sum()
+                turnover[i] = np.abs(target - before / capital).sum()
+                capital *= 1 - self.rebalance_cost * turnover[i]
+            
+            # 到下一个调仓日之前，各子账户按各自收益复利增长
+            end = rebalance_bars[i + 1] if i + 1 < len(rebalance_bars) else n
+            growth = np.cumprod(1.0 + values[bar + 1:min(end + 1, n)], axis=0)
+            sleeves[bar] = capital * target
+            sleeves[bar + 1:end] = capital * target * growth[:end - bar - 1]
+            if end < n:
+                before = capital * target * growth[-1]
+        
+        equity = sleeves.sum(axis=1)
+        return {
+            'equity': pd.Series(equity, index=returns.index, name='portfolio_value'),
+            'weights': targets,
+            'sleeves': pd.DataFrame(sleeves, index=returns.index, columns=returns.columns),
+            'turnover': pd.Series(turnover, index=targets.index, name='turnover'),
+        }
+    
+    def combine_results(self, results, initial_capital=100000):
+        """由各策略的回测结果计算组合，等同于combine(returns_from_results(results))"""
+        return self.combine(self.returns_from_results(results), initial_capital)
@@ -0,0 +1,170 @@
+# trading_strategies/utils/attribution.py
+import numpy as np
+import pandas as pd
+
+def _window_sum(values, window):
+    """按行的滑动窗口和（窗口以第i行结束，前window-1行为NaN）"""
+    cum = np.concatenate((np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)))
+    out = np.full(values.shape, np.nan)
+    out[window - 1:] = cum[window:] - cum[:-window]
+    return out
+
+
+class BenchmarkAttribution:
+    """相对基准的绩效归因：alpha、beta、相关系数、跟踪误差和信息比率
+    
+    (K线 × 回测)收益矩阵对基准收益的一元回归有闭式解，只需要几个按列的和
+    （Σr、Σr²、Σrb，以及各回测有效K线上的Σb、Σb²），对整个矩阵做一次数组运算，
+    数千个回测一次算完。滚动版本用前缀和得到每个窗口的同一组和。
+    回测收益中的NaN（起止日期不同）按列跳过，基准缺失的日期整体剔除。
+    """
+    
+    @staticmethod
+    def returns_from_equity(equity):
+        """权益曲线（Series或DataFrame）转为逐K线收益，第一行为NaN"""
+        return equity.pct_change(fill_method=None)
+    
+    @staticmethod
+    def returns_from_results(results):
+        """
+        由各回测结果得到收益矩阵
+        
+        Args:
+            results: {名称: execute_strategy的结果DataFrame（含date和portfolio_value列）}
+        
+        Returns:
+            returns: (日期 × 名称)的收益DataFrame；某回测没有数据的日期为NaN
+        """
+        equity = pd.concat({name: df.set_index('date')['portfolio_value'] for name, df in results.items()},
+                           axis=1).sort_index()
+        return BenchmarkAttribution.returns_from_equity(equity)
+    
+    @staticmethod
+    def _prepare(returns, benchmark, risk_free):
+        """对齐日期，返回超额收益矩阵、有效标记和基准超额收益"""
+        benchmark = benchmark.reindex(returns.index)
+        keep = benchmark.notna().values
+        r = np.asarray(returns.values[keep], dtype=float) - risk_free
+        b = benchmark.values[keep].astype(float) - risk_free
+        valid = ~np.isnan(r)
+        return np.where(valid, r, 0.0), valid.astype(float), b, returns.index[keep]
+    
+    @staticmethod
+    def _center(r, valid, b):
+        """减去全样本均值以降低平方和的舍入误差（不改变方差和协方差）"""
+        shift_b = b.mean() if len(b) else 0.0
+        count = valid.sum(axis=0)
+        shift_r = np.divide(r.sum(axis=0), count, out=np.zeros(r.shape[1]), where=count > 0)
+        return (r - shift_r) * valid, (b - shift_b)[:, None] * valid
+    
+    @staticmethod
+    def _from_sums(count, sum_r, sum_b, s_r, s_rr, s_rb, s_b, s_bb, periods_per_year):
+        """
+        由各项和计算归因指标（参数形状相同，按元素计算）
+        
+        sum_r/sum_b为原始收益的和（用于均值），s_*为去中心化后的和（用于方差和协方差）
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_r = sum_r / count
+            mean_b = sum_b / count
+            var_r = (s_rr - s_r * s_r / count) / (count - 1)
+            var_b = (s_bb - s_b * s_b / count) / (count - 1)
+            cov = (s_rb - s_r * s_b / count) / (count - 1)
+            beta = cov / var_b
+            correlation = cov / np.sqrt(var_r * var_b)
+            # 主动收益 r - b 的方差
+            tracking_error = np.sqrt(np.maximum(var_r + var_b - 2 * cov, 0.0) * periods_per_year)
+            active_return = (mean_r - mean_b) * periods_per_year
+            information_ratio = np.where(tracking_error > 0, active_return / tracking_error, np.nan)
+        return {
+            'alpha': (mean_r - beta * mean_b) * periods_per_year,
+            'beta': beta,
+            'correlation': correlation,
+            'r_squared': correlation ** 2,
+            'tracking_error': tracking_error,
+            'information_ratio': information_ratio,
+            'active_return': active_return,
+            'observations': count,
+        }
+    
+    @staticmethod
+    def compute(returns, benchmark, periods_per_year=252, risk_free=0.0):
+        """
+        全样本归因
+        
+        Args:
+            returns: (日期 × 回测)的收益DataFrame（如returns_from_results的返回值）
+            benchmark: 以日期为索引的基准收益Series
+            periods_per_year: 年化周期数
+            risk_free: 每期无风险收益率（回归使用超额收益）
+        
+        Returns:
+            table: 每个回测一行（年化alpha、beta、相关系数、R²、年化跟踪误差、信息比率、
+                年化主动收益、有效K线数）的数值表
+        """
+        r, valid, b, _ = BenchmarkAttribution._prepare(returns, benchmark, risk_free)
+        rc, bc = BenchmarkAttribution._center(r, valid, b)
+        metrics = BenchmarkAttribution._from_sums(
+            valid.sum(axis=0),
+            r.sum(axis=0),
+            b @ valid,
+            rc.sum(axis=0),
+            np.einsum('ij,ij->j', rc, rc),
+            np.einsum('ij,ij->j', rc, bc),
+            bc.sum(axis=0),
+            np.einsum('ij,ij->j', bc, bc),
+            periods_per_year,
+        )
+        return pd.DataFrame(metrics, index=returns.columns)
+    
+    @staticmethod
+    def rolling(returns, benchmark, window=63, periods_per_year=252, risk_free=0.0, min_periods=None):
+        """
+        滚动窗口归因
+        
+        Args:
+            returns: (日期 × 回测)的收益DataFrame
+            benchmark: 基准收益Series
+            window: 窗口长度（K线数）
+            periods_per_year: 年化周期数
+            risk_free: 每期无风险收益率
+            min_periods: 窗口内至少需要的有效K线数（缺省为window）
+        
+        Returns:
+            metrics: {指标名: (日期 × 回测)DataFrame}，窗口以该日期结束
+        """
+        r, valid, b, index = BenchmarkAttribution._prepare(returns, benchmark, risk_free)
+        rc, bc = BenchmarkAttribution._center(r, valid, b)
+        count = _window_sum(valid, window)
+        metrics = BenchmarkAttribution._from_sums(
+            count,
+            _window_sum(r, window),
+            _window_sum(b[:, None] * valid, window),
+            _window_sum(rc, window),
+            _window_sum(rc * rc, window),
+            _window_sum(rc * bc, window),
+            _window_sum(bc, window),
+            _window_sum(bc * bc, window),
+            periods_per_year,
+        )
+        enough = count >= (window if min_periods is None else min_periods)
+        return {
+            name: pd.DataFrame(np.where(enough, values, np.nan), index=index, columns=returns.columns)
+            for name, values in metrics.items()
+        }
+    
+    @staticmethod
+    def from_results(results, benchmark_close, periods_per_year=252, risk_free=0.0):
+        """
+        对一组回测结果做全样本归因
+        
+        Args:
+            results: {名称: execute_strategy的结果DataFrame}
+            benchmark_close: 以日期为索引的基准指数收盘价Series
+        
+        Returns:
+            table: compute的结果
+        """
+        returns = BenchmarkAttribution.returns_from_results(results)
+        benchmark = BenchmarkAttribution.returns_from_equity(benchmark_close.sort_index())
+        return BenchmarkAttribution.compute(returns, benchmark, periods_per_year, risk_free)
@@ -0,0 +1,225 @@
+# trading_strategies/utils/bar_builder.py
+import numpy as np
+import pandas as pd
+
+from utils import kernels
+from utils.data_loader import DataLoader
+
+# K线类型：按成交量、成交额或成交笔数（记录数）切分
+BAR_VOLUME = 'volume'
+BAR_DOLLAR = 'dollar'
+BAR_TICK = 'tick'
+
+# 输出列，与load_csv/prepare_data使用的日线数据一致
+BAR_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'adjclose', 'volume']
+
+
+class BarBuilder:
+    """成交量/成交额/笔数K线构建器：流式读取日内OHLCV或逐笔成交，单遍生成K线
+    
+    输入为按时间升序的数据块（date列为时间戳），可以是日内K线（open/high/low/close/volume）
+    或逐笔成交（price，以及size或volume）。未完成的K线和自适应阈值的状态在数据块之间延续，
+    内存占用只由块大小决定。输出的列与日线数据相同（date为K线最后一条记录的时间），
+    可以直接交给DataLoader.prepare_data和任意策略。
+    
+    自适应阈值：给定bars_per_day时，第一个交易日使用threshold，之后每个交易日开始时阈值更新为
+    此前各日活动量的EMA除以bars_per_day，使K线数量跟随近期的活跃程度；阈值只用已结束交易日的
+    数据，结果与数据块的划分无关。
+    """
+    
+    def __init__(self, kind=BAR_VOLUME, threshold=None, bars_per_day=None, span=20):
+        """
+        Args:
+            kind: K线类型（'volume'、'dollar'或'tick'）
+            threshold: 固定阈值；使用自适应阈值时为第一个交易日的阈值（必须指定：
+                第一个交易日没有此前的活动量，用当日数据估计会使用未来数据）
+            bars_per_day: 每个交易日的目标K线数（None表示使用固定阈值）
+            span: 日活动量EMA的周期
+        """
+        if kind not in (BAR_VOLUME, BAR_DOLLAR, BAR_TICK):
+            raise ValueError(f"未知K线类型: {kind}")
+        if threshold is None:
+            raise ValueError("需要指定threshold（使用bars_per_day时为第一个交易日的阈值）")
+        self.kind = kind
+        self.threshold = threshold
+        self.bars_per_day = bars_per_day
+        self.span = span
+        self.reset()
+    
+    def reset(self):
+        """清空流式状态"""
+        self._partial = None  # 未完成K线的{open, high, low, close, volume}
+        self._carry = 0.0
+        self._bar_threshold = np.nan
+        self._day = None  # 当前交易日及其活动量
+        self._day_activity = 0.0
+        self._average = None  # 已结束交易日活动量的EMA
+        self._day_threshold = self.threshold
+    
+    @staticmethod
+    def _records(chunk):
+        """把数据块统一为时间、OHLC和成交量数组"""
+        dates = chunk['date']
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = DataLoader._parse_dates(dates)
+        if 'price' in chunk.columns:
+            price = pd.to_numeric(chunk['price'], errors='coerce').values.astype(float)
+            open_ = high = low = close = price
+            size = chunk['size'] if 'size' in chunk.columns else chunk.get('volume')
+        else:
+            open_, high, low, close = (pd.to_numeric(chunk[c], errors='coerce').values.astype(float)
+                                       for c in ('open', 'high', 'low', 'close'))
+            size = chunk.get('volume')
+        volume = np.zeros(len(chunk)) if size is None else \
+            np.nan_to_num(pd.to_numeric(size, errors='coerce').values.astype(float))
+        return dates.values, open_, high, low, close, volume
+    
+    def _activity(self, close, volume):
+        if self.kind == BAR_VOLUME:
+            return volume
+        if self.kind == BAR_DOLLAR:
+            return np.nan_to_num(close * volume)
+        return np.ones(len(close))
+    
+    def _thresholds(self, days, activity):
+        """
+        每条记录的阈值：同一交易日内不变，交易日开始时由此前各日活动量的EMA更新
+        """
+        if self.bars_per_day is None:
+            return np.full(len(activity), float(self.threshold))
+        
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        totals = np.add.reduceat(activity, starts) if len(activity) else np.empty(0)
+        day_thresholds = np.empty(len(starts))
+        alpha = 2.0 / (self.span + 1.0)
+        for i, day in enumerate(days[starts]):
+            if day != self._day:
+                if self._day is not None:
+                    # 上一个交易日结束
+                    self._average = self._day_activity if self._average is None else \
+                        self._average + alpha * (self._day_activity - self._average)
+                    self._day_threshold = self._average / self.bars_per_day
+                self._day = day
+                self._day_activity = 0.0
+            day_thresholds[i] = self._day_threshold
+            self._day_activity += totals[i]
+        return np.repeat(day_thresholds, np.diff(np.r_[starts, len(activity)]))
+    
+    def update(self, chunk):
+        """
+        输入一个数据块
+        
+        Args:
+            chunk: 按时间升序的日内OHLCV或逐笔成交DataFrame（date列为时间戳）
+        
+        Returns:
+            bars: 本块中完成的K线（BAR_COLUMNS），可能为空
+        """
+        dates, open_, high, low, close, volume = self._records(chunk)
+        if not len(dates):
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        activity = self._activity(close, volume)
+        thresholds = self._thresholds(dates.astype('datetime64[D]'), activity)
+        thresholds = np.maximum(thresholds, np.finfo(float).tiny)
+        
+        closes, self._carry, self._bar_threshold = kernels.bar_closes(
+            activity, thresholds, self._carry, self._bar_threshold
+        )
+        ends = np.flatnonzero(closes)
+        starts = np.r_[0, ends[:-1] + 1].astype(np.intp)
+        
+        bars = pd.DataFrame(columns=BAR_COLUMNS)
+        if len(ends):
+            done = ends[-1] + 1
+            bar_high = np.fmax.reduceat(high[:done], starts)
+            bar_low = np.fmin.reduceat(low[:done], starts)
+            bar_volume = np.add.reduceat(volume[:done], starts)
+            bar_open = open_[starts].copy()
+            if self._partial is not None:
+                # 第一根K线接上一块未完成的部分
+                partial = self._partial
+                bar_open[0] = partial['open']
+                bar_high[0] = np.fmax(bar_high[0], partial['high'])
+                bar_low[0] = np.fmin(bar_low[0], partial['low'])
+                bar_volume[0] += partial['volume']
+                self._partial = None
+            bars = pd.DataFrame({
+                'date': dates[ends],
+                'open': bar_open,
+                'high': bar_high,
+                'low': bar_low,
+                'close': close[ends],
+                'adjclose': close[ends],
+                'volume': bar_volume,
+            })
+        
+        # 最后一次收盘之后的记录留到下一块
+        rest = ends[-1] + 1 if len(ends) else 0
+        if rest < len(dates):
+            tail = {
+                'open': open_[rest],
+                'high': np.nanmax(high[rest:]),
+                'low': np.nanmin(low[rest:]),
+                'close': close[-1],
+                'volume': volume[rest:].sum(),
+                'date': dates[-1],
+            }
+            if self._partial is not None:
+                tail['open'] = self._partial['open']
+                tail['high'] = np.fmax(tail['high'], self._partial['high'])
+                tail['low'] = np.fmin(tail['low'], self._partial['low'])
+                tail['volume'] += self._partial['volume']
+            self._partial = tail
+        return bars
+    
+    def flush(self):
+        """
+        结束输入，返回未达到阈值的最后一根K线（没有时为空DataFrame）并清空状态
+        """
+        partial = self._partial
+        self.reset()
+        if partial is None:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        return pd.DataFrame([{**partial, 'adjclose': partial['close']}], columns=BAR_COLUMNS)
+    
+    def iter_bars(self, chunks, include_partial=False):
+        """
+        流式生成K线
+        
+        Args:
+            chunks: 按时间升序的数据块迭代器
+            include_partial: 结束时是否输出未达到阈值的最后一根K线
+        
+        Yields:
+            bars: 每个数据块完成的K线
+        """
+        self.reset()
+        for chunk in chunks:
+            bars = self.update(chunk)
+            if len(bars):
+                yield bars
+        if include_partial:
+            bars = self.flush()
+            if len(bars):
+                yield bars
+    
+    def build(self, chunks, include_partial=False):
+        """
+        生成全部K线
+        
+        Returns:
+            df: 与load_csv格式相同的K线数据
+        """
+        parts = list(self.iter_bars(chunks, include_partial))
+        if not parts:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        return pd.concat(parts, ignore_index=True)
+    
+    def build_csv(self, filepath, chunksize=100000, include_partial=False):
+        """
+        从日内数据CSV生成K线（分块读取，按时间降序保存的文件从末尾向前读）
+        
+        Returns:
+            df: 与load_csv格式相同的K线数据，可直接交给DataLoader.prepare_data
+        """
+        return self.build(DataLoader.iter_csv_chunks(filepath, chunksize), include_partial)
@@ -0,0 +1,146 @@
+# trading_strategies/utils/chunked_backtest.py
+import numpy as np
+import pandas as pd
+
+from strategy.backtest_engine import BacktestEngine
+from strategy.base_strategy import BaseTradingStrategy, ENGINE_PARAMS
+from utils import kernels
+from utils.data_loader import DataLoader
+
+
+class ChunkedBacktester:
+    """分块回测器：按固定行数流式处理价格数据，峰值内存由分块大小决定"""
+    
+    def __init__(self, strategy, initial_capital=100000, **trading_params):
+        self.strategy = strategy
+        self.initial_capital = initial_capital
+        self.engine_params = {k: v for k, v in trading_params.items() if k in ENGINE_PARAMS}
+        self.trades = []
+    
+    def iter_results(self, chunks):
+        """
+        逐块执行信号生成和回测
+        
+        指标状态（EMA值、滚动窗口尾部）、ATR窗口和持仓/现金状态在数据块之间延续，
+        拼接各块结果与execute_strategy的整体结果一致。
+        
+        Args:
+            chunks: 按日期升序的数据块迭代器
+        
+        Yields:
+            result_chunk: 本块的回测结果（列与execute_strategy一致）
+        """
+        signal_state = {}
+        engine_state = None
+        atr_tail = None
+        atr_period = self.engine_params.get('atr_period', 14)
+        offset = 0
+        self.trades = []
+        
+        for chunk in chunks:
+            chunk = chunk.reset_index(drop=True)
+            if self.strategy.adjusted:
+                # 复权因子逐行计算，与数据块的划分无关
+                chunk = self.strategy.price_input(chunk).copy()
+            chunk['signal'] = self.strategy.generate_signals_chunk(chunk, signal_state)
+            
+            prices = {
+                'open_': chunk['open'].values if 'open' in chunk.columns else None,
+                'high': chunk['high'].values if 'high' in chunk.columns else None,
+                'low': chunk['low'].values if 'low' in chunk.columns else None,
+            }
+            
+            # ATR窗口需要上一块末尾atr_period根K线
+            atr = None
+            if self.engine_params.get('trailing_atr_multiple'):
+                frame = chunk[['high', 'low', 'close']]
+                if atr_tail is not None:
+                    frame = pd.concat([atr_tail, frame], ignore_index=True)
+                atr = BacktestEngine.average_true_range(
+                    frame['high'].values, frame['low'].values, frame['close'].values, atr_period,
+                    origin=offset + len(chunk) - len(frame)
+                )[len(frame) - len(chunk):]
+                atr_tail = frame.iloc[-atr_period:].reset_index(drop=True)
+            
+            result = BacktestEngine.run(
+                chunk['close'].values,
+                chunk['signal'].values,
+                initial_capital=self.initial_capital,
+                atr=atr,
+                state=engine_state,
+                **prices,
+                **self.engine_params
+            )
+            self._record_trades(result, engine_state, chunk, offset)
+            engine_state = result['state']
+            
+            BaseTradingStrategy._write_result_columns(chunk, result)
+            offset += len(chunk)
+            yield chunk
+    
+    def _record_trades(self, result, prev_state, chunk, offset):
+        """把块内交易的K线位置换算为全局位置"""
+        continued = prev_state['open_trade'] if prev_state is not None else None
+        for trade in result['trades']:
+            if trade is continued:
+                record = self.trades[-1]
+            else:
+                record = {
+                    'entry_bar': offset + trade['entry_bar'],
+                    'entry_date': chunk.loc[trade['entry_bar'], 'date'],
+                    'entry_price': trade['entry_price'],
+                    'shares': trade['shares'],
+                    'exit_bar': None,
+                    'exit_date': None,
+                    'exit_price': np.nan,
+                    'exit_reason': None,
+                    'at_open': trade['at_open'],
+                }
+                self.trades.append(record)
+            
+            if trade['exit_bar'] is not None:
+                record.update(
+                    exit_bar=offset + trade['exit_bar'],
+                    exit_date=chunk.loc[trade['exit_bar'], 'date'],
+                    exit_price=trade['exit_price'],
+                    exit_reason=trade['exit_reason'],
+                )
+    
+    def run(self, filepath, chunksize=100000, output_path=None):
+        """
+        分块回测CSV文件
+        
+        Args:
+            filepath: 价格数据CSV路径
+            chunksize: 每块行数
+            output_path: 逐K线结果的输出CSV路径（None表示不保存）
+        
+        Returns:
+            summary: 回测汇总（K线数、最终价值、总收益、最大回撤、交易列表和计算后端）
+        """
+        bars = 0
+        peak = -np.inf
+        max_drawdown = 0.0
+        final_value = self.initial_capital
+        
+        chunks = DataLoader.iter_csv_chunks(filepath, chunksize)
+        for i, result in enumerate(self.iter_results(chunks)):
+            if output_path is not None:
+                result.to_csv(output_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            
+            values = result['portfolio_value'].values
+            if len(values):
+                running_peak = np.maximum.accumulate(np.maximum(values, peak))
+                max_drawdown = min(max_drawdown, ((values - running_peak) / running_peak).min() * 100)
+                peak = running_peak[-1]
+                final_value = values[-1]
+            bars += len(result)
+        
+        return {
+            'bars': bars,
+            'final_value': final_value,
+            'total_return': (final_value / self.initial_capital - 1) * 100,
+            'max_drawdown': max_drawdown,
+            'trades': self.trades,
+            'kernel_backend': kernels.BACKEND,
+        }
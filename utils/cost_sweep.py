@@ -0,0 +1,152 @@
+# trading_strategies/utils/cost_sweep.py
+import numpy as np
+import pandas as pd
+
+from strategy.backtest_engine import BacktestEngine
+from strategy.base_strategy import ENGINE_PARAMS
+
+
+class CostSweep:
+    """交易成本敏感性分析：复用一组交易，把手续费 × 滑点网格作为广播数组一次套用到所有成交上
+    
+    交易的开平仓K线和原始成交价取自一次参考回测（因此适用于任何成交模型），成本只改变成交价和每笔交易的股数（股数随资金复利变化）。
+    只有信号出场时结果与逐个成本点重新回测完全一致；止损止盈的触发价与开仓成交价有关，
+    高成本下的触发时点可能与参考回测略有不同，这里沿用参考回测的出场K线和原始出场价。
+    """
+    
+    @staticmethod
+    def bps_grid(max_bps=20, step_bps=5):
+        """0到max_bps（含）的基点网格，返回费率数组"""
+        return np.arange(0, max_bps + step_bps / 2, step_bps) / 10000
+    
+    @staticmethod
+    def run(close, trades, commission_rates, slippages, initial_capital=100000,
+            position_size=1.0, base_slippage=0.0):
+        """
+        在成本网格上重算一组交易
+        
+        Args:
+            close: 收盘价数组
+            trades: 参考回测的交易列表（BacktestEngine.run返回的trades）
+            commission_rates: 手续费率数组（网格第一维）
+            slippages: 滑点比例数组（网格第二维）
+            initial_capital: 初始资金
+            position_size: 每次开仓使用的资金比例
+            base_slippage: 参考回测使用的滑点，用于还原原始成交价
+        
+        Returns:
+            surface: 字典，每个指标为(手续费数, 滑点数)的二维数组
+        """
+        close = np.asarray(close, dtype=float)
+        n = len(close)
+        commission = np.asarray(commission_rates, dtype=float)[:, None]
+        slippage = np.asarray(slippages, dtype=float)[None, :]
+        shape = (commission.shape[0], slippage.shape[1])
+        
+        cash = np.full(shape, float(initial_capital))
+        peak = cash.copy()
+        max_drawdown = np.zeros(shape)
+        wins = np.zeros(shape)
+        return_sum = np.zeros(shape)
+        closed_trades = 0
+        equity = cash
+        
+        def track(values):
+            """按时间顺序更新峰值和最大回撤，values最后一维为K线"""
+            nonlocal peak, max_drawdown
+            running_peak = np.maximum.accumulate(np.maximum(values, peak[..., None]), axis=-1)
+            max_drawdown = np.minimum(max_drawdown, ((values - running_peak) / running_peak).min(axis=-1))
+            peak = running_peak[..., -1]
+        
+        for trade in trades:
+            entry_bar = trade['entry_bar']
+            # 分块回测延续下来的持仓没有本序列内的开仓K线
+            if entry_bar < 0:
+                continue
+            # 参考回测的成交价还原为不含滑点的原始价（与成交模型无关）
+            raw_entry = trade['entry_price'] / (1 + base_slippage)
+            entry_fill = raw_entry * (1 + slippage)
+            shares = np.floor(cash * position_size / (entry_fill * (1 + commission)))
+            cash = cash - shares * entry_fill * (1 + commission)
+            
+            closed = trade['exit_bar'] is not None
+            end = trade['exit_bar'] if closed else n
+            # 持仓期间（开仓K线到平仓前一根K线）的组合价值
+            track(cash[..., None] + shares[..., None] * close[entry_bar:end])
+            
+            if not closed:
+                equity = cash + shares * close[-1]
+                break
+            
+            raw_exit = trade['exit_price'] / (1 - base_slippage)
+            exit_fill = raw_exit * (1 - slippage)
+            cash = cash + shares * exit_fill * (1 - commission)
+            track(cash[..., None])
+            equity = cash
+            
+            with np.errstate(divide='ignore', invalid='ignore'):
+                trade_return = exit_fill * (1 - commission) / (entry_fill * (1 + commission)) - 1
+            wins += trade_return > 0
+            return_sum += trade_return
+            closed_trades += 1
+        
+        final_value = np.broadcast_to(equity, shape).copy()
+        return {
+            'final_value': final_value,
+            'total_return': (final_value / initial_capital - 1) * 100,
+            'max_drawdown': max_drawdown * 100,
+            'win_rate': wins / closed_trades * 100 if closed_trades else np.zeros(shape),
+            'avg_trade_return': return_sum / closed_trades * 100 if closed_trades else np.zeros(shape),
+            'trades': closed_trades,
+        }
+    
+    @staticmethod
+    def to_frame(surface, commission_rates, slippages):
+        """把网格结果展开为以(手续费bps, 滑点bps)为索引的表"""
+        index = pd.MultiIndex.from_product(
+            [np.round(np.asarray(commission_rates) * 10000, 4), np.round(np.asarray(slippages) * 10000, 4)],
+            names=['commission_bps', 'slippage_bps']
+        )
+        return pd.DataFrame(
+            {key: np.ravel(value) for key, value in surface.items() if np.ndim(value) == 2},
+            index=index
+        )
+    
+    @staticmethod
+    def from_strategy(strategy, df, commission_rates=None, slippages=None,
+                      initial_capital=100000, **trading_params):
+        """
+        对一个策略做成本敏感性分析：生成一次信号、做一次零成本参考回测，再套用整个成本网格
+        
+        Args:
+            strategy: 策略实例
+            df: 按日期升序的股票数据
+            commission_rates/slippages: 成本网格（缺省为0~20bps，步长5bps）
+            initial_capital: 初始资金
+            **trading_params: 其他交易参数（仓位、止损止盈等；手续费和滑点由网格给出）
+        
+        Returns:
+            table: 以(手续费bps, 滑点bps)为索引的指标表
+        """
+        commission_rates = CostSweep.bps_grid() if commission_rates is None else np.asarray(commission_rates)
+        slippages = CostSweep.bps_grid() if slippages is None else np.asarray(slippages)
+        
+        engine_params = {k: v for k, v in trading_params.items()
+                         if k in ENGINE_PARAMS and k not in ('commission_rate', 'slippage')}
+        events = strategy.generate_signal_events(df)
+        reference = BacktestEngine.run(
+            df['close'].values,
+            events,
+            open_=df['open'].values if 'open' in df.columns else None,
+            high=df['high'].values if 'high' in df.columns else None,
+            low=df['low'].values if 'low' in df.columns else None,
+            initial_capital=initial_capital,
+            per_bar=False,
+            **engine_params
+        )
+        surface = CostSweep.run(
+            df['close'].values, reference['trades'], commission_rates, slippages,
+            initial_capital=initial_capital,
+            position_size=engine_params.get('position_size', 1.0)
+        )
+        return CostSweep.to_frame(surface, commission_rates, slippages)
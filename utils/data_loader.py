@@ -1,21 +1,160 @@
 # trading_strategies/utils/data_loader.py
+import io
+import weakref
 import pandas as pd
 import numpy as np
 
+# 需要按复权因子调整的价格列（成交量不调整）
+ADJUSTED_COLUMNS = ('open', 'high', 'low', 'close')
+
+# 每个原始数据DataFrame对应的复权视图：{id(df): AdjustedPrices}，df被回收时自动移除
+_price_views = {}
+
+
+class AdjustedPrices:
+    """复权价格视图：复权因子对每个数据只计算一次，复权后的各列按需计算并缓存
+    
+    复权因子为adjclose / close（拆股和分红的累计调整），复权OHLC为原始价格乘以因子。
+    frame()返回的DataFrame与原始数据共用未调整的列，不复制整个数据。
+    """
+    
+    def __init__(self, df):
+        self._ref = weakref.ref(df)
+        self._fingerprint = AdjustedPrices.fingerprint(df)
+        self._factor = None
+        self._columns = {}
+        self._frame = None
+    
+    @property
+    def raw(self):
+        return self._ref()
+    
+    @staticmethod
+    def fingerprint(df):
+        """
+        数据的指纹：行数、列名和各价格列底层数组的地址
+        
+        整列替换（df['close'] = ...）、增删行或列后指纹改变，视图随之重建；
+        在原数组上逐个修改价格（df.loc[i, 'close'] = ...）不改变指纹，需要改用数据的副本
+        """
+        buffers = tuple(df[name].values.__array_interface__['data'][0] if name in df.columns else None
+                        for name in ADJUSTED_COLUMNS + ('adjclose',))
+        return len(df), tuple(df.columns), buffers
+    
+    def is_current(self, df):
+        """视图是否仍对应df的当前数据"""
+        return self.raw is df and self._fingerprint == AdjustedPrices.fingerprint(df)
+    
+    @property
+    def factor(self):
+        """复权因子数组（缺失处沿用相邻K线的因子，没有adjclose列时为1）"""
+        if self._factor is None:
+            self._factor = DataLoader.adjustment_factors(self.raw)
+        return self._factor
+    
+    def column(self, name):
+        """复权后的一列（价格列以外的列原样返回）"""
+        if name not in ADJUSTED_COLUMNS:
+            return self.raw[name].values
+        if name not in self._columns:
+            self._columns[name] = self.raw[name].values * self.factor
+        return self._columns[name]
+    
+    def frame(self, adjusted=True):
+        """
+        策略使用的数据
+        
+        Args:
+            adjusted: False时直接返回原始数据；True时返回OHLC为复权价的DataFrame（结果缓存）
+        """
+        df = self.raw
+        if not adjusted or 'adjclose' not in df.columns:
+            return df
+        if self._frame is None:
+            data = {name: self.column(name) if name in ADJUSTED_COLUMNS else df[name].values
+                    for name in df.columns}
+            self._frame = pd.DataFrame(data, index=df.index, copy=False)
+        return self._frame
+
+
 class DataLoader:
     """数据加载器"""
     
     @staticmethod
-    def load_csv(filepath):
-        """从CSV文件加载数据"""
-        df = pd.read_csv(filepath)
+    def load_csv(filepath, columns=None, start=None, end=None, chunksize=10000):
+        """
+        从CSV文件加载数据
+        
+        Args:
+            filepath: CSV文件路径
+            columns: 需要的列（date列总是保留），None表示全部列
+            start/end: 日期范围（含两端），None表示不限；指定时分块读取，读过范围后提前停止
+            chunksize: 按日期范围读取时每块的行数
+        """
+        usecols = None if columns is None else list(dict.fromkeys(['date'] + list(columns)))
+        if start is not None or end is not None:
+            return DataLoader._load_csv_range(filepath, usecols, start, end, chunksize)
+        
+        df = pd.read_csv(filepath, usecols=usecols)
         
         # 转换日期格式
         if 'date' in df.columns:
             df['date'] = pd.to_datetime(df['date'])
             df = df.sort_values('date').reset_index(drop=True)
         
-        # 确保数值列是正确的类型
+        return DataLoader._convert_numeric(df)
+    
+    @staticmethod
+    def _load_csv_range(filepath, usecols, start, end, chunksize):
+        """
+        按日期范围读取CSV
+        
+        从离范围较近的一端开始读：只给start时从最新数据一端读，否则从最早数据一端读；
+        当前块已越过范围的另一端时停止，不再读取剩余部分。
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        
+        head = pd.read_csv(filepath, nrows=2, usecols=['date'])
+        head_dates = pd.to_datetime(head['date'])
+        descending = len(head_dates) == 2 and head_dates.iloc[1] < head_dates.iloc[0]
+        
+        from_latest = start is not None and end is None
+        # 文件顺序与需要的读取方向相反时从文件末尾向前读
+        backward = from_latest != descending
+        if backward:
+            chunks = DataLoader._iter_reversed_csv(filepath, chunksize, usecols=usecols)
+        else:
+            chunks = pd.read_csv(filepath, chunksize=chunksize, usecols=usecols)
+        
+        parts = []
+        for chunk in chunks:
+            dates = DataLoader._parse_dates(chunk['date'])
+            mask = np.ones(len(chunk), dtype=bool)
+            if start is not None:
+                mask &= (dates >= start).values
+            if end is not None:
+                mask &= (dates <= end).values
+            if mask.any():
+                chunk = chunk[mask].copy()
+                chunk['date'] = dates[mask]
+                parts.append(chunk)
+            # 读取方向上已越过范围边界
+            if from_latest and dates.min() < start:
+                break
+            if not from_latest and end is not None and dates.max() > end:
+                break
+        
+        if not parts:
+            columns = usecols if usecols is not None else pd.read_csv(filepath, nrows=0).columns
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(parts, ignore_index=True)
+        df = df.sort_values('date').reset_index(drop=True)
+        return DataLoader._convert_numeric(df)
+    
+    @staticmethod
+    def _convert_numeric(df):
+        """确保数值列是正确的类型"""
         numeric_cols = ['open', 'high', 'low', 'close', 'adjclose', 'volume']
         for col in numeric_cols:
             if col in df.columns:
@@ -24,8 +163,143 @@ class DataLoader:
         return df
     
     @staticmethod
-    def prepare_data(df):
-        """准备数据用于策略"""
+    def iter_csv_chunks(filepath, chunksize=100000):
+        """
+        按日期升序分块读取CSV文件，内存占用由chunksize决定
+        
+        文件按日期降序保存时（如Yahoo导出的数据）从文件末尾向前读取。
+        
+        Args:
+            filepath: CSV文件路径
+            chunksize: 每块行数
+        
+        Yields:
+            chunk: 按日期升序排列的数据块，与load_csv的列类型一致
+        """
+        head = pd.read_csv(filepath, nrows=2, usecols=['date'])
+        head_dates = pd.to_datetime(head['date'])
+        descending = len(head_dates) == 2 and head_dates.iloc[1] < head_dates.iloc[0]
+        
+        if descending:
+            chunks = DataLoader._iter_reversed_csv(filepath, chunksize)
+        else:
+            chunks = pd.read_csv(filepath, chunksize=chunksize)
+        
+        for chunk in chunks:
+            chunk['date'] = DataLoader._parse_dates(chunk['date'])
+            yield DataLoader._convert_numeric(chunk.reset_index(drop=True))
+    
+    @staticmethod
+    def _parse_dates(dates):
+        """解析日期列；单个数据块推断出的格式不适用于所有行时逐行解析"""
+        try:
+            return pd.to_datetime(dates)
+        except ValueError:
+            return pd.to_datetime(dates, format='mixed')
+    
+    @staticmethod
+    def _iter_reversed_csv(filepath, chunksize, block_size=1 << 20, usecols=None):
+        """从文件末尾向前逐块读取行，按与文件相反的顺序组装成DataFrame"""
+        with open(filepath, 'rb') as f:
+            header = f.readline()
+            data_start = f.tell()
+            f.seek(0, io.SEEK_END)
+            pos = f.tell()
+            
+            remainder = b''
+            lines = []
+            while pos > data_start:
+                size = min(block_size, pos - data_start)
+                pos -= size
+                f.seek(pos)
+                parts = (f.read(size) + remainder).split(b'\n')
+                # 第一段可能是不完整的行，留到读取下一块时拼接
+                remainder = parts[0]
+                for line in reversed(parts[1:]):
+                    if line.strip():
+                        lines.append(line)
+                        if len(lines) == chunksize:
+                            yield pd.read_csv(io.BytesIO(header + b'\n'.join(lines)), usecols=usecols)
+                            lines = []
+            
+            if remainder.strip():
+                lines.append(remainder)
+            if lines:
+                yield pd.read_csv(io.BytesIO(header + b'\n'.join(lines)), usecols=usecols)
+    
+    @staticmethod
+    def build_panel(frames, fields=('close',)):
+        """
+        把多只股票的数据拼成(日期 × 股票)面板
+        
+        Args:
+            frames: {股票代码: DataFrame}，每个DataFrame包含date列
+            fields: 需要的字段
+        
+        Returns:
+            panels: {字段: DataFrame}，行为所有股票日期的并集（升序），列为股票代码，缺失为NaN
+        """
+        indexed = {symbol: df.set_index('date') for symbol, df in frames.items()}
+        panels = {}
+        for field in fields:
+            panel = pd.concat({symbol: df[field] for symbol, df in indexed.items()}, axis=1)
+            panels[field] = panel.sort_index()
+        return panels
+    
+    @staticmethod
+    def adjustment_factors(df):
+        """
+        计算复权因子adjclose / close
+        
+        Returns:
+            factor: 与df等长的数组；close或adjclose缺失的K线沿用前一根（开头沿用后一根）K线的因子，
+                没有adjclose列时全部为1
+        """
+        if 'adjclose' not in df.columns:
+            return np.ones(len(df))
+        close = df['close'].values.astype(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            factor = df['adjclose'].values.astype(float) / close
+        factor[~np.isfinite(factor) | (factor <= 0)] = np.nan
+        return pd.Series(factor).ffill().bfill().fillna(1.0).values
+    
+    @staticmethod
+    def price_view(df):
+        """
+        取得df的复权价格视图（同一个DataFrame只创建一次，复权因子和复权列在多个策略之间共享；
+        df的价格列被替换或行列变化后重新创建，见AdjustedPrices.fingerprint）
+        
+        Returns:
+            view: AdjustedPrices，view.frame(adjusted)为策略使用的数据
+        """
+        key = id(df)
+        view = _price_views.get(key)
+        if view is None or not view.is_current(df):
+            if view is None or view.raw is not df:
+                weakref.finalize(df, _price_views.pop, key, None)
+            view = AdjustedPrices(df)
+            _price_views[key] = view
+        return view
+    
+    @staticmethod
+    def adjusted(df, adjusted=True):
+        """返回复权（或原始）价格的数据，等同于price_view(df).frame(adjusted)"""
+        return DataLoader.price_view(df).frame(adjusted)
+    
+    @staticmethod
+    def prepare_data(df, validator=None, repair=None, return_report=False):
+        """
+        准备数据用于策略
+        
+        Args:
+            df: load_csv返回的数据
+            validator: DataValidator实例（None表示不做数据质量检查）
+            repair: 检查出问题时的修复方式（None表示只报告，'ffill'或'drop'）
+            return_report: 是否同时返回问题汇总（DataValidator.report，未检查时为None）
+        
+        Returns:
+            df: 数据副本（或修复后的数据）
+        """
         df = df.copy()
         
         # 确保必要的列存在
@@ -34,4 +308,13 @@ class DataLoader:
             if col not in df.columns:
                 raise ValueError(f"缺少必要列: {col}")
         
-        return df
\ No newline at end of file
+        report = None
+        if validator is not None:
+            masks = validator.validate(df)
+            report = validator.report(masks, df['date'])
+            if repair is not None and len(report):
+                df = validator.repair(df, masks, repair)
+        
+        if return_report:
+            return df, report
+        return df
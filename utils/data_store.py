@@ -0,0 +1,148 @@
+# trading_strategies/utils/data_store.py
+import os
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import DataLoader, ADJUSTED_COLUMNS
+
+
+class DataStore:
+    """按列存储的行情数据：每只股票一个目录，每列一个.npy文件
+    
+    date.npy（升序的int64纳秒时间戳）就是该股票的日期索引。读取时用searchsorted
+    把日期范围换算为行区间，再以内存映射方式只读取所需列的对应字节范围。
+    写入时同时保存复权因子adj_factor.npy（adjclose / close），复权价格读取时只对所需行区间的
+    价格和因子相乘，不读入或缓存整列。
+    """
+    
+    DATE_FILE = 'date.npy'
+    FACTOR_COLUMN = 'adj_factor'
+    
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+    
+    def _path(self, symbol, column):
+        return os.path.join(self.root, symbol, f'{column}.npy')
+    
+    def symbols(self):
+        """已存储的股票代码"""
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(self._path(name, 'date'))
+        )
+    
+    def columns(self, symbol):
+        """某只股票已存储的列（不含date）"""
+        files = os.listdir(os.path.join(self.root, symbol))
+        return sorted(f[:-4] for f in files
+                      if f.endswith('.npy') and f not in (self.DATE_FILE, self.FACTOR_COLUMN + '.npy'))
+    
+    def _dates(self, symbol):
+        """日期索引（内存映射，不读入整个文件）"""
+        path = self._path(symbol, 'date')
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r')
+    
+    def last_date(self, symbol):
+        """最新一条数据的日期，无数据时返回None"""
+        dates = self._dates(symbol)
+        if dates is None or len(dates) == 0:
+            return None
+        return pd.Timestamp(int(dates[-1]))
+    
+    def write(self, symbol, df):
+        """覆盖写入一只股票的数据（按日期排序，date之外的数值列各存一个文件）"""
+        df = df.sort_values('date').reset_index(drop=True)
+        if 'adjclose' in df.columns:
+            df[self.FACTOR_COLUMN] = DataLoader.adjustment_factors(df)
+        os.makedirs(os.path.join(self.root, symbol), exist_ok=True)
+        for column in df.columns:
+            if column == 'date':
+                values = pd.to_datetime(df['date']).values.astype('datetime64[ns]').astype(np.int64)
+            else:
+                values = pd.to_numeric(df[column], errors='coerce').values.astype(float)
+            # 先写临时文件再替换，读者不会看到写了一半的文件
+            tmp = self._path(symbol, column) + '.tmp'
+            with open(tmp, 'wb') as f:
+                np.save(f, values)
+            os.replace(tmp, self._path(symbol, column))
+    
+    def append(self, symbol, df):
+        """追加新数据；与已有日期重复的行以新数据为准"""
+        if self._dates(symbol) is None:
+            self.write(symbol, df)
+            return len(df)
+        existing = self.read(symbol)
+        merged = pd.concat([existing, df], ignore_index=True)
+        merged['date'] = pd.to_datetime(merged['date'])
+        merged = merged.drop_duplicates('date', keep='last')
+        self.write(symbol, merged)
+        return len(merged) - len(existing)
+    
+    def row_range(self, symbol, start=None, end=None, last=None):
+        """
+        把日期范围换算为行区间[lo, hi)
+        
+        Args:
+            start/end: 日期范围（含两端）
+            last: 只取范围内最后last行
+        """
+        dates = self._dates(symbol)
+        if dates is None:
+            raise KeyError(f"数据存储中没有股票: {symbol}")
+        lo, hi = 0, len(dates)
+        if start is not None:
+            lo = int(np.searchsorted(dates, pd.Timestamp(start).value, side='left'))
+        if end is not None:
+            hi = int(np.searchsorted(dates, pd.Timestamp(end).value, side='right'))
+        if last is not None:
+            lo = max(lo, hi - last)
+        return lo, max(lo, hi)
+    
+    def _adjusted_column(self, symbol, column, lo, hi):
+        """复权后的价格：只读取[lo, hi)行的价格和复权因子相乘"""
+        values = np.array(np.load(self._path(symbol, column), mmap_mode='r')[lo:hi])
+        factor_path = self._path(symbol, self.FACTOR_COLUMN)
+        if os.path.exists(factor_path):
+            values *= np.load(factor_path, mmap_mode='r')[lo:hi]
+        return values
+    
+    def read(self, symbol, columns=None, start=None, end=None, last=None, adjusted=False):
+        """
+        读取一只股票的数据，只读取所需列在日期范围内的部分
+        
+        Args:
+            symbol: 股票代码
+            columns: 需要的列（date列总是返回），None表示全部列
+            start/end: 日期范围（含两端）
+            last: 只取最后last行（如筛选只需要最近的预热K线）
+            adjusted: 是否返回复权后的OHLC
+        
+        Returns:
+            df: 与DataLoader.load_csv格式一致的DataFrame（按日期升序）
+        """
+        lo, hi = self.row_range(symbol, start, end, last)
+        columns = self.columns(symbol) if columns is None else [c for c in columns if c != 'date']
+        
+        data = {'date': pd.to_datetime(np.asarray(self._dates(symbol)[lo:hi]))}
+        for column in columns:
+            if adjusted and column in ADJUSTED_COLUMNS:
+                data[column] = self._adjusted_column(symbol, column, lo, hi)
+            else:
+                data[column] = np.array(np.load(self._path(symbol, column), mmap_mode='r')[lo:hi])
+        return pd.DataFrame(data)
+    
+    def read_panel(self, symbols=None, field='close', start=None, end=None, last=None, adjusted=False):
+        """读取多只股票的同一字段，返回(日期 × 股票)面板"""
+        symbols = self.symbols() if symbols is None else symbols
+        frames = {symbol: self.read(symbol, [field], start, end, last, adjusted) for symbol in symbols}
+        return DataLoader.build_panel(frames, fields=(field,))[field]
+    
+    @staticmethod
+    def from_csv(root, symbol, filepath):
+        """把CSV文件导入数据存储"""
+        store = DataStore(root)
+        store.write(symbol, DataLoader.load_csv(filepath))
+        return store
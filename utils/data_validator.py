@@ -0,0 +1,233 @@
+# trading_strategies/utils/data_validator.py
+import numpy as np
+import pandas as pd
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+
+# 检查项（按报告中的顺序）
+CHECK_MISSING = 'missing'  # 数值缺失（含转换失败的errors='coerce'）
+CHECK_NONPOSITIVE = 'nonpositive_price'  # 价格小于等于0
+CHECK_ZERO_VOLUME = 'zero_volume'  # 成交量为0
+CHECK_HIGH_LOW = 'high_below_low'  # 最高价低于最低价
+CHECK_OHLC_RANGE = 'open_close_outside_range'  # 开盘/收盘价超出最高最低价区间
+CHECK_DUPLICATE = 'duplicate_date'  # 日期重复
+CHECK_GAP = 'missing_session'  # 与上一根K线之间缺少交易日
+CHECK_SPIKE = 'price_spike'  # 收盘价单日跳变并在下一根K线反转
+CHECKS = (CHECK_MISSING, CHECK_NONPOSITIVE, CHECK_ZERO_VOLUME, CHECK_HIGH_LOW,
+          CHECK_OHLC_RANGE, CHECK_DUPLICATE, CHECK_GAP, CHECK_SPIKE)
+
+# 修复方式
+REPAIR_FFILL = 'ffill'
+REPAIR_DROP = 'drop'
+
+
+class DataValidator:
+    """数据质量检查：所有检查都是整列（或整个日期 × 股票面板）上的布尔掩码运算
+    
+    单只股票的DataFrame和多只股票的面板使用同一套检查，面板上每项检查一次完成所有股票，
+    不逐只股票循环。结果为每项检查一个掩码，报告只汇总数量和首次出现的日期。
+    """
+    
+    def __init__(self, spike_threshold=0.25, max_gap_sessions=3, check_zero_volume=True):
+        """
+        Args:
+            spike_threshold: 价格跳变阈值（对数收益率绝对值），跳变后下一根K线反向跳变时视为异常点
+            max_gap_sessions: 相邻K线之间允许缺少的工作日数（节假日会造成1~2天的正常缺口）
+            check_zero_volume: 是否检查成交量为0（指数等没有成交量的数据应关闭）
+        """
+        self.spike_threshold = spike_threshold
+        self.max_gap_sessions = max_gap_sessions
+        self.check_zero_volume = check_zero_volume
+    
+    def _price_checks(self, fields, masks):
+        """
+        价格/成交量检查，fields为{字段: 形状相同的一维或二维数组}，结果写入masks
+        """
+        prices = [fields[f] for f in PRICE_FIELDS if f in fields]
+        volume = fields.get('volume')
+        
+        missing = np.zeros(prices[0].shape, dtype=bool)
+        for values in prices + ([volume] if volume is not None else []):
+            missing |= np.isnan(values)
+        masks[CHECK_MISSING] = missing
+        
+        nonpositive = np.zeros(prices[0].shape, dtype=bool)
+        for values in prices:
+            nonpositive |= values <= 0
+        masks[CHECK_NONPOSITIVE] = nonpositive
+        
+        if volume is not None and self.check_zero_volume:
+            masks[CHECK_ZERO_VOLUME] = volume == 0
+        
+        if 'high' in fields and 'low' in fields:
+            high, low = fields['high'], fields['low']
+            masks[CHECK_HIGH_LOW] = high < low
+            outside = np.zeros(high.shape, dtype=bool)
+            for name in ('open', 'close'):
+                if name in fields:
+                    outside |= (fields[name] > high) | (fields[name] < low)
+            masks[CHECK_OHLC_RANGE] = outside
+        
+        # 跳变：本根K线与前后两根K线的对数收益率都超过阈值且方向相反
+        close = fields['close']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_close = np.log(np.where(close > 0, close, np.nan))
+        change = np.diff(log_close, axis=0)
+        jump_up = change > self.spike_threshold
+        jump_down = change < -self.spike_threshold
+        spike = np.zeros(close.shape, dtype=bool)
+        spike[1:-1] = (jump_up[:-1] & jump_down[1:]) | (jump_down[:-1] & jump_up[1:])
+        masks[CHECK_SPIKE] = spike
+    
+    def _gap_mask(self, dates):
+        """与上一根K线之间缺少的工作日数超过max_gap_sessions的K线"""
+        days = dates.values.astype('datetime64[D]')
+        gap = np.zeros(len(days), dtype=bool)
+        if len(days) > 1:
+            missing_sessions = np.busday_count(days[:-1], days[1:]) - 1
+            gap[1:] = missing_sessions > self.max_gap_sessions
+        return gap
+    
+    def validate(self, df):
+        """
+        检查单只股票的数据
+        
+        Args:
+            df: load_csv格式的DataFrame（按日期升序）
+        
+        Returns:
+            masks: {检查项: 与df等长的布尔数组}
+        """
+        fields = {f: pd.to_numeric(df[f], errors='coerce').values.astype(float)
+                  for f in PRICE_FIELDS + ('volume',) if f in df.columns}
+        masks = {}
+        self._price_checks(fields, masks)
+        if 'date' in df.columns:
+            dates = pd.to_datetime(df['date'])
+            masks[CHECK_DUPLICATE] = dates.duplicated(keep='last').values
+            masks[CHECK_GAP] = self._gap_mask(dates)
+        return {name: masks[name] for name in CHECKS if name in masks}
+    
+    def validate_panel(self, panels):
+        """
+        一次检查多只股票的面板数据
+        
+        Args:
+            panels: {字段: (日期 × 股票)面板}（DataLoader.build_panel的返回值），至少包含close
+        
+        Returns:
+            masks: {检查项: (日期 × 股票)布尔数组}；缺失只统计股票首末有效日期之间的K线，
+                缺少交易日按全体股票的日期索引判断
+        """
+        close_panel = panels['close']
+        fields = {f: np.asarray(panels[f].values, dtype=float) for f in PRICE_FIELDS + ('volume',) if f in panels}
+        masks = {}
+        self._price_checks(fields, masks)
+        
+        # 上市前和退市后的空白不算缺失
+        valid = ~np.isnan(fields['close'])
+        masks[CHECK_MISSING] &= self._listed(valid)
+        
+        dates = pd.Series(close_panel.index)
+        duplicate = dates.duplicated(keep='last').values
+        gap = self._gap_mask(dates)
+        shape = close_panel.shape
+        masks[CHECK_DUPLICATE] = np.broadcast_to(duplicate[:, None], shape)
+        masks[CHECK_GAP] = np.broadcast_to(gap[:, None], shape) & valid
+        return {name: masks[name] for name in CHECKS if name in masks}
+    
+    @staticmethod
+    def _listed(valid):
+        """每只股票首末有效日期之间（含首末）的位置"""
+        started = np.maximum.accumulate(valid, axis=0)
+        ended = np.maximum.accumulate(valid[::-1], axis=0)[::-1]
+        return started & ended
+    
+    @staticmethod
+    def report(masks, dates=None, symbols=None):
+        """
+        汇总检查结果
+        
+        Args:
+            masks: validate或validate_panel的返回值
+            dates: 与掩码行对应的日期
+            symbols: 面板的股票代码（二维掩码时）
+        
+        Returns:
+            report: 单只股票时每行一项检查（数量、首次日期）；面板时为(有问题的股票 × 检查项)的数量表
+        """
+        first = next(iter(masks.values()))
+        if first.ndim == 2:
+            counts = pd.DataFrame({name: mask.sum(axis=0) for name, mask in masks.items()},
+                                  index=symbols if symbols is not None else range(first.shape[1]))
+            return counts[counts.sum(axis=1) > 0]
+        
+        rows = []
+        for name, mask in masks.items():
+            count = int(mask.sum())
+            if not count:
+                continue
+            pos = int(np.argmax(mask))
+            rows.append({
+                'check': name,
+                'count': count,
+                'first_row': pos,
+                'first_date': dates.iloc[pos] if dates is not None else None,
+            })
+        return pd.DataFrame(rows, columns=['check', 'count', 'first_row', 'first_date'])
+    
+    def repair(self, df, masks, action=REPAIR_FFILL, checks=None):
+        """
+        修复有问题的K线
+        
+        Args:
+            df: validate检查过的DataFrame
+            masks: validate的返回值
+            action: 'ffill'（有问题的K线的价格和成交量改为缺失后用前值填充）或'drop'（删除这些K线）
+            checks: 需要修复的检查项（缺省为除缺少交易日外的全部；缺口无法由已有数据补出）
+        
+        Returns:
+            df: 修复后的新DataFrame（重复日期只保留最后一条）
+        """
+        checks = [c for c in CHECKS if c != CHECK_GAP] if checks is None else checks
+        bad = np.zeros(len(df), dtype=bool)
+        for name in checks:
+            if name in masks and name != CHECK_DUPLICATE:
+                bad |= masks[name]
+        duplicate = masks.get(CHECK_DUPLICATE, np.zeros(len(df), dtype=bool))
+        
+        if action == REPAIR_DROP:
+            return df[~(bad | duplicate)].reset_index(drop=True)
+        if action != REPAIR_FFILL:
+            raise ValueError(f"未知修复方式: {action}")
+        
+        df = df[~duplicate].copy()
+        bad = bad[~duplicate]
+        cols = [c for c in PRICE_FIELDS + ('adjclose', 'volume') if c in df.columns]
+        df.loc[bad, cols] = np.nan
+        df[cols] = df[cols].ffill()
+        return df.reset_index(drop=True)
+    
+    def repair_panel(self, panels, masks, action=REPAIR_FFILL, checks=None):
+        """
+        修复面板数据：有问题的位置设为缺失，'ffill'时按股票用前值填充，'drop'时只置为缺失
+        （面板中各股票共用日期索引，不能删除单只股票的K线）；前值填充只在股票首末有效日期之间，
+        退市后的日期仍为缺失
+        
+        Returns:
+            panels: 修复后的新面板字典
+        """
+        checks = [c for c in CHECKS if c != CHECK_GAP] if checks is None else checks
+        bad = np.zeros(panels['close'].shape, dtype=bool)
+        for name in checks:
+            if name in masks:
+                bad |= masks[name]
+        if action not in (REPAIR_FFILL, REPAIR_DROP):
+            raise ValueError(f"未知修复方式: {action}")
+        
+        listed = self._listed(panels['close'].notna().values)
+        repaired = {}
+        for field, panel in panels.items():
+            panel = panel.mask(bad)
+            repaired[field] = panel.ffill().where(listed) if action == REPAIR_FFILL else panel
+        return repaired
@@ -0,0 +1,105 @@
+# trading_strategies/utils/event_study.py
+import numpy as np
+import pandas as pd
+
+
+class EventStudy:
+    """信号事件研究：统计每个买入/卖出信号之后的前向收益分布（与持仓逻辑无关）"""
+    
+    HORIZONS = (1, 5, 10, 20)
+    QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+    
+    @staticmethod
+    def forward_returns(close, signals, horizons=HORIZONS, series_index=None):
+        """
+        一次性收集所有信号、所有周期的前向收益
+        
+        Args:
+            close: 收盘价，形状(n,)或(n, k)（k只股票）
+            signals: 信号，形状(n,)或(n, m)（m组回测，如不同股票或参数）
+            horizons: 前向周期（K线数）
+            series_index: 长度为m的数组，第j组信号对应close的列号；
+                缺省时要求m == k，信号第j列对应close第j列
+        
+        Returns:
+            events: 字典，bar/run/direction为每个事件的K线位置、信号列号和方向，
+                returns为(事件数, 周期数)的前向收益矩阵，超出数据末尾为NaN
+        """
+        close = np.asarray(close, dtype=float)
+        signals = np.asarray(signals)
+        if close.ndim == 1:
+            close = close[:, None]
+        if signals.ndim == 1:
+            signals = signals[:, None]
+        n = close.shape[0]
+        
+        rows, runs = np.nonzero(signals)
+        columns = runs if series_index is None else np.asarray(series_index)[runs]
+        horizons = np.asarray(horizons)
+        
+        # 花式索引一次取出所有事件在所有周期上的前向价格
+        target = rows[:, None] + horizons[None, :]
+        valid = target < n
+        base = close[rows, columns]
+        future = close[np.minimum(target, n - 1), columns[:, None]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.where(valid, future / base[:, None] - 1, np.nan)
+        
+        return {
+            'bar': rows,
+            'run': runs,
+            'direction': signals[rows, runs].astype(np.int8),
+            'horizons': horizons,
+            'returns': returns,
+        }
+    
+    @staticmethod
+    def summarize(events, quantiles=QUANTILES, by_run=False):
+        """
+        按方向和周期汇总前向收益
+        
+        命中率按信号方向计算：买入信号之后上涨、卖出信号之后下跌视为命中。
+        
+        Args:
+            events: forward_returns的返回值
+            quantiles: 需要输出的分位数
+            by_run: 是否按信号列（股票/参数组）分别汇总
+        
+        Returns:
+            summary: 以(方向, 周期)或(列号, 方向, 周期)为索引的统计表
+        """
+        horizons = events['horizons']
+        n_events = len(events['bar'])
+        returns = events['returns']
+        
+        long_form = pd.DataFrame({
+            'run': np.repeat(events['run'], len(horizons)),
+            'direction': np.repeat(events['direction'], len(horizons)),
+            'horizon': np.tile(horizons, n_events),
+            'return': returns.ravel(),
+        }).dropna(subset=['return'])
+        long_form['hit'] = np.sign(long_form['return']) == long_form['direction']
+        
+        keys = ['run', 'direction', 'horizon'] if by_run else ['direction', 'horizon']
+        grouped = long_form.groupby(keys)
+        summary = pd.DataFrame({
+            'count': grouped['return'].size(),
+            'hit_rate': grouped['hit'].mean(),
+            'mean': grouped['return'].mean(),
+            'median': grouped['return'].median(),
+            'std': grouped['return'].std(),
+        })
+        if len(quantiles):
+            q = grouped['return'].quantile(list(quantiles)).unstack()
+            q.columns = [f'q{int(round(c * 100)):02d}' for c in q.columns]
+            summary = summary.join(q)
+        
+        return summary
+    
+    @staticmethod
+    def from_strategy(strategy, df, horizons=HORIZONS, quantiles=QUANTILES):
+        """对单个策略在一只股票上做事件研究"""
+        df = df.sort_values('date').reset_index(drop=True) if 'date' in df.columns else df
+        signals = strategy.generate_signals(df)
+        events = EventStudy.forward_returns(df['close'].values, signals.values, horizons)
+        return EventStudy.summarize(events, quantiles)
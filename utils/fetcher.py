@@ -0,0 +1,293 @@
+# trading_strategies/utils/fetcher.py
+import asyncio
+import gzip
+import io
+import random
+import re
+import ssl
+import time
+from urllib.parse import urlsplit, quote
+
+import pandas as pd
+
+from utils.data_loader import DataLoader
+
+
+class FetchError(Exception):
+    """下载失败（HTTP错误状态或连接错误）"""
+    
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _ConnectionPool:
+    """到同一主机的HTTP/1.1长连接池（asyncio流实现，只支持GET）"""
+    
+    def __init__(self, scheme, host, port, size, timeout):
+        self.host = host
+        self.port = port
+        self.ssl = ssl.create_default_context() if scheme == 'https' else None
+        self.timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+        self.opened = 0
+    
+    async def _connect(self):
+        self.opened += 1
+        return await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout
+        )
+    
+    async def get(self, target):
+        """
+        发送GET请求
+        
+        Returns:
+            (状态码, 响应头字典, 响应体bytes)
+        """
+        async with self._slots:
+            reused = bool(self._idle)
+            conn = self._idle.pop() if reused else await self._connect()
+            try:
+                status, headers, body, keep = await asyncio.wait_for(self._roundtrip(conn, target), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                conn[1].close()
+                if not reused:
+                    raise FetchError(f"连接错误: {e!r}") from e
+                # 服务器已关闭空闲连接，换新连接重发一次
+                conn = await self._connect()
+                try:
+                    status, headers, body, keep = await asyncio.wait_for(self._roundtrip(conn, target), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError) as e2:
+                    conn[1].close()
+                    raise FetchError(f"连接错误: {e2!r}") from e2
+            except BaseException:
+                conn[1].close()
+                raise
+            
+            if keep:
+                self._idle.append(conn)
+            else:
+                conn[1].close()
+            return status, headers, body
+    
+    async def _roundtrip(self, conn, target):
+        reader, writer = conn
+        host = self.host if self.port in (80, 443) else f'{self.host}:{self.port}'
+        writer.write(
+            f'GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n'
+            f'Accept-Encoding: gzip\r\nUser-Agent: trading-strategies-fetcher\r\n\r\n'.encode('latin-1')
+        )
+        await writer.drain()
+        
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("服务器关闭了连接")
+        parts = status_line.decode('latin-1').split(None, 2)
+        version, status = parts[0], int(parts[1])
+        
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        
+        keep = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # 跳过尾部头字段
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            keep = False
+        
+        if headers.get('content-encoding', '').lower() == 'gzip':
+            body = gzip.decompress(body)
+        return status, headers, body, keep
+    
+    def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
+
+
+class PriceFetcher:
+    """并发下载股票历史行情并写入DataStore
+    
+    同一主机的请求共用长连接池，并发数由信号量限制；失败的请求按指数退避重试。
+    已有数据的股票只请求最后一个已存日期及之后的数据（最后一根K线重新下载，以覆盖盘中未完成的数据）。
+    """
+    
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    
+    def __init__(self, store, url_template, concurrency=64, retries=3, backoff=0.5, timeout=30):
+        """
+        Args:
+            store: DataStore实例
+            url_template: 请求地址模板，可用占位符{symbol}、{start}（YYYY-MM-DD，全量下载时为空）
+                和{period1}（start的Unix秒，全量下载时为0）
+            concurrency: 同时进行的最大请求数（也是每个主机的连接池大小）
+            retries: 失败后的最大重试次数
+            backoff: 第一次重试前的等待秒数，之后每次翻倍（另加随机抖动）
+            timeout: 单次请求超时秒数
+        """
+        if not url_template:
+            raise ValueError("需要配置行情下载地址url_template")
+        self.store = store
+        self.url_template = url_template
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.connections_opened = 0
+    
+    def build_url(self, symbol, start=None):
+        """生成某只股票的请求地址"""
+        return self.url_template.format(
+            symbol=quote(symbol, safe=''),
+            start='' if start is None else start.strftime('%Y-%m-%d'),
+            period1=0 if start is None else int(start.timestamp()),
+        )
+    
+    @staticmethod
+    def parse(body):
+        """
+        解析响应内容：CSV，或与preprocess.py相同格式的Yahoo历史数据HTML页面
+        
+        Returns:
+            df: 与DataLoader.load_csv格式一致的DataFrame（按日期升序）
+        """
+        text = body.decode('utf-8') if isinstance(body, bytes) else body
+        if '<tr' in text:
+            rows = []
+            for tr in re.findall(r'<tr class="yf-1m2i7s2">(.*?)</tr>', text, re.DOTALL):
+                # 跳过股息行
+                if 'Dividend' in tr:
+                    continue
+                cells = re.findall(r'<td class="yf-1m2i7s2">([^<]+)</td>', tr)
+                if len(cells) == 7:
+                    rows.append([cells[0].strip()] + [c.replace(',', '').strip() for c in cells[1:]])
+            df = pd.DataFrame(rows, columns=['date', 'open', 'high', 'low', 'close', 'adjclose', 'volume'])
+        else:
+            df = pd.read_csv(io.StringIO(text))
+            df.columns = [c.strip().lower().replace(' ', '').replace('_', '') for c in df.columns]
+        
+        if len(df):
+            df['date'] = DataLoader._parse_dates(df['date'])
+        df = df.sort_values('date').reset_index(drop=True)
+        return DataLoader._convert_numeric(df)
+    
+    async def _get(self, pools, url):
+        """带重试的GET请求，返回(响应体, 尝试次数)"""
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        if key not in pools:
+            pools[key] = _ConnectionPool(parts.scheme, parts.hostname, port, self.concurrency, self.timeout)
+        pool = pools[key]
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                status, headers, body = await pool.get(target)
+                if status == 200:
+                    return body, attempt
+                retry_after = headers.get('retry-after')
+                raise FetchError(
+                    f"HTTP {status}", status=status,
+                    retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+                )
+            except (FetchError, asyncio.TimeoutError, OSError) as e:
+                status = getattr(e, 'status', None)
+                retryable = status is None or status in self.RETRY_STATUSES
+                if not retryable or attempt > self.retries:
+                    if isinstance(e, FetchError):
+                        e.attempts = attempt
+                        raise
+                    error = FetchError(f"请求失败: {e!r}")
+                    error.attempts = attempt
+                    raise error from e
+                delay = getattr(e, 'retry_after', None)
+                if delay is None:
+                    delay = self.backoff * 2 ** (attempt - 1) * (1 + random.random())
+                await asyncio.sleep(delay)
+    
+    async def _fetch_symbol(self, pools, slots, symbol, full):
+        async with slots:
+            started = time.perf_counter()
+            start = None if full else self.store.last_date(symbol)
+            record = {'symbol': symbol, 'start': start, 'status': 'failed', 'rows': 0,
+                      'new_rows': 0, 'attempts': 0, 'error': None}
+            try:
+                body, record['attempts'] = await self._get(pools, self.build_url(symbol, start))
+                df = self.parse(body)
+                if start is not None and len(df):
+                    df = df[df['date'] >= start]
+                record['rows'] = len(df)
+                if len(df):
+                    # 文件写入放到线程中，不阻塞其他下载
+                    record['new_rows'] = await asyncio.to_thread(self.store.append, symbol, df)
+                record['status'] = 'updated' if record['new_rows'] else 'unchanged'
+            except FetchError as e:
+                record['attempts'] = getattr(e, 'attempts', record['attempts'])
+                record['error'] = str(e)
+            except (ValueError, KeyError, pd.errors.ParserError) as e:
+                record['error'] = f"解析失败: {e}"
+            record['elapsed'] = time.perf_counter() - started
+            return record
+    
+    async def fetch_all(self, symbols, full=False):
+        """
+        并发更新一组股票
+        
+        Args:
+            symbols: 股票代码列表
+            full: 是否忽略已有数据、全量下载
+        
+        Returns:
+            report: 每只股票一行的DataFrame（状态、下载行数、新增行数、尝试次数、错误、耗时）
+        """
+        pools = {}
+        slots = asyncio.Semaphore(self.concurrency)
+        try:
+            records = await asyncio.gather(
+                *(self._fetch_symbol(pools, slots, symbol, full) for symbol in symbols)
+            )
+        finally:
+            for pool in pools.values():
+                pool.close()
+            self.connections_opened = sum(pool.opened for pool in pools.values())
+        return pd.DataFrame(records, columns=[
+            'symbol', 'start', 'status', 'rows', 'new_rows', 'attempts', 'error', 'elapsed'
+        ]).set_index('symbol')
+    
+    def refresh(self, symbols, full=False):
+        """fetch_all的同步入口"""
+        return asyncio.run(self.fetch_all(symbols, full=full))
+    
+    @staticmethod
+    def from_config(store=None):
+        """按config.FETCH_CONFIG创建下载器"""
+        import config
+        from utils.data_store import DataStore
+        
+        store = DataStore(config.STORE_PATH) if store is None else store
+        return PriceFetcher(store, **config.FETCH_CONFIG)
@@ -0,0 +1,270 @@
+# trading_strategies/utils/indicators.py
+import numpy as np
+
+from utils import kernels
+
+
+def _window_sum(values, window, out, origin=0):
+    """
+    滚动窗口求和写入out，O(n)
+    
+    按整段数据中的位置（values[0]位于origin）每window根K线分为一块，以第i根K线结束的窗口
+    等于所在块的后缀和加上下一块的前缀和（窗口恰好是一整块时只有后缀和）。
+    块内前缀/后缀和各一次cumsum，不做累计和相减，没有精度损失；每个窗口的结果只取决于
+    窗口内的数据和块的划分，分块计算时传入各块的origin，与整体计算逐位一致。
+    """
+    out[:] = np.nan
+    n = len(values)
+    m = n - window + 1
+    if m <= 0:
+        return out
+    lead = origin % window
+    padded = np.zeros((-(-(lead + n) // window), window))
+    padded.ravel()[lead:lead + n] = values
+    suffix = np.cumsum(padded[:, ::-1], axis=1)[:, ::-1]
+    prefix = np.cumsum(padded, axis=1, out=padded)
+    # 起点与块对齐的窗口是一整块，不加下一块的前缀和
+    prefix[:, -1] = 0.0
+    np.add(suffix.ravel()[lead:lead + m], prefix.ravel()[lead + window - 1:lead + window - 1 + m],
+           out=out[window - 1:])
+    return out
+
+
+def bar_origin(data):
+    """
+    数据第一行在整段数据中的位置：分块计算时由BaseTradingStrategy.generate_signals_chunk
+    记录在data.attrs['origin']，其他情况为0
+    """
+    attrs = getattr(data, 'attrs', None) or {}
+    return int(attrs.get('origin', 0))
+
+
+def _output(out, n, k):
+    """取得预分配的输出数组，未提供时按列连续新建（逐列计算时内存访问连续）"""
+    if out is None:
+        return np.empty((n, k), order='F')
+    if out.shape != (n, k):
+        raise ValueError(f"输出数组形状应为{(n, k)}，实际为{out.shape}")
+    return out
+
+
+class Indicators:
+    """技术指标库：在OHLCV数组上一次计算多个指标，共享价格差分、真实波幅等中间结果
+    
+    所有函数都支持一次传入多个周期（每个周期输出一列），并可以写入预先分配的数组。
+    滚动窗口类指标的origin为values[0]在整段数据中的位置（见bar_origin），分块计算时
+    传入后结果与整体计算逐位一致。
+    """
+    
+    @staticmethod
+    def price_delta(close):
+        """相邻收盘价之差，第一根K线为NaN"""
+        close = np.asarray(close, dtype=float)
+        delta = np.empty_like(close)
+        if len(close):
+            delta[0] = np.nan
+            delta[1:] = close[1:] - close[:-1]
+        return delta
+    
+    @staticmethod
+    def true_range(high, low, close):
+        """真实波幅：max(最高-最低, |最高-前收|, |最低-前收|)"""
+        high = np.asarray(high, dtype=float)
+        low = np.asarray(low, dtype=float)
+        close = np.asarray(close, dtype=float)
+        
+        prev_close = np.empty_like(close)
+        if len(close):
+            prev_close[0] = np.nan
+            prev_close[1:] = close[:-1]
+        return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    
+    @staticmethod
+    def sma(values, windows, out=None, origin=0):
+        """简单移动平均，windows为单个周期或周期列表；窗口内有缺失值时为NaN"""
+        values = np.asarray(values, dtype=float)
+        windows = np.atleast_1d(windows)
+        out = _output(out, len(values), len(windows))
+        for j, window in enumerate(windows):
+            _window_sum(values, int(window), out[:, j], origin)
+            out[:, j] /= window
+        return out
+    
+    @staticmethod
+    def ema(values, spans, out=None):
+        """adjust=False的指数移动平均，多个周期在一次内核调用中完成，结果由内核直接写入out"""
+        spans = np.atleast_1d(spans)
+        if out is not None:
+            out = _output(out, len(values), len(spans))
+        return kernels.ewm(values, spans, out=out)
+    
+    @staticmethod
+    def rsi(close, periods, out=None, delta=None, origin=0):
+        """
+        RSI（平均涨幅/平均跌幅用简单移动平均）
+        
+        Args:
+            close: 收盘价
+            periods: 单个周期或周期列表
+            delta: 预先计算的price_delta（多个指标共享时传入）
+        """
+        if delta is None:
+            delta = Indicators.price_delta(close)
+        # 与pandas的where一致：第一根K线的差分为NaN，计为0
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+        
+        periods = np.atleast_1d(periods)
+        out = _output(out, len(delta), len(periods))
+        avg_loss = np.empty(len(delta))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for j, period in enumerate(periods):
+                column = out[:, j]
+                _window_sum(gain, int(period), column, origin)
+                _window_sum(loss, int(period), avg_loss, origin)
+                column /= period
+                avg_loss /= period
+                np.divide(column, avg_loss, out=column)
+                column += 1
+                np.divide(100, column, out=column)
+                np.subtract(100, column, out=column)
+        return out
+    
+    @staticmethod
+    def atr(high, low, close, periods, out=None, tr=None, origin=0):
+        """
+        ATR（真实波幅的简单移动平均）
+        
+        Args:
+            periods: 单个周期或周期列表
+            tr: 预先计算的true_range（多个指标共享时传入）
+        """
+        if tr is None:
+            tr = Indicators.true_range(high, low, close)
+        return Indicators.sma(tr, periods, out=out, origin=origin)
+    
+    @staticmethod
+    def bollinger(close, window=20, num_std=2.0, out=None, mid=None, origin=0):
+        """
+        布林带
+        
+        Args:
+            window: 中轨周期
+            num_std: 上下轨与中轨相距的标准差倍数（总体标准差）
+            mid: 预先计算的同周期SMA（多个指标共享时传入）
+        
+        Returns:
+            (n, 3)数组，列依次为中轨、上轨、下轨
+        """
+        close = np.asarray(close, dtype=float)
+        out = _output(out, len(close), 3)
+        if mid is None:
+            Indicators.sma(close, window, out=out[:, :1], origin=origin)
+        else:
+            out[:, 0] = mid
+        
+        # 总体标准差：窗口内平方和的均值减去均值的平方
+        std = _window_sum(close * close, window, np.empty(len(close)), origin)
+        std /= window
+        std -= out[:, 0] * out[:, 0]
+        np.sqrt(np.maximum(std, 0.0), out=std)
+        np.add(out[:, 0], num_std * std, out=out[:, 1])
+        np.subtract(out[:, 0], num_std * std, out=out[:, 2])
+        return out
+    
+    @staticmethod
+    def obv(close, volume, out=None, delta=None):
+        """能量潮OBV：上涨K线累加成交量，下跌K线减去成交量，首根K线为0"""
+        if delta is None:
+            delta = Indicators.price_delta(close)
+        volume = np.nan_to_num(np.asarray(volume, dtype=float))
+        out = _output(out, len(delta), 1)
+        np.cumsum(np.nan_to_num(np.sign(delta)) * volume, out=out[:, 0])
+        return out
+    
+    @staticmethod
+    def columns(spec):
+        """
+        计算spec对应的输出列名（按输出数组中的顺序）
+        
+        Args:
+            spec: {指标: 参数}，例如
+                {'ema': [12, 26], 'sma': [20, 50], 'rsi': [14], 'atr': [14],
+                 'bollinger': [(20, 2.0)], 'obv': True}
+        """
+        names = []
+        for span in np.atleast_1d(spec.get('ema', [])):
+            names.append(f'ema_{span}')
+        for window in np.atleast_1d(spec.get('sma', [])):
+            names.append(f'sma_{window}')
+        for period in np.atleast_1d(spec.get('rsi', [])):
+            names.append(f'rsi_{period}')
+        for period in np.atleast_1d(spec.get('atr', [])):
+            names.append(f'atr_{period}')
+        for window, num_std in spec.get('bollinger', []):
+            names.extend([f'bb_mid_{window}', f'bb_upper_{window}', f'bb_lower_{window}'])
+        if spec.get('obv'):
+            names.append('obv')
+        return names
+    
+    @staticmethod
+    def compute(data, spec, out=None, origin=None):
+        """
+        一次计算spec中的全部指标
+        
+        价格差分只算一次供RSI和OBV共享，真实波幅只算一次供所有ATR周期共享，
+        与SMA周期相同的布林带中轨直接复用SMA。结果写入一个(n, 列数)数组，
+        重复计算相同长度的数据时可以传入上次的数组以避免重新分配。
+        
+        Args:
+            data: 含open/high/low/close/volume的DataFrame或字典
+            spec: 见columns()
+            out: 预先分配的(n, len(columns(spec)))数组（建议order='F'）
+            origin: 第一行在整段数据中的位置（缺省由bar_origin(data)得到）
+        
+        Returns:
+            indicators: {列名: 一维数组}，数组是out中对应列的视图
+        """
+        close = np.asarray(data['close'], dtype=float)
+        if origin is None:
+            origin = bar_origin(data)
+        names = Indicators.columns(spec)
+        out = _output(out, len(close), len(names))
+        col = 0
+        
+        def take(k):
+            nonlocal col
+            view = out[:, col:col + k]
+            col += k
+            return view
+        
+        needs_delta = bool(spec.get('rsi')) or bool(spec.get('obv'))
+        delta = Indicators.price_delta(close) if needs_delta else None
+        
+        emas = np.atleast_1d(spec.get('ema', []))
+        if len(emas):
+            Indicators.ema(close, emas, out=take(len(emas)))
+        
+        smas = np.atleast_1d(spec.get('sma', []))
+        sma_view = take(len(smas))
+        if len(smas):
+            Indicators.sma(close, smas, out=sma_view, origin=origin)
+        sma_by_window = {int(w): sma_view[:, j] for j, w in enumerate(smas)}
+        
+        rsis = np.atleast_1d(spec.get('rsi', []))
+        if len(rsis):
+            Indicators.rsi(close, rsis, out=take(len(rsis)), delta=delta, origin=origin)
+        
+        atrs = np.atleast_1d(spec.get('atr', []))
+        if len(atrs):
+            tr = Indicators.true_range(data['high'], data['low'], close)
+            Indicators.sma(tr, atrs, out=take(len(atrs)), origin=origin)
+        
+        for window, num_std in spec.get('bollinger', []):
+            Indicators.bollinger(close, window, num_std, out=take(3), mid=sma_by_window.get(int(window)),
+                                 origin=origin)
+        
+        if spec.get('obv'):
+            Indicators.obv(close, data['volume'], out=take(1), delta=delta)
+        
+        return {name: out[:, j] for j, name in enumerate(names)}
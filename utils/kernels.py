@@ -0,0 +1,307 @@
+# trading_strategies/utils/kernels.py
+"""
+路径依赖循环的计算内核
+
+EWM递推、移动止损和成交量K线的切分都依赖上一根K线的结果，难以完全向量化。
+持仓状态机留在回测引擎中：引擎用二分查找在信号点之间跳转，循环次数等于交易次数，不需要逐K线的内核。
+安装了Numba时使用JIT编译的循环，否则使用NumPy实现（EWM在列数很少时借用pandas的
+编译循环）；两个后端结果一致。
+后端在导入时根据config.KERNEL_BACKEND选择，也可以用use_backend()切换以便对比测试。
+"""
+import numpy as np
+import pandas as pd
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    from config import KERNEL_BACKEND as _CONFIGURED_BACKEND
+except ImportError:
+    _CONFIGURED_BACKEND = 'auto'
+
+
+# ---------------------------------------------------------------------------
+# NumPy 后端
+# ---------------------------------------------------------------------------
+
+def _ewm_numpy(values, alphas, out):
+    """
+    values: (n, k)，alphas: (k,)；按列做adjust=False的EWM，结果写入out (n, k)
+    
+    递推形式（含缺失值时旧权重的衰减）与pandas的ewm(adjust=False)逐位一致。
+    列数远小于行数时逐列交给pandas的编译循环，否则逐行对所有列向量化递推。
+    """
+    n, k = values.shape
+    if n > 32 * k:
+        for j in range(k):
+            out[:, j] = pd.Series(values[:, j]).ewm(alpha=alphas[j], adjust=False).mean().values
+        return out
+    
+    weighted = np.full(k, np.nan)
+    old_wt = np.ones(k)
+    factor = 1.0 - alphas
+    for i in range(n):
+        x = values[i]
+        observed = ~np.isnan(x)
+        started = ~np.isnan(weighted)
+        # 已有值的列每根K线衰减旧权重；有新观测时更新并把旧权重重置为1
+        old_wt = np.where(started, old_wt * factor, old_wt)
+        update = started & observed & (weighted != x)
+        blended = (old_wt * weighted + alphas * x) / (old_wt + alphas)
+        weighted = np.where(update, blended, weighted)
+        old_wt = np.where(started & observed, 1.0, old_wt)
+        weighted = np.where(~started & observed, x, weighted)
+        out[i] = weighted
+    return out
+
+
+def _first_trailing_hit_numpy(low, base, ref, scale, lo, hi):
+    """
+    移动止损：第k根K线的止损位为 max(ref, base[lo..k-1]) * scale，
+    返回区间[lo, hi)内第一次 low <= 止损位 的位置和止损位，未触发返回(-1, nan)
+    """
+    if lo >= hi:
+        return -1, np.nan
+    peak = np.fmax.accumulate(np.concatenate(([ref], base[lo:hi - 1])))
+    level = peak * scale
+    hit = low[lo:hi] <= level
+    pos = int(np.argmax(hit))
+    if not hit[pos]:
+        return -1, np.nan
+    return lo + pos, level[pos]
+
+
+def _bar_closes_numpy(cum, thresholds, threshold):
+    """
+    成交量/成交额/笔数K线的切分：当前K线的累计量 cum[i] - base 达到阈值时在第i条记录收盘
+    
+    cum为含上一块结转量的累计活动量（非递减），thresholds为每条记录开始新K线时使用的阈值，
+    threshold为上一块未完成K线的阈值（没有时为nan）。相邻收盘之间用二分查找跳过，
+    循环次数等于K线数而不是记录数。
+    返回(收盘标记, 最后一次收盘时的累计量, 未完成K线的阈值)
+    """
+    n = len(cum)
+    closes = np.zeros(n, dtype=np.bool_)
+    base = 0.0
+    pos = 0
+    while pos < n:
+        if np.isnan(threshold):
+            threshold = thresholds[pos]
+        j = int(np.searchsorted(cum, base + threshold, side='left'))
+        if j >= n:
+            break
+        closes[j] = True
+        base = cum[j]
+        threshold = np.nan
+        pos = j + 1
+    return closes, base, threshold
+
+
+# ---------------------------------------------------------------------------
+# Numba 后端
+# ---------------------------------------------------------------------------
+
+if numba is not None:
+    
+    @numba.njit(cache=True)
+    def _ewm_numba(values, alphas, out):
+        n, k = values.shape
+        for j in range(k):
+            alpha = alphas[j]
+            factor = 1.0 - alpha
+            weighted = np.nan
+            old_wt = 1.0
+            for i in range(n):
+                x = values[i, j]
+                if not np.isnan(weighted):
+                    old_wt *= factor
+                    if not np.isnan(x):
+                        if weighted != x:
+                            weighted = (old_wt * weighted + alpha * x) / (old_wt + alpha)
+                        old_wt = 1.0
+                elif not np.isnan(x):
+                    weighted = x
+                out[i, j] = weighted
+        return out
+    
+    @numba.njit(cache=True)
+    def _first_trailing_hit_numba(low, base, ref, scale, lo, hi):
+        peak = ref
+        for i in range(lo, hi):
+            if i > lo and not np.isnan(base[i - 1]):
+                if np.isnan(peak) or base[i - 1] > peak:
+                    peak = base[i - 1]
+            level = peak * scale
+            if low[i] <= level:
+                return i, level
+        return -1, np.nan
+    
+    
+    @numba.njit(cache=True)
+    def _bar_closes_numba(cum, thresholds, threshold):
+        n = len(cum)
+        closes = np.zeros(n, dtype=np.bool_)
+        base = 0.0
+        for i in range(n):
+            if np.isnan(threshold):
+                threshold = thresholds[i]
+            if cum[i] >= base + threshold:
+                closes[i] = True
+                base = cum[i]
+                threshold = np.nan
+        return closes, base, threshold
+
+
+_BACKENDS = {
+    'numpy': {
+        'ewm': _ewm_numpy,
+        'first_trailing_hit': _first_trailing_hit_numpy,
+        'bar_closes': _bar_closes_numpy,
+    },
+}
+if numba is not None:
+    _BACKENDS['numba'] = {
+        'ewm': _ewm_numba,
+        'first_trailing_hit': _first_trailing_hit_numba,
+        'bar_closes': _bar_closes_numba,
+    }
+
+BACKEND = None
+_active = None
+
+
+def available_backends():
+    """当前环境可用的后端"""
+    return list(_BACKENDS.keys())
+
+
+def use_backend(name='auto'):
+    """选择计算后端：'auto'（有Numba时用Numba）、'numba' 或 'numpy'"""
+    global BACKEND, _active
+    if name == 'auto':
+        name = 'numba' if 'numba' in _BACKENDS else 'numpy'
+    if name not in _BACKENDS:
+        raise ValueError(f"不可用的计算后端: {name}（可用: {available_backends()}）")
+    BACKEND = name
+    _active = _BACKENDS[name]
+    return BACKEND
+
+
+def backend_info():
+    """当前后端信息，随回测结果一起输出"""
+    return {
+        'backend': BACKEND,
+        'numba_version': numba.__version__ if numba is not None else None,
+        'available': available_backends(),
+    }
+
+
+use_backend(_CONFIGURED_BACKEND)
+
+
+# ---------------------------------------------------------------------------
+# 公共接口
+# ---------------------------------------------------------------------------
+
+def ewm(values, spans, out=None):
+    """
+    adjust=False的指数移动平均，一次计算多个周期
+    
+    Args:
+        values: 一维序列(n,)或二维数组(n, k)
+        spans: 周期；values为一维时可以是列表（每个周期输出一列），
+            values为二维时为单个周期或长度为k的列表（逐列对应）
+        out: 预先分配的(n, 列数)输出数组，内核直接写入（可以是按列连续的数组或其列切片）
+    
+    Returns:
+        一维输入且spans为单个数时返回(n,)，否则返回二维数组（传入out时为out）
+    """
+    values = np.asarray(values, dtype=float)
+    scalar_span = np.ndim(spans) == 0
+    spans = np.atleast_1d(np.asarray(spans, dtype=float))
+    # 与pandas相同的换算顺序：span -> com -> alpha
+    alphas = 1.0 / (1.0 + (spans - 1.0) / 2.0)
+    
+    if values.ndim == 1:
+        matrix = np.repeat(values[:, None], len(spans), axis=1)
+    else:
+        matrix = values
+        if len(alphas) == 1:
+            alphas = np.repeat(alphas, matrix.shape[1])
+    shape = (len(matrix), len(alphas))
+    if out is None:
+        result = np.empty(shape)
+    elif out.shape != shape:
+        raise ValueError(f"输出数组形状应为{shape}，实际为{out.shape}")
+    else:
+        result = out
+    _active['ewm'](np.ascontiguousarray(matrix), np.ascontiguousarray(alphas), result)
+    if out is not None:
+        return out
+    return result[:, 0] if values.ndim == 1 and scalar_span else result
+
+
+def first_trailing_hit(low, base, ref, scale, lo, hi):
+    """移动止损首次触发位置，见_first_trailing_hit_numpy"""
+    pos, level = _active['first_trailing_hit'](low, base, float(ref), float(scale), int(lo), int(hi))
+    return int(pos), float(level)
+
+
+def bar_closes(activity, thresholds, carry=0.0, threshold=np.nan):
+    """
+    按累计活动量切分K线，见_bar_closes_numpy
+    
+    Args:
+        activity: 每条记录的活动量（成交量、成交额或1），非负
+        thresholds: 每条记录的阈值（正数），在该记录开始新K线时使用
+        carry: 上一块未完成K线的累计量
+        threshold: 上一块未完成K线的阈值（nan表示没有未完成K线）
+    
+    Returns:
+        closes: 每条记录是否为K线的最后一条
+        carry: 本块末尾未完成K线的累计量
+        threshold: 本块末尾未完成K线的阈值
+    """
+    activity = np.asarray(activity, dtype=float)
+    cum = np.cumsum(np.concatenate(([float(carry)], activity)))[1:]
+    closes, base, threshold = _active['bar_closes'](
+        cum, np.ascontiguousarray(thresholds, dtype=float), float(threshold)
+    )
+    carry = cum[-1] - base if len(cum) else float(carry)
+    return closes, carry, float(threshold)
+
+
+def check_equivalence(n=5000, seed=0):
+    """用随机数据比较所有可用后端的结果，返回各内核的最大差异"""
+    rng = np.random.default_rng(seed)
+    values = 100 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    values[:5] = np.nan
+    high = values * 1.01
+    low = values * 0.99
+    activity = rng.integers(0, 1000, n).astype(float)
+    thresholds = np.repeat(rng.uniform(2000, 8000, n // 100 + 1), 100)[:n]
+    
+    results = {}
+    current = BACKEND
+    try:
+        for name in available_backends():
+            use_backend(name)
+            results[name] = {
+                'ewm': ewm(values, [12, 26, 9]),
+                'first_trailing_hit': first_trailing_hit(low, high, values[10], 0.95, 10, n),
+                'bar_closes': bar_closes(activity, thresholds, 500.0, 3000.0),
+            }
+    finally:
+        use_backend(current)
+    
+    reference = results['numpy']
+    diffs = {}
+    for name, res in results.items():
+        diffs[name] = {
+            'ewm': float(np.nanmax(np.abs(res['ewm'] - reference['ewm']))),
+            'first_trailing_hit': res['first_trailing_hit'] == reference['first_trailing_hit'],
+            'bar_closes': int(np.sum(res['bar_closes'][0] != reference['bar_closes'][0])),
+        }
+    return diffs
@@ -0,0 +1,216 @@
+# trading_strategies/utils/pairs.py
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from strategy.pairs_strategy import PairsStrategy
+
+# 工作进程共享的矩阵（进程初始化时传入一次，不随每个分块任务重复传输）
+_SHARED = {}
+
+
+def _init_worker(returns):
+    _SHARED['returns'] = returns
+
+
+def _block_candidates(lo_i, hi_i, lo_j, hi_j, top_k, returns=None):
+    """
+    计算一个(股票块 × 股票块)的收益率相关系数，只返回每只股票在块内相关性最高的top_k个对象
+    
+    returns是按列标准化（去均值、除以范数）的收益率矩阵，块内相关系数即一次矩阵乘法。
+    """
+    if returns is None:
+        returns = _SHARED['returns']
+    corr = returns[:, lo_i:hi_i].T @ returns[:, lo_j:hi_j]
+    if lo_i == lo_j:
+        np.fill_diagonal(corr, -np.inf)
+    
+    symbol, partner, value = [], [], []
+    for matrix, offset_row, offset_col in ((corr, lo_i, lo_j), (corr.T, lo_j, lo_i)):
+        k = min(top_k, matrix.shape[1])
+        if k == 0:
+            continue
+        top = np.argpartition(-matrix, k - 1, axis=1)[:, :k]
+        rows = np.repeat(np.arange(matrix.shape[0]), k)
+        cols = top.ravel()
+        symbol.append(rows + offset_row)
+        partner.append(cols + offset_col)
+        value.append(matrix[rows, cols])
+        # 对角块是对称的，行方向的结果已经覆盖列方向
+        if lo_i == lo_j:
+            break
+    return np.concatenate(symbol), np.concatenate(partner), np.concatenate(value)
+
+
+class PairScreener:
+    """配对筛选：在(日期 × 股票)矩阵上分块计算两两收益率相关系数，每只股票只保留相关性最高的K个候选
+    
+    相关系数矩阵按股票分块，由矩阵乘法（BLAS）计算，分块分配到进程池；每只股票的候选用大小为K的堆维护，
+    内存与K×股票数成正比，不需要保存N×N矩阵。候选对再计算对数价格价差（OLS对冲比例）的z分数和半衰期。
+    """
+    
+    def __init__(self, top_k=10, lookback=252, block_size=512, max_workers=None, min_corr=0.0):
+        """
+        Args:
+            top_k: 每只股票保留的候选数
+            lookback: 使用最近多少根K线
+            block_size: 每个分块的股票数
+            max_workers: 进程数（None为CPU核数，1表示在当前进程计算）
+            min_corr: 最低相关系数
+        """
+        self.top_k = top_k
+        self.lookback = lookback
+        self.block_size = block_size
+        self.max_workers = max_workers
+        self.min_corr = min_corr
+    
+    def _prepare(self, close_panel):
+        """取最近lookback根K线，前值填充；窗口内仍有缺失（上市较晚）的股票不参与筛选"""
+        panel = close_panel.iloc[-(self.lookback + 1):].ffill()
+        panel = panel.loc[:, panel.notna().all() & (panel > 0).all()]
+        log_price = np.log(panel.values.astype(float))
+        
+        returns = np.diff(log_price, axis=0)
+        returns -= returns.mean(axis=0)
+        norm = np.sqrt((returns * returns).sum(axis=0))
+        keep = norm > 0
+        returns = np.asfortranarray(returns[:, keep] / norm[keep])
+        return np.asarray(panel.columns)[keep], log_price[:, keep], returns
+    
+    def _blocks(self, n):
+        bounds = list(range(0, n, self.block_size)) + [n]
+        return [(bounds[a], bounds[a + 1], bounds[b], bounds[b + 1])
+                for a in range(len(bounds) - 1) for b in range(a, len(bounds) - 1)]
+    
+    def top_pairs(self, returns):
+        """
+        分块计算相关系数并保留每只股票的top_k候选
+        
+        Returns:
+            (股票位置, 候选位置, 相关系数) 数组，每只股票至多top_k行
+        """
+        n = returns.shape[1]
+        heaps = [[] for _ in range(n)]
+        
+        def merge(block):
+            for s, p, c in zip(*block):
+                if c < self.min_corr:
+                    continue
+                heap = heaps[s]
+                if len(heap) < self.top_k:
+                    heapq.heappush(heap, (c, p))
+                elif c > heap[0][0]:
+                    heapq.heapreplace(heap, (c, p))
+        
+        blocks = self._blocks(n)
+        if self.max_workers == 1 or len(blocks) == 1:
+            for lo_i, hi_i, lo_j, hi_j in blocks:
+                merge(_block_candidates(lo_i, hi_i, lo_j, hi_j, self.top_k, returns))
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                     initargs=(returns,)) as executor:
+                futures = [executor.submit(_block_candidates, *block, self.top_k) for block in blocks]
+                for future in futures:
+                    merge(future.result())
+        
+        symbol = np.repeat(np.arange(n), [len(h) for h in heaps])
+        partner = np.array([p for h in heaps for _, p in h], dtype=np.int64)
+        corr = np.array([c for h in heaps for c, _ in h], dtype=float)
+        return symbol, partner, corr
+    
+    @staticmethod
+    def spread_stats(log_price, leg, partner, batch=4096):
+        """
+        每个配对（leg对partner）的价差统计
+        
+        对冲比例为leg对数价格对partner对数价格的OLS斜率；价差z分数为最新价差偏离均值的标准差倍数，
+        半衰期由价差的AR(1)系数估计（不均值回归时为inf）。
+        
+        Returns:
+            (对冲比例, 价差z分数, 半衰期)
+        """
+        centered = log_price - log_price.mean(axis=0)
+        var = (centered * centered).mean(axis=0)
+        beta = np.empty(len(leg))
+        z = np.empty(len(leg))
+        half_life = np.empty(len(leg))
+        for lo in range(0, len(leg), batch):
+            x = centered[:, leg[lo:lo + batch]]
+            y = centered[:, partner[lo:lo + batch]]
+            b = (x * y).mean(axis=0) / var[partner[lo:lo + batch]]
+            spread = x - b * y
+            with np.errstate(divide='ignore', invalid='ignore'):
+                z[lo:lo + batch] = spread[-1] / spread.std(axis=0)
+                lagged = spread[:-1] - spread[:-1].mean(axis=0)
+                change = np.diff(spread, axis=0)
+                phi = (lagged * change).sum(axis=0) / (lagged * lagged).sum(axis=0)
+                half_life[lo:lo + batch] = np.where(phi < 0, -np.log(2) / np.log1p(phi), np.inf)
+            beta[lo:lo + batch] = b
+        return beta, z, half_life
+    
+    def screen(self, close_panel):
+        """
+        筛选候选配对
+        
+        Args:
+            close_panel: 收盘价面板（行为日期升序，列为股票代码）
+        
+        Returns:
+            table: 每行一个不重复的配对（symbol为交易腿，partner为对冲腿），按相关系数降序
+        """
+        symbols, log_price, returns = self._prepare(close_panel)
+        symbol, partner, corr = self.top_pairs(returns)
+        
+        # 同一配对可能出现在两只股票的候选中，只保留一次
+        a = np.minimum(symbol, partner)
+        b = np.maximum(symbol, partner)
+        _, first = np.unique(a * len(symbols) + b, return_index=True)
+        a, b, corr = a[first], b[first], corr[first]
+        
+        beta, z, half_life = self.spread_stats(log_price, a, b)
+        table = pd.DataFrame({
+            'symbol': symbols[a],
+            'partner': symbols[b],
+            'corr': corr,
+            'hedge_ratio': beta,
+            'spread_z': z,
+            'half_life': half_life,
+        })
+        return table.sort_values('corr', ascending=False).reset_index(drop=True)
+    
+    def screen_store(self, store, symbols=None):
+        """直接从DataStore筛选：每只股票只读取close列最近lookback+1根K线"""
+        return self.screen(store.read_panel(symbols, 'close', last=self.lookback + 1))
+    
+    @staticmethod
+    def backtest_candidates(candidates, frames, top=10, initial_capital=100000, strategy_params=None,
+                            **trading_params):
+        """
+        用PairsStrategy回测排名靠前的候选配对
+        
+        Args:
+            candidates: screen()的返回值
+            frames: {股票代码: 按日期升序的数据}（或DataStore）
+            top: 回测前多少个配对
+            strategy_params: PairsStrategy的参数
+        
+        Returns:
+            table: 候选表前top行加上final_value、total_return、max_drawdown和trades列
+        """
+        strategy = PairsStrategy(**(strategy_params or {}))
+        rows = []
+        for _, pair in candidates.head(top).iterrows():
+            leg = frames.read(pair['symbol']) if hasattr(frames, 'read') else frames[pair['symbol']]
+            hedge = frames.read(pair['partner']) if hasattr(frames, 'read') else frames[pair['partner']]
+            df = PairsStrategy.align(leg, hedge)
+            result = strategy.backtest_events(df, initial_capital, **trading_params)
+            rows.append({
+                **pair.to_dict(),
+                'final_value': result['final_value'],
+                'total_return': (result['final_value'] / initial_capital - 1) * 100,
+                'max_drawdown': result['max_drawdown'],
+                'trades': len(result['trades']),
+            })
+        return pd.DataFrame(rows)
@@ -2,6 +2,7 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from utils.trade_analytics import TradeAnalytics
 
 class PerformanceAnalyzer:
     """性能分析器"""
@@ -28,25 +29,21 @@ class PerformanceAnalyzer:
             df['drawdown'] = (df['portfolio_value'] - df['cummax']) / df['cummax'] * 100
             max_drawdown = df['drawdown'].min()
         
-        # 统计交易信息
-        buy_signals = len(df[df['action'] == 'BUY'])
-        sell_signals = len(df[df['action'] == 'SELL'])
+        # 统计交易信息：按交易列表统计，同一根K线开仓并平仓的交易也计一次买入和一次卖出
+        engine_trades = TradeAnalytics.result_trades(df)
+        buy_signals = len(engine_trades)
+        sell_signals = sum(t['exit_bar'] is not None for t in engine_trades)
         total_trades = buy_signals + sell_signals
         
-        # 计算胜率
+        # 计算胜率（按实际成交价，含滑点、止损价）
         trades = []
-        entry_price = None
-        for i in range(len(df)):
-            if df.iloc[i]['action'] == 'BUY':
-                entry_price = df.iloc[i]['close']
-            elif df.iloc[i]['action'] == 'SELL' and entry_price is not None:
-                exit_price = df.iloc[i]['close']
-                profit_pct = (exit_price / entry_price - 1) * 100
+        for t in engine_trades:
+            if t['exit_bar'] is not None:
+                profit_pct = (t['exit_price'] / t['entry_price'] - 1) * 100
                 trades.append({
                     'profit_pct': profit_pct,
                     'win': profit_pct > 0
                 })
-                entry_price = None
         
         winning_trades = len([t for t in trades if t['win']])
         win_rate = (winning_trades / len(trades) * 100) if trades else 0
@@ -59,6 +56,10 @@ class PerformanceAnalyzer:
         else:
             avg_profit = avg_win = avg_loss = 0
         
+        # 逐笔交易的最大不利/有利偏移和持仓时长（需要最高价和最低价）
+        if buy_signals and {'high', 'low'}.issubset(df.columns):
+            trade_summary = TradeAnalytics.summarize(TradeAnalytics.from_result(df, trades=engine_trades), quantiles=())
+        
         # 计算夏普比率（简化版）
         if 'portfolio_value' in df.columns:
             df['daily_returns'] = df['portfolio_value'].pct_change()
@@ -78,7 +79,10 @@ class PerformanceAnalyzer:
             '胜率': f"{win_rate:.1f}%",
             '平均每笔收益': f"{avg_profit:.2f}%",
             '平均盈利': f"{avg_win:.2f}%",
-            '平均亏损': f"{avg_loss:.2f}%"
+            '平均亏损': f"{avg_loss:.2f}%",
+            '平均最大不利偏移': f"{trade_summary['mean_mae'] * 100:.2f}%" if 'trade_summary' in locals() else "N/A",
+            '平均最大有利偏移': f"{trade_summary['mean_mfe'] * 100:.2f}%" if 'trade_summary' in locals() else "N/A",
+            '平均持仓K线数': f"{trade_summary['mean_holding_bars']:.1f}" if 'trade_summary' in locals() else "N/A"
         }
     
     @staticmethod
@@ -0,0 +1,145 @@
+# trading_strategies/utils/pipeline.py
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class StageFailure:
+    """隔离阶段的失败结果：代替阶段输出被缓存，依赖它的隔离阶段不再执行而是直接传递"""
+    
+    def __init__(self, stage, error):
+        self.stage = stage
+        self.error = error
+    
+    def __repr__(self):
+        return f"StageFailure({self.stage!r}, {self.error!r})"
+    
+    @staticmethod
+    def split(names, outputs):
+        """把{名称: 输出}分为成功的输出和失败的StageFailure两个字典"""
+        ok, failed = {}, {}
+        for name, output in zip(names, outputs):
+            (failed if isinstance(output, StageFailure) else ok)[name] = output
+        return ok, failed
+
+
+class Pipeline:
+    """惰性计算图：每个阶段声明依赖，只计算请求的输出所需的阶段，结果缓存，互不依赖的阶段并发执行"""
+    
+    def __init__(self, max_workers=4):
+        """
+        Args:
+            max_workers: 并发执行的最大线程数（1表示顺序执行）
+        """
+        self.max_workers = max_workers
+        self._stages = {}
+        self._cache = {}
+        self.run_counts = {}
+    
+    def add(self, name, func, deps=(), concurrent=True, isolate=False):
+        """
+        注册阶段
+        
+        Args:
+            name: 阶段名称
+            func: 计算函数，按deps的顺序接收各依赖阶段的结果
+            deps: 依赖的阶段名称
+            concurrent: 是否可以在工作线程中执行（绘图等需要在主线程执行的阶段设为False）
+            isolate: 出错时不中断整个计算，而是把StageFailure作为该阶段的结果；
+                依赖中有StageFailure时不调用func，直接传递该失败
+        """
+        self._stages[name] = {'func': func, 'deps': tuple(deps), 'concurrent': concurrent, 'isolate': isolate}
+        self.invalidate(name)
+        return self
+    
+    def stages(self):
+        """已注册的阶段名称"""
+        return list(self._stages.keys())
+    
+    def required(self, *targets):
+        """计算targets需要执行（尚未缓存）的阶段，按依赖顺序排列"""
+        order = []
+        visiting = set()
+        done = set()
+        
+        def visit(name):
+            if name in done or name in self._cache:
+                return
+            if name not in self._stages:
+                raise KeyError(f"未知阶段: {name}")
+            if name in visiting:
+                raise ValueError(f"阶段之间存在循环依赖: {name}")
+            visiting.add(name)
+            for dep in self._stages[name]['deps']:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+        
+        for target in targets:
+            visit(target)
+        return order
+    
+    def _execute(self, name):
+        stage = self._stages[name]
+        args = [self._cache[dep] for dep in stage['deps']]
+        if stage['isolate']:
+            failure = next((arg for arg in args if isinstance(arg, StageFailure)), None)
+            if failure is not None:
+                return failure
+            try:
+                result = stage['func'](*args)
+            except Exception as e:
+                result = StageFailure(name, e)
+        else:
+            result = stage['func'](*args)
+        self.run_counts[name] = self.run_counts.get(name, 0) + 1
+        return result
+    
+    def run(self, *targets):
+        """
+        计算请求的阶段
+        
+        Returns:
+            单个目标时返回其结果，多个目标时返回{阶段名称: 结果}
+        """
+        pending = self.required(*targets)
+        remaining = {name: set(d for d in self._stages[name]['deps'] if d not in self._cache)
+                     for name in pending}
+        
+        if self.max_workers and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                running = {}
+                while remaining or running:
+                    ready = [name for name, deps in remaining.items() if not deps]
+                    for name in ready:
+                        del remaining[name]
+                        if self._stages[name]['concurrent']:
+                            running[executor.submit(self._execute, name)] = name
+                        else:
+                            self._finish(name, self._execute(name), remaining)
+                    if not running:
+                        if remaining and not any(not deps for deps in remaining.values()):
+                            raise RuntimeError("阶段依赖无法满足")
+                        continue
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        self._finish(running.pop(future), future.result(), remaining)
+        else:
+            for name in pending:
+                self._finish(name, self._execute(name), remaining)
+        
+        if len(targets) == 1:
+            return self._cache[targets[0]]
+        return {target: self._cache[target] for target in targets}
+    
+    def _finish(self, name, result, remaining):
+        """缓存阶段结果并解除下游阶段的依赖"""
+        self._cache[name] = result
+        for deps in remaining.values():
+            deps.discard(name)
+    
+    def invalidate(self, name):
+        """清除阶段及其所有下游阶段的缓存"""
+        self._cache.pop(name, None)
+        for other, stage in self._stages.items():
+            if name in stage['deps'] and other in self._cache:
+                self.invalidate(other)
@@ -0,0 +1,177 @@
+# trading_strategies/utils/replay.py
+import time
+import numpy as np
+import pandas as pd
+
+
+class ReplayHarness:
+    """历史回放：把已存储的行情逐根K线送入策略的增量信号接口，模拟实盘运行
+    
+    每根K线的决策（generate_signals_chunk，块大小为1）单独计时，汇总延迟分位数和吞吐量；
+    回放结束后把增量信号与整体generate_signals的结果逐根比对，确认增量路径可以信任。
+    """
+    
+    PERCENTILES = (50, 90, 99)
+    
+    def __init__(self, strategy, speed=None):
+        """
+        Args:
+            strategy: 策略实例（需要支持generate_signals_chunk）
+            speed: 相对数据时间线的加速倍数，例如日线数据取86400表示每根K线约1秒；
+                None表示不等待，尽快回放
+        """
+        self.strategy = strategy
+        self.speed = speed
+        self.last_stats = None
+    
+    def _pace(self, wall_start, bar_time, first_time):
+        """按加速倍数等待到当前K线在回放时间线上的时刻"""
+        if self.speed is None or first_time is None:
+            return
+        target = wall_start + (bar_time - first_time).total_seconds() / self.speed
+        delay = target - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    
+    def replay(self, df, on_bar=None):
+        """
+        逐根K线回放一只股票
+        
+        Args:
+            df: 按日期升序的股票数据
+            on_bar: 每根K线决策后的回调 on_bar(位置, K线, 信号)
+        
+        Returns:
+            result: {'signals': 增量信号数组, 'latency_ns': 每根K线的决策耗时, 'stats': 统计}
+        """
+        return self.replay_many({None: df}, on_bar=on_bar)[None]
+    
+    def replay_many(self, frames, on_bar=None):
+        """
+        按日期合并回放多只股票（同一日期内按传入顺序），每只股票各自保存增量状态
+        
+        Args:
+            frames: {股票代码: 按日期升序的数据}
+            on_bar: 每根K线决策后的回调 on_bar(股票代码, 位置, K线, 信号)；
+                单只股票回放时为 on_bar(位置, K线, 信号)
+        
+        Returns:
+            results: {股票代码: replay()格式的结果}
+        """
+        symbols = list(frames.keys())
+        frames = {s: frames[s].reset_index(drop=True) for s in symbols}
+        states = {s: {} for s in symbols}
+        signals = {s: np.zeros(len(frames[s]), dtype=np.int64) for s in symbols}
+        latency = {s: np.zeros(len(frames[s]), dtype=np.int64) for s in symbols}
+        
+        # 事件顺序：按日期稳定排序，同日按股票传入顺序
+        owner = np.concatenate([np.full(len(frames[s]), k, dtype=np.int64) for k, s in enumerate(symbols)])
+        position = np.concatenate([np.arange(len(frames[s])) for s in symbols])
+        has_dates = all('date' in frames[s].columns for s in symbols)
+        if has_dates and len(owner):
+            dates = np.concatenate([pd.to_datetime(frames[s]['date']).values for s in symbols])
+            order = np.argsort(dates, kind='stable')
+            times = pd.DatetimeIndex(dates[order])
+        else:
+            order = np.arange(len(owner))
+            times = None
+        
+        first_time = times[0] if times is not None and len(times) else None
+        wall_start = time.perf_counter()
+        busy_ns = 0
+        for k, event in enumerate(order):
+            symbol = symbols[owner[event]]
+            i = position[event]
+            if times is not None:
+                self._pace(wall_start, times[k], first_time)
+            
+            feed_start = time.perf_counter_ns()
+            bar = frames[symbol].iloc[i:i + 1]
+            decide_start = time.perf_counter_ns()
+            signal = self.strategy.generate_signals_chunk(bar, states[symbol])
+            decide_end = time.perf_counter_ns()
+            
+            signals[symbol][i] = signal[0]
+            latency[symbol][i] = decide_end - decide_start
+            busy_ns += decide_end - feed_start
+            if on_bar is not None:
+                if symbol is None:
+                    on_bar(i, bar, signal[0])
+                else:
+                    on_bar(symbol, i, bar, signal[0])
+        elapsed = time.perf_counter() - wall_start
+        
+        results = {}
+        for symbol in symbols:
+            results[symbol] = {
+                'signals': signals[symbol],
+                'latency_ns': latency[symbol],
+                'stats': self.latency_stats(latency[symbol]),
+            }
+        total = self.latency_stats(np.concatenate([latency[s] for s in symbols]))
+        total['elapsed_sec'] = elapsed
+        # 吞吐量按实际处理时间计算，不含为模拟实时而等待的时间
+        total['bars_per_sec'] = len(order) / (busy_ns / 1e9) if busy_ns else np.nan
+        self.last_stats = total
+        if len(symbols) == 1:
+            results[symbols[0]]['stats'].update(elapsed_sec=elapsed, bars_per_sec=total['bars_per_sec'])
+        return results
+    
+    @staticmethod
+    def latency_stats(latency_ns, percentiles=PERCENTILES):
+        """每根K线决策耗时的统计（微秒）"""
+        latency_us = np.asarray(latency_ns, dtype=float) / 1000
+        stats = {'bars': len(latency_us)}
+        if len(latency_us) == 0:
+            return stats
+        for p, value in zip(percentiles, np.percentile(latency_us, percentiles)):
+            stats[f'p{p}_us'] = value
+        stats['max_us'] = latency_us.max()
+        stats['mean_us'] = latency_us.mean()
+        stats['decide_bars_per_sec'] = len(latency_us) / (latency_us.sum() / 1e6) if latency_us.sum() else np.nan
+        return stats
+    
+    def verify(self, df, incremental):
+        """
+        把增量信号与整体generate_signals的结果逐根比对
+        
+        Returns:
+            check: {'match': 是否完全一致, 'mismatches': 不一致的K线数,
+                    'first_mismatch': 第一根不一致K线的位置, 'first_mismatch_date': 其日期}
+        """
+        batch = np.asarray(self.strategy.generate_signals(df.reset_index(drop=True)), dtype=np.int64)
+        incremental = np.asarray(incremental, dtype=np.int64)
+        diff = np.flatnonzero(batch != incremental)
+        check = {
+            'match': len(diff) == 0,
+            'mismatches': len(diff),
+            'first_mismatch': int(diff[0]) if len(diff) else None,
+            'first_mismatch_date': None,
+        }
+        if len(diff) and 'date' in df.columns:
+            check['first_mismatch_date'] = df['date'].iloc[diff[0]]
+        return check
+    
+    def run(self, df, on_bar=None):
+        """回放一只股票并校验增量信号，返回replay()的结果加上'check'"""
+        result = self.replay(df, on_bar=on_bar)
+        result['check'] = self.verify(df, result['signals'])
+        return result
+    
+    def run_store(self, store, symbols=None, start=None, end=None, on_bar=None):
+        """
+        从DataStore读取多只股票并按日期合并回放，逐只校验增量信号
+        
+        Returns:
+            report: 每只股票一行的DataFrame（延迟统计和校验结果），合计统计见self.last_stats
+        """
+        symbols = store.symbols() if symbols is None else symbols
+        frames = {symbol: store.read(symbol, start=start, end=end) for symbol in symbols}
+        results = self.replay_many(frames, on_bar=on_bar)
+        
+        rows = {}
+        for symbol in symbols:
+            result = results[symbol]
+            result['check'] = self.verify(frames[symbol], result['signals'])
+            rows[symbol] = {**result['stats'], **result['check']}
+        return pd.DataFrame.from_dict(rows, orient='index')
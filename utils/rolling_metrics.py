@@ -0,0 +1,219 @@
+# trading_strategies/utils/rolling_metrics.py
+from collections import deque
+import numpy as np
+import pandas as pd
+
+
+def _rolling_sum(cum, window):
+    """由前缀和得到窗口和（前window行为NaN）"""
+    out = np.full((cum.shape[0] - 1,) + cum.shape[1:], np.nan)
+    out[window:] = cum[window + 1:] - cum[1:-window]
+    return out
+
+
+def _rolling_max(values, window):
+    """按列计算滚动最大值（van Herk/Gil-Werman分块前后缀最大值，O(n)）"""
+    n = values.shape[0]
+    out = np.full(values.shape, np.nan)
+    if n < window:
+        return out
+
+    blocks = -(-n // window)
+    padded = np.full((blocks * window,) + values.shape[1:], -np.inf)
+    padded[:n] = values
+    shaped = padded.reshape((blocks, window) + values.shape[1:])
+
+    prefix = np.maximum.accumulate(shaped, axis=1).reshape(padded.shape)
+    suffix = np.maximum.accumulate(shaped[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+
+    # 窗口[i-window+1, i]跨越两个分块：取左块后缀最大值与右块前缀最大值
+    out[window - 1:] = np.maximum(suffix[:n - window + 1], prefix[window - 1:n])
+    return out
+
+
+class RollingMetrics:
+    """滚动绩效指标（夏普、波动率、回撤、胜率、持仓暴露）"""
+
+    METRICS = ('sharpe', 'volatility', 'drawdown', 'win_rate', 'exposure')
+
+    @staticmethod
+    def compute(equity, windows=(63, 126, 252), position=None, periods_per_year=252):
+        """
+        一次遍历计算多个窗口的滚动指标
+
+        Args:
+            equity: 权益曲线，形状(n,)或(n, k)（k条曲线批量计算）
+            windows: 窗口长度列表
+            position: 持仓数组，形状与equity相同；缺省时以收益非零近似持仓
+            periods_per_year: 年化周期数
+
+        Returns:
+            metrics: {window: {指标名: 数组}}，数组形状与equity相同
+        """
+        equity = np.asarray(equity, dtype=float)
+        n = equity.shape[0]
+
+        returns = np.zeros_like(equity)
+        returns[1:] = equity[1:] / equity[:-1] - 1
+        if position is None:
+            exposed = returns != 0
+        else:
+            exposed = np.asarray(position) != 0
+
+        # 所有窗口共享同一组前缀和；先减去均值以降低方差计算的舍入误差
+        centered = returns - returns.mean(axis=0)
+        zeros = np.zeros((1,) + equity.shape[1:])
+        cum_r = np.concatenate((zeros, np.cumsum(centered, axis=0)))
+        cum_r2 = np.concatenate((zeros, np.cumsum(centered ** 2, axis=0)))
+        cum_win = np.concatenate((zeros, np.cumsum(returns > 0, axis=0)))
+        cum_loss = np.concatenate((zeros, np.cumsum(returns < 0, axis=0)))
+        cum_exposed = np.concatenate((zeros, np.cumsum(exposed, axis=0)))
+
+        annual = np.sqrt(periods_per_year)
+        metrics = {}
+        for window in windows:
+            if window < 2 or n <= window:
+                metrics[window] = {name: np.full(equity.shape, np.nan) for name in RollingMetrics.METRICS}
+                continue
+
+            s1 = _rolling_sum(cum_r, window)
+            s2 = _rolling_sum(cum_r2, window)
+            mean = s1 / window
+            var = np.maximum(s2 - s1 * mean, 0) / (window - 1)
+            std = np.sqrt(var)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                sharpe = np.where(std > 0, (mean + returns.mean(axis=0)) / std * annual, 0.0)
+            sharpe[:window] = np.nan
+
+            wins = _rolling_sum(cum_win, window)
+            losses = _rolling_sum(cum_loss, window)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                win_rate = np.where(wins + losses > 0, wins / (wins + losses), 0.0)
+            win_rate[:window] = np.nan
+
+            drawdown = equity / _rolling_max(equity, window) - 1
+            drawdown[:window] = np.nan
+
+            metrics[window] = {
+                'sharpe': sharpe,
+                'volatility': std * annual,
+                'drawdown': drawdown,
+                'win_rate': win_rate,
+                'exposure': _rolling_sum(cum_exposed, window) / window,
+            }
+
+        return metrics
+
+    @staticmethod
+    def from_result(df, windows=(63, 126, 252), periods_per_year=252):
+        """从execute_strategy的结果计算滚动指标，返回以 指标_窗口 命名列的DataFrame"""
+        position = df['position'].values if 'position' in df.columns else None
+        metrics = RollingMetrics.compute(
+            df['portfolio_value'].values, windows, position, periods_per_year
+        )
+
+        columns = {}
+        if 'date' in df.columns:
+            columns['date'] = df['date'].values
+        for window, values in metrics.items():
+            for name, arr in values.items():
+                columns[f'{name}_{window}'] = arr
+        return pd.DataFrame(columns, index=df.index)
+
+
+class RollingMetricsTracker:
+    """增量滚动指标：新K线到来时O(1)摊销更新"""
+
+    def __init__(self, window=63, periods_per_year=252):
+        self.window = window
+        self.periods_per_year = periods_per_year
+
+        self._returns = deque()
+        self._exposed = deque()
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._wins = 0
+        self._losses = 0
+        self._exposure = 0
+
+        # 单调递减队列：(K线序号, 权益)，队首为窗口最大值
+        self._peaks = deque()
+        self._bar = -1
+        self._last_equity = None
+
+    def _add(self, r):
+        # Welford 增量更新
+        self._count += 1
+        delta = r - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (r - self._mean)
+
+    def _remove(self, r):
+        self._count -= 1
+        if self._count == 0:
+            self._mean = 0.0
+            self._m2 = 0.0
+            return
+        delta = r - self._mean
+        self._mean -= delta / self._count
+        self._m2 -= delta * (r - self._mean)
+
+    def update(self, equity, position=None):
+        """
+        输入一根新K线的权益
+
+        Args:
+            equity: 当前权益
+            position: 当前持仓（缺省时以收益非零近似）
+
+        Returns:
+            metrics: 当前窗口指标字典（窗口未满时各值为NaN）
+        """
+        self._bar += 1
+
+        while self._peaks and self._peaks[-1][1] <= equity:
+            self._peaks.pop()
+        self._peaks.append((self._bar, equity))
+        while self._peaks[0][0] <= self._bar - self.window:
+            self._peaks.popleft()
+
+        if self._last_equity is None:
+            self._last_equity = equity
+            return self.current()
+
+        r = equity / self._last_equity - 1
+        self._last_equity = equity
+        exposed = (r != 0) if position is None else (position != 0)
+
+        self._returns.append(r)
+        self._exposed.append(exposed)
+        self._add(r)
+        self._wins += r > 0
+        self._losses += r < 0
+        self._exposure += exposed
+
+        if len(self._returns) > self.window:
+            old = self._returns.popleft()
+            self._remove(old)
+            self._wins -= old > 0
+            self._losses -= old < 0
+            self._exposure -= self._exposed.popleft()
+
+        return self.current()
+
+    def current(self):
+        """当前窗口指标"""
+        if self._count < self.window:
+            return {name: np.nan for name in RollingMetrics.METRICS}
+
+        annual = np.sqrt(self.periods_per_year)
+        std = np.sqrt(max(self._m2, 0.0) / (self._count - 1))
+        decided = self._wins + self._losses
+        return {
+            'sharpe': self._mean / std * annual if std > 0 else 0.0,
+            'volatility': std * annual,
+            'drawdown': self._last_equity / self._peaks[0][1] - 1,
+            'win_rate': self._wins / decided if decided > 0 else 0.0,
+            'exposure': self._exposure / self.window,
+        }
@@ -0,0 +1,313 @@
+# trading_strategies/utils/rules.py
+import ast
+import io
+import re
+import tokenize
+
+import numpy as np
+
+from utils import kernels
+from utils.indicators import Indicators, bar_origin
+
+# 数据中直接可用的列
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'adjclose', 'volume')
+
+# 指标名称：ema_12、sma_20、rsi_14、atr_14、bb_upper_20（2倍标准差）、obv
+_INDICATOR_PATTERN = re.compile(r'^(ema|sma|rsi|atr)_(\d+)$|^bb_(mid|upper|lower)_(\d+)$|^(obv)$')
+
+# 以表达式定义的派生指标（参数取自MACD策略的默认值，可在编译时覆盖）
+DEFAULT_MACROS = {
+    'macd': 'ema_12 - ema_26',
+    'signal_line': 'ema(macd, 9)',
+    'histogram': 'macd - signal_line',
+}
+
+# EMA依赖全部历史，分块计算时按周期的倍数预热（与UniverseScreener相同）
+EMA_WARMUP_MULTIPLE = 10
+
+_BINARY_OPS = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+}
+_COMPARE_OPS = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+
+def _shift(values, periods):
+    """向后平移periods根K线，开头补NaN（布尔数组补False）；常数平移后不变"""
+    if np.ndim(values) == 0:
+        return values
+    out = np.empty_like(values)
+    periods = min(periods, len(values))
+    out[:periods] = False if values.dtype == bool else np.nan
+    out[periods:] = values[:len(values) - periods]
+    return out
+
+
+def _cross_above(a, b):
+    """a从下方穿越b：前一根K线a < b且当前a > b（与MACD金叉的判断一致）；a、b可以是常数"""
+    return (_shift(a, 1) < _shift(b, 1)) & (a > b)
+
+
+def _cross_below(a, b):
+    """a从上方穿越b：前一根K线a > b且当前a < b"""
+    return (_shift(a, 1) > _shift(b, 1)) & (a < b)
+
+
+# 可在规则中调用的函数：(参数个数, 计算函数, 额外需要的历史K线数)
+# 带周期的函数（prev、ema、sma）另接收数据第一行在整段数据中的位置origin（见indicators.bar_origin）
+_FUNCTIONS = {
+    'cross_above': (2, _cross_above, lambda args: 1),
+    'cross_below': (2, _cross_below, lambda args: 1),
+    'prev': (2, lambda x, n, origin=0: _shift(x, int(n)), lambda args: int(args[1])),
+    'abs': (1, np.abs, lambda args: 0),
+    'max': (2, np.fmax, lambda args: 0),
+    'min': (2, np.fmin, lambda args: 0),
+    'ema': (2, lambda x, n, origin=0: kernels.ewm(x, int(n)), lambda args: EMA_WARMUP_MULTIPLE * int(args[1])),
+    'sma': (2, lambda x, n, origin=0: Indicators.sma(x, int(n), origin=origin)[:, 0], lambda args: int(args[1]) - 1),
+}
+
+
+def _normalize_operators(expression):
+    """
+    把&、|、~替换为and、or、not
+    
+    Python中&、|的优先级高于比较运算符，cross_above(a, b) & rsi_14 < 70会被解析为
+    (cross_above(a, b) & rsi_14) < 70；替换后按规则书写的直观含义解析。
+    """
+    mapping = {'&': 'and', '|': 'or', '~': 'not'}
+    tokens = []
+    for tok in tokenize.generate_tokens(io.StringIO(expression).readline):
+        if tok.type == tokenize.OP and tok.string in mapping:
+            tokens.append((tokenize.NAME, mapping[tok.string]))
+        else:
+            tokens.append((tok.type, tok.string))
+    return tokenize.untokenize(tokens)
+
+
+class RulePlan:
+    """编译后的规则：按顺序执行的数组运算步骤，相同的子表达式和指标只计算一次"""
+    
+    def __init__(self, steps, outputs, spec, lookback):
+        self.steps = steps
+        self.outputs = outputs
+        self.spec = spec
+        self.lookback = lookback
+    
+    def indicator_columns(self):
+        """规则用到的指标列名"""
+        return Indicators.columns(self.spec)
+    
+    def warmup_bars(self):
+        """分块计算时需要保留的历史K线数"""
+        return max([self.lookback[slot] for slot in self.outputs.values()] + [0]) + 1
+    
+    def evaluate(self, data, return_indicators=False):
+        """
+        在一组数据上执行规则
+        
+        Args:
+            data: 含价格列的DataFrame或字典（按日期升序）
+            return_indicators: 是否同时返回计算的指标
+        
+        Returns:
+            results: {规则名称: 布尔数组}（若return_indicators为True，另返回{指标名: 数组}）
+        """
+        origin = bar_origin(data)
+        indicators = Indicators.compute(data, self.spec, origin=origin) if self.indicator_columns() else {}
+        values = []
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for kind, arg, inputs in self.steps:
+                if kind == 'column':
+                    values.append(np.asarray(data[arg], dtype=float))
+                elif kind == 'indicator':
+                    values.append(indicators[arg])
+                elif kind == 'const':
+                    values.append(arg)
+                elif kind == 'window':
+                    values.append(arg(values[inputs[0]], origin))
+                else:
+                    values.append(arg(*(values[i] for i in inputs)))
+        
+        results = {}
+        n = len(data['close'])
+        for name, slot in self.outputs.items():
+            result = np.broadcast_to(np.asarray(values[slot]), (n,))
+            results[name] = np.where(np.isnan(result), False, result).astype(bool) \
+                if result.dtype != bool else result.copy()
+        if return_indicators:
+            return results, indicators
+        return results
+
+
+class RuleCompiler:
+    """规则表达式编译器
+    
+    规则是Python表达式语法的子集，例如
+        cross_above(macd, signal_line) & rsi_14 < 70
+    只允许数字、价格列、指标名称、算术/比较/逻辑运算和_FUNCTIONS中的函数。
+    表达式只解析一次，编译为一组数组运算步骤；多条规则一起编译时，相同的子表达式
+    （按语法树判断）和所有指标（一次Indicators.compute）在各规则之间共享。
+    """
+    
+    def __init__(self, macros=None):
+        """
+        Args:
+            macros: 额外的派生指标定义{名称: 表达式}，覆盖DEFAULT_MACROS中的同名定义
+        """
+        self.macros = {**DEFAULT_MACROS, **(macros or {})}
+        self.steps = []
+        self.lookback = []
+        self._slots = {}
+        self._spec = {}
+        self._expanding = set()
+    
+    @staticmethod
+    def compile(rules, macros=None):
+        """
+        编译一组规则
+        
+        Args:
+            rules: {规则名称: 表达式字符串}
+            macros: 额外的派生指标定义
+        
+        Returns:
+            plan: RulePlan
+        """
+        compiler = RuleCompiler(macros)
+        outputs = {name: compiler._compile_expression(expression) for name, expression in rules.items()}
+        return RulePlan(compiler.steps, outputs, compiler._spec_for_indicators(), compiler.lookback)
+    
+    def _compile_expression(self, expression):
+        try:
+            tree = ast.parse(_normalize_operators(expression.strip()), mode='eval')
+        except (SyntaxError, tokenize.TokenError) as e:
+            raise ValueError(f"规则语法错误: {expression}") from e
+        return self._visit(tree.body)
+    
+    def _emit(self, key, kind, arg, inputs=(), own_lookback=0):
+        """添加一个步骤；相同key的步骤只添加一次"""
+        if key in self._slots:
+            return self._slots[key]
+        self.steps.append((kind, arg, tuple(inputs)))
+        self.lookback.append(own_lookback + max([self.lookback[i] for i in inputs] + [0]))
+        self._slots[key] = len(self.steps) - 1
+        return self._slots[key]
+    
+    def _indicator(self, name):
+        """登记指标并返回其步骤；未知名称返回None"""
+        match = _INDICATOR_PATTERN.match(name)
+        if not match:
+            return None
+        if match.group(1):
+            kind, period = match.group(1), int(match.group(2))
+            self._spec.setdefault(kind, set()).add(period)
+            # RSI和ATR用到前一根K线的收盘价
+            lookback = EMA_WARMUP_MULTIPLE * period if kind == 'ema' else period - 1 + (kind != 'sma')
+        elif match.group(3):
+            period = int(match.group(4))
+            self._spec.setdefault('bollinger', set()).add((period, 2.0))
+            lookback = period - 1
+        else:
+            self._spec['obv'] = True
+            lookback = 0
+        column = name if not match.group(3) else f'bb_{match.group(3)}_{match.group(4)}'
+        return self._emit(('indicator', column), 'indicator', column, own_lookback=lookback)
+    
+    def _spec_for_indicators(self):
+        spec = {}
+        for kind in ('ema', 'sma', 'rsi', 'atr'):
+            if kind in self._spec:
+                spec[kind] = sorted(self._spec[kind])
+        if 'bollinger' in self._spec:
+            spec['bollinger'] = sorted(self._spec['bollinger'])
+        if self._spec.get('obv'):
+            spec['obv'] = True
+        return spec
+    
+    def _visit(self, node):
+        key = ast.dump(node, annotate_fields=False)
+        
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name in PRICE_COLUMNS:
+                return self._emit(key, 'column', name)
+            slot = self._indicator(name)
+            if slot is not None:
+                return slot
+            if name in self.macros:
+                if name in self._expanding:
+                    raise ValueError(f"派生指标循环定义: {name}")
+                self._expanding.add(name)
+                slot = self._compile_expression(self.macros[name])
+                self._expanding.discard(name)
+                return slot
+            raise ValueError(f"未知名称: {name}")
+        
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+                and not isinstance(node.value, bool):
+            return self._emit(key, 'const', float(node.value))
+        
+        if isinstance(node, ast.UnaryOp):
+            operand = self._visit(node.operand)
+            if isinstance(node.op, ast.USub):
+                return self._emit(key, 'op', np.negative, [operand])
+            if isinstance(node.op, ast.Not):
+                return self._emit(key, 'op', np.logical_not, [operand])
+            if isinstance(node.op, ast.UAdd):
+                return operand
+        
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            inputs = [self._visit(node.left), self._visit(node.right)]
+            return self._emit(key, 'op', _BINARY_OPS[type(node.op)], inputs)
+        
+        if isinstance(node, ast.BoolOp):
+            inputs = [self._visit(value) for value in node.values]
+            fn = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            slot = inputs[0]
+            for k in range(1, len(inputs)):
+                slot = self._emit((key, k), 'op', fn, [slot, inputs[k]])
+            return slot
+        
+        if isinstance(node, ast.Compare) and all(type(op) in _COMPARE_OPS for op in node.ops):
+            # 连续比较a < b < c按(a < b) and (b < c)计算
+            operands = [self._visit(node.left)] + [self._visit(c) for c in node.comparators]
+            slot = None
+            for k, op in enumerate(node.ops):
+                part = self._emit((key, 'cmp', k), 'op', _COMPARE_OPS[type(op)], operands[k:k + 2])
+                slot = part if slot is None else self._emit((key, 'and', k), 'op', np.logical_and, [slot, part])
+            return slot
+        
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            name = node.func.id
+            if name not in _FUNCTIONS:
+                raise ValueError(f"未知函数: {name}")
+            arity, fn, extra = _FUNCTIONS[name]
+            args = list(node.args)
+            if name == 'prev' and len(args) == 1:
+                args.append(ast.Constant(1))
+            if len(args) != arity:
+                raise ValueError(f"函数{name}需要{arity}个参数")
+            # 周期参数必须是常数
+            if name in ('prev', 'ema', 'sma'):
+                if not (isinstance(args[1], ast.Constant) and isinstance(args[1].value, int)):
+                    raise ValueError(f"函数{name}的周期必须是整数常数")
+                period = args[1].value
+                # ema(close, 12)与ema_12是同一个指标
+                if name in ('ema', 'sma') and isinstance(args[0], ast.Name) and args[0].id == 'close':
+                    return self._indicator(f'{name}_{period}')
+                inputs = [self._visit(args[0])]
+                return self._emit(key, 'window', lambda x, origin, fn=fn, n=period: fn(x, n, origin), inputs,
+                                  own_lookback=extra([None, period]))
+            inputs = [self._visit(arg) for arg in args]
+            return self._emit(key, 'op', fn, inputs, own_lookback=extra(args))
+        
+        raise ValueError(f"不支持的表达式: {ast.unparse(node)}")
@@ -0,0 +1,147 @@
+# trading_strategies/utils/screener.py
+import numpy as np
+import pandas as pd
+
+from utils import kernels
+
+
+def _rolling_mean_2d(values, window):
+    """按列计算滚动均值（窗口内有缺失值时为NaN）"""
+    out = np.full(values.shape, np.nan)
+    if values.shape[0] < window:
+        return out
+    csum = np.cumsum(np.vstack((np.zeros((1, values.shape[1])), values)), axis=0)
+    out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+
+class UniverseScreener:
+    """横截面选股器：对(日期 × 股票)面板一次性计算所有股票最新K线的MACD/RSI/MA信号"""
+    
+    DEFAULT_PARAMS = {
+        'macd': {'fast_period': 12, 'slow_period': 26, 'signal_period': 9},
+        'rsi': {'period': 14, 'oversold': 30, 'overbought': 70},
+        'ma': {'short_window': 20, 'long_window': 50},
+    }
+    
+    def __init__(self, strategy_params=None, ema_warmup_multiple=10):
+        """
+        Args:
+            strategy_params: {策略名: 参数}，缺省时使用三个策略的默认参数
+            ema_warmup_multiple: EMA预热长度为慢线周期的倍数。EMA依赖全部历史，
+                预热10倍周期时更早数据的权重已小于1e-8
+        """
+        self.strategy_params = strategy_params or self.DEFAULT_PARAMS
+        self.ema_warmup_multiple = ema_warmup_multiple
+    
+    def warmup_bars(self):
+        """计算最新K线信号所需的历史K线数"""
+        bars = [2]
+        for name, params in self.strategy_params.items():
+            if name == 'macd':
+                bars.append(self.ema_warmup_multiple * max(params['slow_period'], params['signal_period']))
+            elif name == 'rsi':
+                bars.append(params['period'] + 2)
+            elif name == 'ma':
+                bars.append(params['long_window'] + 1)
+        return max(bars)
+    
+    def _macd(self, close, params):
+        # 每列从第一个有效值开始递推，中间缺失时沿用前值
+        ema_fast = kernels.ewm(close, params['fast_period'])
+        ema_slow = kernels.ewm(close, params['slow_period'])
+        macd = ema_fast - ema_slow
+        signal_line = kernels.ewm(macd, params['signal_period'])
+        
+        prev_m, curr_m = macd[-2], macd[-1]
+        prev_s, curr_s = signal_line[-2], signal_line[-1]
+        signal = np.where((prev_m < prev_s) & (curr_m > curr_s), 1,
+                          np.where((prev_m > prev_s) & (curr_m < curr_s), -1, 0))
+        histogram = curr_m - curr_s
+        # 柱状图按价格归一化，便于跨股票比较强度
+        score = np.abs(histogram) / close[-1] * 100
+        return signal, score, {'macd': curr_m, 'signal_line': curr_s, 'histogram': histogram}
+    
+    def _rsi(self, close, params):
+        period = params['period']
+        oversold = params['oversold']
+        overbought = params['overbought']
+        
+        delta = np.diff(close[-(period + 2):], axis=0)
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+        gain[np.isnan(delta)] = np.nan
+        loss[np.isnan(delta)] = np.nan
+        avg_gain = _rolling_mean_2d(gain, period)[-2:]
+        avg_loss = _rolling_mean_2d(loss, period)[-2:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+        
+        prev_rsi, curr_rsi = rsi[0], rsi[1]
+        signal = np.select(
+            [(prev_rsi < oversold) & (curr_rsi > oversold),
+             (prev_rsi > overbought) & (curr_rsi < overbought),
+             curr_rsi < 20,
+             curr_rsi > 80],
+            [1, -1, 1, -1], default=0
+        )
+        # 与对应阈值的距离
+        threshold = np.where(signal > 0, oversold, overbought)
+        score = np.abs(curr_rsi - threshold)
+        return signal, score, {'rsi': curr_rsi}
+    
+    def _ma(self, close, params):
+        tail = close[-(params['long_window'] + 1):]
+        ma_short = _rolling_mean_2d(tail, params['short_window'])[-2:]
+        ma_long = _rolling_mean_2d(tail, params['long_window'])[-2:]
+        
+        prev_short, curr_short = ma_short
+        prev_long, curr_long = ma_long
+        signal = np.where((prev_short <= prev_long) & (curr_short > curr_long), 1,
+                          np.where((prev_short >= prev_long) & (curr_short < curr_long), -1, 0))
+        # 与策略一致：数据不足short_window+1根时不产生信号
+        signal = np.where(np.sum(~np.isnan(close), axis=0) > params['short_window'], signal, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            spread = (curr_short - curr_long) / curr_long * 100
+        return signal, np.abs(spread), {'ma_short': curr_short, 'ma_long': curr_long, 'ma_spread_pct': spread}
+    
+    def screen(self, close_panel, only_signals=True):
+        """
+        筛选最新K线出现信号的股票
+        
+        Args:
+            close_panel: 收盘价面板DataFrame（行为日期升序，列为股票代码）
+            only_signals: 是否只返回有信号的股票
+        
+        Returns:
+            table: 每行一个(股票, 策略)，按策略、信号方向和强度排序，rank为同策略同方向内的名次
+        """
+        close = close_panel.values[-self.warmup_bars():].astype(float)
+        symbols = np.asarray(close_panel.columns)
+        latest_close = close[-1]
+        
+        handlers = {'macd': self._macd, 'rsi': self._rsi, 'ma': self._ma}
+        tables = []
+        for name, params in self.strategy_params.items():
+            signal, score, indicators = handlers[name](close, params)
+            table = pd.DataFrame({
+                'symbol': symbols,
+                'strategy': name,
+                'signal': signal,
+                'score': score,
+                'close': latest_close,
+                **indicators
+            })
+            if only_signals:
+                table = table[table['signal'] != 0]
+            tables.append(table)
+        
+        table = pd.concat(tables, ignore_index=True)
+        table['date'] = close_panel.index[-1]
+        table['rank'] = table.groupby(['strategy', 'signal'])['score'].rank(ascending=False, method='first')
+        return table.sort_values(['strategy', 'signal', 'score'], ascending=[True, False, False]).reset_index(drop=True)
+    
+    def screen_store(self, store, symbols=None, only_signals=True):
+        """直接从DataStore筛选：每只股票只读取close列最近warmup_bars()根K线"""
+        close_panel = store.read_panel(symbols, 'close', last=self.warmup_bars())
+        return self.screen(close_panel, only_signals)
@@ -0,0 +1,58 @@
+# trading_strategies/utils/signal_index.py
+import numpy as np
+import pandas as pd
+
+
+class DateIndex:
+    """按日期排序的行索引，支持二分查找的as-of查询"""
+
+    def __init__(self, df, date_col='date'):
+        self.frame = df
+        dates = pd.to_datetime(df[date_col]).values
+
+        # 已排序时直接使用原数组，否则保存排序后的行位置
+        if len(dates) > 1 and (dates[1:] < dates[:-1]).any():
+            self._order = np.argsort(dates, kind='stable')
+            self._dates = dates[self._order]
+        else:
+            self._order = None
+            self._dates = dates
+
+    def locate(self, check_date):
+        """返回check_date当日（或之前最近一个交易日）最后一行的位置，无数据时返回None"""
+        day_end = np.datetime64(pd.Timestamp(check_date).normalize() + pd.Timedelta(days=1), 'ns')
+        pos = int(np.searchsorted(self._dates, day_end, side='left')) - 1
+        if pos < 0:
+            return None
+        return int(self._order[pos]) if self._order is not None else pos
+
+    def asof(self, check_date):
+        """返回check_date当日（或之前最近一个交易日）的数据行，无数据时返回None"""
+        pos = self.locate(check_date)
+        return None if pos is None else self.frame.iloc[pos]
+
+
+class SignalStore:
+    """跨策略、跨股票的信号查询表"""
+
+    def __init__(self):
+        self._entries = {}
+
+    def add(self, symbol, strategy, result_df):
+        """登记某只股票某个策略的回测结果（建立一次日期索引）"""
+        self._entries[(strategy.name, symbol)] = (strategy, DateIndex(result_df))
+
+    def get_signal(self, strategy_name, symbol, check_date=None):
+        """查询指定策略、股票在某日的信号信息，O(log n)"""
+        entry = self._entries.get((strategy_name, symbol))
+        if entry is None:
+            return None
+        strategy, index = entry
+        if check_date is None:
+            return strategy.get_daily_signal(index.frame)
+        row = index.asof(check_date)
+        return None if row is None else strategy.build_signal_info(row)
+
+    def keys(self):
+        """已登记的 (策略名, 股票) 列表"""
+        return list(self._entries.keys())
@@ -0,0 +1,160 @@
+# trading_strategies/utils/start_sweep.py
+import numpy as np
+import pandas as pd
+
+from strategy.backtest_engine import BacktestEngine
+from strategy.base_strategy import ENGINE_PARAMS
+
+# 只影响资金计算、不影响交易路径的参数
+_CAPITAL_PARAMS = ('commission_rate', 'position_size')
+
+
+class StartDateSweep:
+    """起始日期稳健性分析：同一策略从每隔K根K线的起点开始回测，得到收益和回撤的分布
+    
+    指标和信号只在全部历史上计算一次。每个买入成交点开仓后的出场与资金无关，
+    BacktestEngine.trade_graph一次算出所有可能的交易及平仓后的下一笔交易；
+    某个起点的回测就是从其后第一个买入成交点出发沿这张图走的一条路径，
+    首个买入成交点相同的起点结果相同，每条路径只计算一次。
+    结果与在 数据[起点:] 上用同一组信号单独回测一致（ATR等使用全部历史计算的值）。
+    """
+    
+    @staticmethod
+    def walk(graph, first, initial_capital=100000, commission_rate=0.0, position_size=1.0):
+        """
+        从第first个买入成交点出发沿交易图计算资金
+        
+        Returns:
+            (成交K线, 每次成交后的现金, 每次成交后的持股, 交易笔数)，格式与引擎内部一致
+        """
+        entry_bar, entry_price = graph['entry_bar'], graph['entry_price']
+        exit_bar, exit_price, following = graph['exit_bar'], graph['exit_price'], graph['next']
+        cash = float(initial_capital)
+        fill_bars = []
+        cash_levels = [cash]
+        share_levels = [0]
+        trades = 0
+        
+        k = first
+        while k < len(entry_bar):
+            # 与BacktestEngine.run相同的股数和现金计算
+            fill_price = entry_price[k]
+            shares = int(cash * position_size / (fill_price * (1 + commission_rate)))
+            if shares <= 0:
+                k += 1
+                continue
+            cash -= shares * fill_price * (1 + commission_rate)
+            fill_bars.append(entry_bar[k])
+            cash_levels.append(cash)
+            share_levels.append(shares)
+            trades += 1
+            if exit_bar[k] < 0:
+                break
+            cash += shares * exit_price[k] * (1 - commission_rate)
+            fill_bars.append(exit_bar[k])
+            cash_levels.append(cash)
+            share_levels.append(0)
+            k = following[k]
+        
+        return np.asarray(fill_bars, dtype=np.int64), cash_levels, share_levels, trades
+    
+    @staticmethod
+    def run(close, graph, starts, dates=None, initial_capital=100000, commission_rate=0.0,
+            position_size=1.0, periods_per_year=252):
+        """
+        计算多个起点的回测结果
+        
+        Args:
+            close: 收盘价数组（全部历史）
+            graph: BacktestEngine.trade_graph的返回值
+            starts: 起点K线位置
+            dates: 与close对应的日期（用于输出起始日期）
+            initial_capital/commission_rate/position_size: 资金参数
+        
+        Returns:
+            table: 每个起点一行（起始K线、起始日期、K线数、期末价值、总收益、年化收益、最大回撤、交易笔数）
+        """
+        close = np.asarray(close, dtype=float)
+        n = len(close)
+        starts = np.asarray(starts, dtype=np.int64)
+        entry_bar = graph['entry_bar']
+        firsts = np.searchsorted(entry_bar, starts + graph['delay'])
+        # 首个买入成交点相同的起点共用一条路径：开仓前空仓的权益为常数，不影响最大回撤；
+        # 只有起点当天即开仓时没有开仓前的初始资金权益点，单独计算
+        at_entry = np.append(entry_bar, -1)[firsts] == starts
+        keys = list(zip(firsts.tolist(), at_entry.tolist()))
+        paths = {}
+        for first, on_entry in set(keys):
+            fill_bars, cash_levels, share_levels, trades = StartDateSweep.walk(
+                graph, first, initial_capital, commission_rate, position_size
+            )
+            origin = entry_bar[first] if on_entry else 0
+            final_value, max_drawdown = BacktestEngine._equity_summary(
+                close[origin:], fill_bars - origin, cash_levels, share_levels
+            )
+            paths[first, on_entry] = (final_value, max_drawdown, trades)
+        
+        final_value = np.array([paths[key][0] for key in keys], dtype=float)
+        bars = n - starts
+        total_return = final_value / initial_capital - 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            annual_return = np.where(total_return > -1,
+                                     (1 + total_return) ** (periods_per_year / np.maximum(bars - 1, 1)) - 1, -1.0)
+        return pd.DataFrame({
+            'start_bar': starts,
+            'start_date': np.asarray(dates)[starts] if dates is not None else starts,
+            'bars': bars,
+            'final_value': final_value,
+            'total_return': total_return * 100,
+            'annual_return': annual_return * 100,
+            'max_drawdown': [paths[key][1] for key in keys],
+            'trades': [paths[key][2] for key in keys],
+        })
+    
+    @staticmethod
+    def from_strategy(strategy, df, every=5, min_bars=252, initial_capital=100000, **trading_params):
+        """
+        对一个策略做起始日期分析：信号只生成一次，所有起点共用一张交易图
+        
+        Args:
+            strategy: 策略实例
+            df: 按日期升序的股票数据
+            every: 起点间隔（K线数）
+            min_bars: 每个起点至少保留的K线数
+            initial_capital: 初始资金
+            **trading_params: 交易参数（同execute_strategy）
+        
+        Returns:
+            table: StartDateSweep.run的结果
+        """
+        df = strategy.price_input(df)
+        events = strategy.generate_signal_events(df)
+        engine_params = {k: v for k, v in trading_params.items() if k in ENGINE_PARAMS}
+        graph_params = {k: v for k, v in engine_params.items() if k not in _CAPITAL_PARAMS}
+        graph = BacktestEngine.trade_graph(
+            df['close'].values,
+            events,
+            open_=df['open'].values if 'open' in df.columns else None,
+            high=df['high'].values if 'high' in df.columns else None,
+            low=df['low'].values if 'low' in df.columns else None,
+            **graph_params
+        )
+        starts = np.arange(0, max(len(df) - min_bars, 0) + 1, every)
+        return StartDateSweep.run(
+            df['close'].values, graph, starts, df['date'].values,
+            initial_capital=initial_capital,
+            commission_rate=engine_params.get('commission_rate', 0.0),
+            position_size=engine_params.get('position_size', 1.0)
+        )
+    
+    @staticmethod
+    def summary(table, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        """收益和回撤在各起点上的分布（均值、标准差、最小、分位数、最大）"""
+        columns = ['total_return', 'annual_return', 'max_drawdown', 'trades']
+        stats = table[columns].quantile(list(quantiles))
+        stats.index = [f'p{int(q * 100)}' for q in quantiles]
+        return pd.concat([
+            table[columns].agg(['mean', 'std', 'min']),
+            stats,
+            table[columns].agg(['max']),
+        ])
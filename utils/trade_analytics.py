@@ -0,0 +1,262 @@
+# trading_strategies/utils/trade_analytics.py
+import numpy as np
+import pandas as pd
+
+
+class TradeAnalytics:
+    """逐笔交易分析：最大不利/有利偏移（MAE/MFE）、到达极值的时间、持仓时长和收益分布
+    
+    每笔交易的持仓区间为(开仓K线, 平仓K线]（开盘价成交的交易含开仓K线），所有交易的区间极值
+    用reduceat一次求出，不逐笔循环。
+    """
+    
+    QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+    
+    @staticmethod
+    def trade_arrays(trades, n_bars, close=None):
+        """
+        把回测引擎的交易列表转换为数组；未平仓的交易按最后一根K线的收盘价计算
+        
+        Returns:
+            (开仓K线, 平仓K线, 开仓价, 平仓价, 是否已平仓, 是否开盘成交)
+        """
+        entry_bar = np.array([t['entry_bar'] for t in trades], dtype=np.int64)
+        exit_bar = np.array([-1 if t['exit_bar'] is None else t['exit_bar'] for t in trades], dtype=np.int64)
+        entry_price = np.array([t['entry_price'] for t in trades], dtype=float)
+        exit_price = np.array([t['exit_price'] for t in trades], dtype=float)
+        
+        at_open = np.array([t.get('at_open', False) for t in trades], dtype=bool)
+        
+        closed = exit_bar >= 0
+        exit_bar = np.where(closed, exit_bar, n_bars - 1)
+        if close is not None and len(close):
+            exit_price = np.where(closed, exit_price, close[-1])
+        return entry_bar, exit_bar, entry_price, exit_price, closed, at_open
+    
+    @staticmethod
+    def result_trades(df):
+        """
+        execute_strategy结果对应的交易列表
+        
+        优先使用回测引擎的交易列表（df.attrs['trades']）；没有时（如从CSV读回的结果）
+        按action列配对，'BUY_SELL'为同一根K线开仓并平仓的交易
+        """
+        trades = df.attrs.get('trades')
+        if trades is not None:
+            return trades
+        
+        close = df['close'].values
+        entry_col = df['entry_price'].values if 'entry_price' in df.columns else close
+        exit_col = df['exit_price'].values if 'exit_price' in df.columns else close
+        action = df['action'].values
+        trades = []
+        trade = None
+        for i in np.flatnonzero(action != 'HOLD'):
+            if action[i] in ('BUY', 'BUY_SELL') and trade is None:
+                trade = {'entry_bar': int(i), 'entry_price': entry_col[i], 'exit_bar': None,
+                         'exit_price': np.nan, 'at_open': action[i] == 'BUY_SELL'}
+                trades.append(trade)
+            if action[i] in ('SELL', 'BUY_SELL') and trade is not None:
+                trade.update(exit_bar=int(i), exit_price=exit_col[i])
+                trade = None
+        return trades
+    
+    @staticmethod
+    def _segment_reduce(ufunc, flat, starts, stops):
+        """对可能重叠的区间[starts, stops)做reduceat（起止位置交错排列，只取偶数位的结果）"""
+        padded = np.append(flat, flat[-1])
+        idx = np.empty(2 * len(starts), dtype=np.int64)
+        idx[0::2] = starts
+        idx[1::2] = stops
+        return ufunc.reduceat(padded, idx)[0::2]
+    
+    @staticmethod
+    def _first_match(values, starts, lengths, targets):
+        """每个区间内第一次等于目标值的位置（相对区间起点）"""
+        seg = np.repeat(np.arange(len(starts)), lengths)
+        offset = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        flat_idx = np.repeat(starts, lengths) + offset
+        missing = np.iinfo(np.int64).max
+        candidates = np.where(values[flat_idx] == targets[seg], offset, missing)
+        bounds = np.cumsum(lengths) - lengths
+        first = np.minimum.reduceat(candidates, bounds)
+        return np.where(first == missing, -1, first)
+    
+    @staticmethod
+    def compute(high, low, entry_bar, exit_bar, entry_price, exit_price, run=None,
+                series_index=None, commission_rate=0.0, at_open=None):
+        """
+        批量计算交易指标
+        
+        Args:
+            high/low: 最高/最低价，形状(n,)或(n, k)（k只股票）
+            entry_bar/exit_bar: 每笔交易的开仓/平仓K线位置
+            entry_price/exit_price: 每笔交易的成交价
+            run: 每笔交易所属的回测编号（多组回测一起计算时传入）
+            series_index: 长度为回测数的数组，第j组回测对应high/low的列号；
+                缺省时第j组回测对应第j列（一维价格时全部对应该列）
+            commission_rate: 手续费率，用于计算净收益
+            at_open: 每笔交易是否在开仓K线开盘时成交（'next_open'成交模型），
+                为True时开仓K线的最高/最低价计入持仓区间；缺省为全部按收盘价成交
+        
+        Returns:
+            table: 每行一笔交易的DataFrame
+        """
+        high = np.asarray(high, dtype=float)
+        low = np.asarray(low, dtype=float)
+        if high.ndim == 1:
+            high = high[:, None]
+            low = low[:, None]
+        n_bars = high.shape[0]
+        
+        entry_bar = np.asarray(entry_bar, dtype=np.int64)
+        exit_bar = np.asarray(exit_bar, dtype=np.int64)
+        entry_price = np.asarray(entry_price, dtype=float)
+        exit_price = np.asarray(exit_price, dtype=float)
+        run = np.zeros(len(entry_bar), dtype=np.int64) if run is None else np.asarray(run, dtype=np.int64)
+        at_open = np.zeros(len(entry_bar), dtype=bool) if at_open is None else np.asarray(at_open, dtype=bool)
+        if series_index is not None:
+            column = np.asarray(series_index)[run]
+        else:
+            column = run if high.shape[1] > 1 else np.zeros(len(run), dtype=np.int64)
+        
+        holding_bars = exit_bar - entry_bar
+        gross = exit_price / entry_price - 1
+        net = exit_price * (1 - commission_rate) / (entry_price * (1 + commission_rate)) - 1
+        
+        table = pd.DataFrame({
+            'run': run,
+            'entry_bar': entry_bar,
+            'exit_bar': exit_bar,
+            'holding_bars': holding_bars,
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'return': gross,
+            'net_return': net,
+        })
+        if len(entry_bar) == 0:
+            for col in ('mae', 'mfe', 'bars_to_mae', 'bars_to_mfe', 'mfe_giveback'):
+                table[col] = np.empty(0)
+            return table
+        
+        # 按列展开为一维，交易区间换算为展开后的位置
+        flat_high = high.ravel(order='F')
+        flat_low = low.ravel(order='F')
+        # 按收盘价成交的交易区间从下一根K线开始（在最后一根K线开仓的交易区间为空）；
+        # 按开盘价成交的交易从开仓K线开始，同一根K线开仓并平仓的交易区间为该K线
+        first = entry_bar + (~at_open).astype(np.int64)
+        span = exit_bar - first + 1
+        empty = span <= 0
+        lengths = np.where(empty, 1, span)
+        starts = column * n_bars + np.minimum(first, n_bars - 1)
+        stops = starts + lengths
+        
+        seg_high = TradeAnalytics._segment_reduce(np.fmax, flat_high, starts, stops)
+        seg_low = TradeAnalytics._segment_reduce(np.fmin, flat_low, starts, stops)
+        seg_high[empty] = np.nan
+        seg_low[empty] = np.nan
+        
+        # 平仓价也计入区间（止损成交价可能低于当根最低价的记录）
+        peak = np.fmax(seg_high, exit_price)
+        trough = np.fmin(seg_low, exit_price)
+        mae = np.minimum(trough / entry_price - 1, 0.0)
+        mfe = np.maximum(peak / entry_price - 1, 0.0)
+        
+        table['mae'] = mae
+        table['mfe'] = mfe
+        table['bars_to_mae'] = TradeAnalytics._first_match(flat_low, starts, lengths, seg_low) + first - entry_bar
+        table['bars_to_mfe'] = TradeAnalytics._first_match(flat_high, starts, lengths, seg_high) + first - entry_bar
+        # 从最大浮盈回吐的收益
+        table['mfe_giveback'] = mfe - gross
+        return table
+    
+    @staticmethod
+    def from_engine_results(results, high, low, close, series_index=None, commission_rate=0.0):
+        """
+        对多组回测结果（如参数扫描）一次性计算交易指标
+        
+        Args:
+            results: BacktestEngine.run的返回值列表
+            high/low/close: 价格，形状(n,)或(n, k)
+            series_index: 第j组回测对应的价格列号
+        """
+        close = np.asarray(close, dtype=float)
+        n_bars = close.shape[0]
+        parts = []
+        for j, result in enumerate(results):
+            column = j if series_index is None else series_index[j]
+            series_close = close[:, column] if close.ndim == 2 else close
+            arrays = TradeAnalytics.trade_arrays(result['trades'], n_bars, series_close)
+            parts.append(arrays + (np.full(len(arrays[0]), j, dtype=np.int64),))
+        entry_bar, exit_bar, entry_price, exit_price, closed, at_open, run = (
+            np.concatenate(p) for p in zip(*parts)
+        )
+        
+        table = TradeAnalytics.compute(
+            high, low, entry_bar, exit_bar, entry_price, exit_price, run=run,
+            series_index=series_index, commission_rate=commission_rate, at_open=at_open
+        )
+        table['closed'] = closed
+        return table
+    
+    @staticmethod
+    def from_result(df, commission_rate=0.0, trades=None):
+        """
+        对execute_strategy的结果DataFrame计算交易指标
+        
+        Args:
+            df: execute_strategy的返回值
+            commission_rate: 手续费率
+            trades: 交易列表（缺省为result_trades(df)）
+        """
+        close = df['close'].values
+        if trades is None:
+            trades = TradeAnalytics.result_trades(df)
+        entry_bar, exit_bar, entry_price, exit_price, closed, at_open = TradeAnalytics.trade_arrays(
+            trades, len(df), close
+        )
+        
+        table = TradeAnalytics.compute(
+            df['high'].values if 'high' in df.columns else close,
+            df['low'].values if 'low' in df.columns else close,
+            entry_bar, exit_bar, entry_price, exit_price, commission_rate=commission_rate,
+            at_open=at_open
+        )
+        table['closed'] = closed
+        if 'date' in df.columns:
+            table['entry_date'] = df['date'].values[entry_bar]
+            table['exit_date'] = df['date'].values[exit_bar]
+        return table
+    
+    @staticmethod
+    def summarize(table, quantiles=QUANTILES, by_run=False):
+        """
+        汇总交易指标
+        
+        Args:
+            table: compute/from_result的返回值
+            quantiles: 收益分布需要输出的分位数
+            by_run: 是否按回测编号分别汇总
+        """
+        frame = table.assign(win=table['return'] > 0)
+        grouped = frame.groupby('run' if by_run else np.zeros(len(frame), dtype=np.int64))
+        summary = pd.DataFrame({
+            'trades': grouped['return'].size(),
+            'win_rate': grouped['win'].mean(),
+            'mean_return': grouped['return'].mean(),
+            'median_return': grouped['return'].median(),
+            'mean_mae': grouped['mae'].mean(),
+            'worst_mae': grouped['mae'].min(),
+            'mean_mfe': grouped['mfe'].mean(),
+            'best_mfe': grouped['mfe'].max(),
+            'mean_giveback': grouped['mfe_giveback'].mean(),
+            'mean_holding_bars': grouped['holding_bars'].mean(),
+            'mean_bars_to_mfe': grouped['bars_to_mfe'].mean(),
+        })
+        if len(quantiles) and len(frame):
+            q = grouped['return'].quantile(list(quantiles)).unstack()
+            q.columns = [f'return_q{int(round(c * 100)):02d}' for c in q.columns]
+            summary = summary.join(q)
+        if by_run or summary.empty:
+            return summary
+        return summary.iloc[0]